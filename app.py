@@ -4,14 +4,17 @@ Healthsome Flask App
 Initializes Flask, sets up blueprints, and configures context processors.
 """
 
-from flask import Flask, session, render_template
-from flask_session import Session
+from flask import Flask, render_template
 
 from config import Config
-from helpers.db_helpers import query_db
+from helpers.db_helpers import init_app as init_db
 from helpers.datetime_helpers import to_iso_format
+from helpers.metrics_helpers import init_metrics
+from helpers.session_helpers import init_session
+from helpers.user_helpers import get_current_username
 from modules.auth import bp as auth_bp
 from modules.main import bp as main_bp
+from modules.status import bp as status_bp
 from modules.metrics.blood_pressure import bp as blood_pressure_bp
 from modules.metrics.medications import bp as medications_bp
 from modules.metrics.weight import bp as weight_bp
@@ -26,12 +29,19 @@ def create_app():
     flask_app = Flask(__name__)
     flask_app.config.from_object(Config)
 
-    # Set up server-side session management
-    Session(flask_app)
+    # Set up session management with the configured backend
+    init_session(flask_app)
+
+    # Return pooled database connections at the end of every request
+    init_db(flask_app)
+
+    # Time requests and their SQL when metrics are enabled
+    init_metrics(flask_app)
 
     # Register blueprints for modular routing and logic
     flask_app.register_blueprint(auth_bp)
     flask_app.register_blueprint(main_bp)
+    flask_app.register_blueprint(status_bp)
     flask_app.register_blueprint(blood_pressure_bp)
     flask_app.register_blueprint(weight_bp)
     flask_app.register_blueprint(medications_bp)
@@ -42,16 +52,13 @@ def create_app():
         """
         Add the currently logged-in user's username to the template context.
 
+        The username comes from the session or the user identity cache, so
+        rendering does not normally query the users table.
+
         Returns:
             dict: Dictionary containing the current user's username or None if not logged in.
         """
-        user_id = session.get('user_id')
-        if user_id:
-            user = query_db(
-                "SELECT username FROM users WHERE id = ?", (user_id,), one=True)
-            if user:
-                return {'current_user': user['username']}
-        return {'current_user': None}
+        return {'current_user': get_current_username()}
 
     # Register custom Jinja2 filters
     flask_app.jinja_env.filters['to_iso_format'] = to_iso_format
@@ -0,0 +1,428 @@
+"""
+Endpoint Benchmark Suite
+
+This script provisions a database at a given scale and drives every blueprint
+route (login, list pages, /data, /stats, create, edit, delete, toggle and export)
+twice: in-process through the Flask test client, and over HTTP with a
+multi-process load generator against a threaded WSGI server. Throughput and
+p50/p95/p99 latency per endpoint are printed as JSON, so results from two
+releases can be diffed to catch regressions.
+
+Run from the project root:
+    python -m benchmarks.bench_endpoints [--scale 1k|100k|10m] [--mode client|wsgi|both]
+
+Provisioning 10M rows takes a while; pass --db to keep the database and reuse
+it on later runs.
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+# Total metric rows and number of users for each scale
+SCALES = {
+    '1k': (1000, 10),
+    '100k': (100000, 100),
+    '10m': (10000000, 1000),
+}
+
+# Metric tables, each with its own blueprint
+METRICS = ('blood_pressure', 'weight', 'medications')
+
+# Average readings per user and day produced by the demo data generator
+ROWS_PER_USER_DAY = 4.6
+
+# Every user shares this password
+PASSWORD = "bench-password"
+
+def percentile(samples, pct):
+    """
+    Get a percentile of a list of samples.
+
+    Args:
+        samples (list): Sorted samples.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The sample at that percentile.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def summarize(timings, elapsed, errors=0):
+    """
+    Summarize the latencies of one endpoint.
+
+    Args:
+        timings (list): Request latencies in seconds.
+        elapsed (float): Wall-clock seconds the requests took together.
+        errors (int): Number of requests with an unexpected status.
+
+    Returns:
+        dict: Request count, errors, throughput and latency percentiles in milliseconds.
+    """
+    timings = sorted(timings)
+    if not timings:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "requests_per_s": round(len(timings) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+    }
+
+def provision_database(path, rows, users, seed=42):
+    """
+    Create a database with `users` users sharing about `rows` metric readings.
+
+    Uses the demo data generator in fresh-database mode, so the indexes and
+    rollups are built once after loading. Every user's password is PASSWORD,
+    hashed with the configured method, so logins cost what they cost in production.
+
+    Args:
+        path (str): Path of the database file to create.
+        rows (int): Approximate total number of metric readings.
+        users (int): Number of users.
+        seed (int): Seed of the random number generator.
+    """
+    # Imported only now because Config reads DB_FILE when it is first imported
+    from populate_demo_data import populate  # pylint: disable=import-outside-toplevel
+
+    years = rows / (users * ROWS_PER_USER_DAY * 365)
+    with contextlib.redirect_stdout(sys.stderr):  # Keep stdout for the JSON results
+        populate(path, users, years, seed, fresh=True, username="bench", password=PASSWORD)
+
+def load_record_ids(path, users, per_user):
+    """
+    Pick existing record IDs for the edit, delete and toggle endpoints.
+
+    Args:
+        path (str): Path of the database file.
+        users (int): Number of users to pick IDs for.
+        per_user (int): Maximum number of IDs per user and metric.
+
+    Returns:
+        dict: {metric: {user_id: [record IDs]}}.
+    """
+    ids = {}
+    with sqlite3.connect(path) as conn:
+        for metric in METRICS:
+            ids[metric] = {
+                user_id: [row[0] for row in conn.execute(
+                    f"SELECT id FROM {metric} WHERE user_id = ? ORDER BY id LIMIT ?",
+                    (user_id, per_user))]
+                for user_id in range(1, users + 1)
+            }
+    return ids
+
+def build_endpoints():
+    """
+    Describe the benchmarked requests.
+
+    Returns:
+        list: (name, method, path, form data) tuples; `{id}` in a path is replaced by
+        a record ID of the metric named before the first '.' of the endpoint name.
+    """
+    now = datetime.now().strftime("%Y-%m-%dT%H:%M")
+    forms = {
+        'blood_pressure': {"date_time": now, "systolic": "120", "diastolic": "80", "pulse": "70"},
+        'weight': {"date_time": now, "weight_value": "80.5"},
+        'medications': {"date_time": now, "medication_name": "A", "dosage": "1 tablet",
+                        "taken": "1"},
+    }
+    endpoints = [("main.index", "GET", "/", None)]
+    for metric, form in forms.items():
+        endpoints += [
+            (f"{metric}.list", "GET", f"/{metric}/?range=last_month", None),
+            (f"{metric}.list_all", "GET", f"/{metric}/?range=all_time", None),
+            (f"{metric}.data", "GET", f"/{metric}/data?range=last_month", None),
+            (f"{metric}.data_downsampled", "GET", f"/{metric}/data?range=all_time&max_points=800",
+             None),
+            (f"{metric}.data_weekly", "GET", f"/{metric}/data?range=all_time&granularity=week",
+             None),
+            (f"{metric}.stats", "GET", f"/{metric}/stats?range=all_time", None),
+            (f"{metric}.export", "GET", f"/{metric}/export", None),
+            (f"{metric}.create", "POST", f"/{metric}/create", form),
+            (f"{metric}.edit", "POST", f"/{metric}/edit/{{id}}", form),
+            (f"{metric}.delete", "POST", f"/{metric}/delete/{{id}}", None),
+        ]
+    endpoints.append(("medications.toggle", "POST", "/medications/toggle/{id}", None))
+    endpoints.append(("medications.doses", "GET", "/medications/doses?range=all_time", None))
+    endpoints.append(("medications.mark_taken", "POST", "/medications/mark_taken",
+                      {"first_day": now[:10]}))
+    return endpoints
+
+def run_test_client(app, endpoints, usernames, record_ids, requests):
+    """
+    Time every endpoint in-process through the Flask test client.
+
+    Args:
+        app (Flask): The application.
+        endpoints (list): Endpoints from build_endpoints.
+        usernames (list): Usernames of the users, in user ID order.
+        record_ids (dict): IDs from load_record_ids; delete consumes them.
+        requests (int): Requests per endpoint.
+
+    Returns:
+        dict: Summary per endpoint.
+    """
+    users = len(usernames)
+    active = min(users, 10)
+    clients = []
+    for user_id in range(1, active + 1):
+        client = app.test_client()
+        client.post("/auth/login", data={"username": usernames[user_id - 1], "password": PASSWORD})
+        clients.append((user_id, client))
+
+    results = {}
+    timings, errors = [], 0
+    started = time.perf_counter()
+    for i in range(max(1, requests // 10)):  # Logins are slow by design; run fewer
+        client = app.test_client()
+        request_started = time.perf_counter()
+        response = client.post("/auth/login", data={"username": usernames[i % users],
+                                                     "password": PASSWORD})
+        response.close()
+        timings.append(time.perf_counter() - request_started)
+        errors += response.status_code != 302
+    results["auth.login"] = summarize(timings, time.perf_counter() - started, errors)
+
+    for name, method, path, data in endpoints:
+        metric = name.split('.')[0]
+        timings, errors = [], 0
+        started = time.perf_counter()
+        for i in range(requests):
+            user_id, client = clients[i % active]
+            url = path
+            if '{id}' in path:
+                ids = record_ids[metric][user_id]
+                if not ids:
+                    continue
+                url = path.format(id=ids.pop() if name.endswith('delete') else ids[0])
+            request_started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            response.close()
+            timings.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        results[name] = summarize(timings, time.perf_counter() - started, errors)
+    return results
+
+def serve(port):
+    """
+    Serve the application with a threaded WSGI server until terminated.
+
+    Args:
+        port (int): Port to listen on.
+    """
+    from werkzeug.serving import make_server  # pylint: disable=import-outside-toplevel
+    from app import create_app  # pylint: disable=import-outside-toplevel
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log per request
+    make_server("127.0.0.1", port, create_app(), threaded=True).serve_forever()
+
+class HttpClient:
+    """A keep-alive HTTP client that carries the session cookie."""
+
+    def __init__(self, port):
+        """
+        Open a connection to the server.
+
+        Args:
+            port (int): Port of the server.
+        """
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookie = None
+
+    def request(self, method, path, data=None):
+        """
+        Send a request and read the whole response.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path with query string.
+            data (dict, optional): Form data for POST requests.
+
+        Returns:
+            int: The response status code.
+        """
+        headers = {"Accept-Encoding": "identity"}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        set_cookie = response.getheader("Set-Cookie")
+        if set_cookie:
+            self.cookie = set_cookie.split(";", 1)[0]
+        if response.getheader("Connection", "").lower() == "close":
+            self.connection.close()
+        return response.status
+
+def load_worker(args):
+    """
+    Issue requests from one load generator process for a fixed duration.
+
+    Args:
+        args (tuple): (port, worker number, user ID, username, endpoints, record IDs, duration).
+
+    Returns:
+        dict: {endpoint name: ([latencies], errors)}.
+    """
+    port, worker, user_id, username, endpoints, record_ids, duration = args
+    rng = random.Random(worker)
+    client = HttpClient(port)
+
+    results = {}
+    request_started = time.perf_counter()
+    status = client.request("POST", "/auth/login", {"username": username, "password": PASSWORD})
+    results["auth.login"] = ([time.perf_counter() - request_started], int(status != 302))
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        name, method, path, data = rng.choice(endpoints)
+        metric = name.split('.')[0]
+        if '{id}' in path:
+            ids = record_ids[metric].get(user_id)
+            if not ids:
+                continue
+            path = path.format(id=ids.pop() if name.endswith('delete') else ids[0])
+        request_started = time.perf_counter()
+        status = client.request(method, path, data)
+        timings, errors = results.setdefault(name, ([], 0))
+        timings.append(time.perf_counter() - request_started)
+        results[name] = (timings, errors + int(status >= 400))
+    return results
+
+def run_wsgi(endpoints, usernames, record_ids, processes, duration, port):
+    """
+    Load a threaded WSGI server from several client processes at once.
+
+    Args:
+        endpoints (list): Endpoints from build_endpoints.
+        usernames (list): Usernames of the users; each process logs in as one of them.
+        record_ids (dict): IDs from load_record_ids; delete consumes them.
+        processes (int): Number of load generator processes.
+        duration (float): Seconds each process keeps sending requests.
+        port (int): Port for the server.
+
+    Returns:
+        dict: Summary per endpoint and for all requests together ('all'), with
+        throughput over the whole run.
+    """
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    for _ in range(100):
+        try:
+            http.client.HTTPConnection("127.0.0.1", port, timeout=1).request("GET", "/about")
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    jobs = []
+    for worker in range(processes):
+        user_id = worker % len(usernames) + 1
+        ids = {metric: {user_id: list(by_user.get(user_id, []))}
+               for metric, by_user in record_ids.items()}
+        jobs.append((port, worker, user_id, usernames[user_id - 1], endpoints, ids, duration))
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        partials = pool.map(load_worker, jobs)
+    elapsed = time.perf_counter() - started
+    server.terminate()
+    server.join()
+
+    merged = {"all": ([], 0)}
+    for partial in partials:
+        for name, (timings, errors) in partial.items():
+            all_timings, all_errors = merged.setdefault(name, ([], 0))
+            all_timings.extend(timings)
+            merged[name] = (all_timings, all_errors + errors)
+            merged["all"][0].extend(timings)
+            merged["all"] = (merged["all"][0], merged["all"][1] + errors)
+    return {name: summarize(timings, elapsed, errors)
+            for name, (timings, errors) in sorted(merged.items())}
+
+def main():
+    """
+    Provision or reuse a database, run the selected modes and print the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark every Healthsome endpoint.")
+    parser.add_argument("--scale", choices=SCALES, default="1k", help="rows and users to provision")
+    parser.add_argument("--rows", type=int, help="override the number of metric rows")
+    parser.add_argument("--users", type=int, help="override the number of users")
+    parser.add_argument("--db", help="database file to provision or reuse (default: temporary)")
+    parser.add_argument("--mode", choices=("client", "wsgi", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per endpoint in client mode")
+    parser.add_argument("--processes", type=int, default=4, help="load generator processes")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="seconds of load per process in wsgi mode")
+    parser.add_argument("--port", type=int, default=5055, help="port of the WSGI server")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the generated data")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    rows, users = SCALES[args.scale]
+    rows = args.rows or rows
+    users = args.users or users
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "bench.db")
+        os.environ["DB_FILE"] = path
+        os.environ["SESSION_FILE_DIR"] = os.path.join(tmp, "sessions")
+        # Chart responses must be rebuilt to be measured
+        os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+
+        started = time.perf_counter()
+        provisioned = not os.path.exists(path)
+        if provisioned:
+            provision_database(path, rows, users, args.seed)
+        results = {
+            "scale": args.scale,
+            "rows": rows,
+            "users": users,
+            "provision_s": round(time.perf_counter() - started, 2) if provisioned else None,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        }
+
+        # Imported only now because Config reads DB_FILE when it is first imported
+        from populate_demo_data import make_usernames  # pylint: disable=import-outside-toplevel
+        usernames = make_usernames("bench", users)
+        endpoints = build_endpoints()
+        if args.mode in ("client", "both"):
+            from app import create_app  # pylint: disable=import-outside-toplevel
+            record_ids = load_record_ids(path, min(users, 10), args.requests)
+            results["test_client"] = run_test_client(create_app(), endpoints, usernames,
+                                                     record_ids, args.requests)
+        if args.mode in ("wsgi", "both"):
+            record_ids = load_record_ids(path, min(users, args.processes), 10000)
+            results["wsgi"] = run_wsgi(endpoints, usernames, record_ids, args.processes,
+                                       args.duration, args.port)
+            results["wsgi_processes"] = args.processes
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
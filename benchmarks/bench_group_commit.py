@@ -0,0 +1,207 @@
+"""
+Group Commit Contention Benchmark
+
+This script measures concurrent single-row writes from several worker
+processes, each with several request threads, against one database. In
+"direct" mode every write is executed and committed on the thread's own
+pooled connection, like `execute_db` without group commit; writes that find
+the database locked fail, as they would for a request. In "group" mode each
+process hands its writes to a `GroupCommitWriter`, which commits them in
+batches and retries locked batches with backoff. Throughput, latency
+percentiles, failed writes and commit batch sizes are printed as JSON.
+
+With `--shards N`, the writing users are spread over N databases by
+`shard_for`, as the application does with `SHARD_COUNT`, and every process
+has a pool (and writer) per database, so writes to different shards do not
+wait for the same write lock.
+
+Run from the project root:
+    python -m benchmarks.bench_group_commit [--processes 4] [--threads 8] [--synchronous FULL]
+    python -m benchmarks.bench_group_commit --shards 4
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from helpers.db_helpers import ConnectionPool, GroupCommitWriter, is_busy_error
+from helpers.migration_helpers import apply_migrations
+from helpers.shard_helpers import shard_for
+
+MODES = ("direct", "group")
+
+INSERT_QUERY = "INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (?, ?, 0, ?)"
+
+def create_database(path, users):
+    """
+    Create a database with one user per writing thread.
+
+    Args:
+        path (str): Path of the database file to create.
+        users (int): Number of users to create.
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        with open("schema.sql", "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        apply_migrations(conn)
+        conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                         ((f"bench{i}", "-") for i in range(users)))
+    conn.close()
+
+def percentile(samples, pct):
+    """
+    Get a percentile of a list of samples.
+
+    Args:
+        samples (list): Sorted samples.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The sample at that percentile.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+def run_process(args):
+    """
+    Write from several threads of one process and measure every write.
+
+    Args:
+        args (tuple): (databases, mode, process index, threads, writes per thread,
+            start time, busy timeout in ms, synchronous mode, window in ms).
+
+    Returns:
+        dict: Per-write latencies, failure count, elapsed time and the stats of each writer.
+    """
+    databases, mode, index, threads, writes, start_at, busy_timeout, synchronous, window = args
+    pools = [ConnectionPool(database, size=threads if mode == "direct" else 1,
+                            busy_timeout=busy_timeout, synchronous=synchronous)
+             for database in databases]
+    writers = [GroupCommitWriter(pool, window=window / 1000) if mode == "group" else None
+               for pool in pools]
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def write(thread):
+        user_id = index * threads + thread + 1
+        shard = shard_for(user_id, len(databases))
+        pool, writer = pools[shard], writers[shard]
+        conn = pool.acquire() if writer is None else None
+        local_latencies = []
+        local_failures = 0
+        for i in range(writes):
+            params = (user_id, 1767225600 + i * 60, 70 + i % 10)
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    conn.execute(INSERT_QUERY, params)
+                    conn.commit()
+                else:
+                    writer.execute(INSERT_QUERY, params)
+            except sqlite3.Error as e:
+                if not is_busy_error(e):
+                    raise
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+                local_failures += 1
+                continue
+            local_latencies.append(time.perf_counter() - started)
+        if conn is not None:
+            pool.release(conn)
+        with lock:
+            latencies.extend(local_latencies)
+            failures.append(local_failures)
+
+    workers = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    stats = []
+    for pool, writer in zip(pools, writers):
+        if writer is not None:
+            stats.append(writer.stats())
+            writer.close()
+        else:
+            pool.close()
+    return {"latencies": latencies, "failures": sum(failures), "elapsed": elapsed, "writers": stats}
+
+def run_mode(databases, mode, processes, threads, writes, busy_timeout, synchronous, window):
+    """
+    Run one mode with all processes starting together.
+
+    Returns:
+        dict: Throughput, latency percentiles, failures and (group mode) batch sizes.
+    """
+    start_at = time.time() + 1.0
+    with ProcessPoolExecutor(processes) as pool:
+        results = list(pool.map(run_process, [
+            (databases, mode, index, threads, writes, start_at, busy_timeout, synchronous, window)
+            for index in range(processes)
+        ]))
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    elapsed = max(result["elapsed"] for result in results)
+    summary = {
+        "writes": len(latencies),
+        "failed": sum(result["failures"] for result in results),
+        "elapsed_s": round(elapsed, 3),
+        "writes_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+    if mode == "group":
+        stats = [s for result in results for s in result["writers"]]
+        batches = sum(s["batches"] for s in stats)
+        summary["batches"] = batches
+        summary["batch_size_avg"] = round(sum(s["statements"] for s in stats) / batches, 2) if batches else 0
+        summary["batch_size_max"] = max(s["batch_size_max"] for s in stats)
+        summary["retries"] = sum(s["retries"] for s in stats)
+    return summary
+
+def main():
+    """
+    Benchmark direct and group-committed writes under contention and print the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Compare per-write commits with group commit.")
+    parser.add_argument("--processes", type=int, default=4, help="writing processes (workers)")
+    parser.add_argument("--threads", type=int, default=8, help="writing threads per process")
+    parser.add_argument("--writes", type=int, default=250, help="writes per thread")
+    parser.add_argument("--busy-timeout", type=int, default=5000,
+                        help="SQLite busy timeout in ms (lower it to provoke 'database is locked')")
+    parser.add_argument("--synchronous", default="NORMAL", choices=("NORMAL", "FULL"),
+                        help="synchronous pragma; FULL syncs the WAL on every commit")
+    parser.add_argument("--window", type=float, default=0.0, help="group commit window in ms")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="databases the writing users are spread over")
+    parser.add_argument("--mode", choices=MODES, action="append",
+                        help="mode to run (repeatable, default: all)")
+    args = parser.parse_args()
+
+    results = {
+        "processes": args.processes, "threads": args.threads, "writes": args.writes,
+        "busy_timeout_ms": args.busy_timeout, "synchronous": args.synchronous,
+        "window_ms": args.window, "shards": args.shards,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.mode or MODES:
+            databases = [os.path.join(tmp, f"{mode}{shard}.db") for shard in range(args.shards)]
+            for database in databases:
+                create_database(database, args.processes * args.threads)
+            results[mode] = run_mode(databases, mode, args.processes, args.threads, args.writes,
+                                     args.busy_timeout, args.synchronous, args.window)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+JSON Encoding Benchmark
+
+This script compares the former `jsonify` path of the /data endpoints with the
+msgspec streaming encoder on a large blood pressure range, reporting total
+time, time to first byte and peak memory as JSON.
+
+Run from the project root:
+    python -m benchmarks.bench_json_encoding [--rows 100000] [--chunk-size 1000]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from flask import jsonify
+
+from helpers.datetime_helpers import LOCAL_TIME_SQL
+from helpers.db_helpers import query_db
+from helpers.json_helpers import BloodPressurePoint, iter_json_array
+from helpers.migration_helpers import apply_migrations
+
+QUERY = (f"SELECT {LOCAL_TIME_SQL} AS date_time, systolic, diastolic, pulse FROM blood_pressure "
+         "WHERE user_id = ? ORDER BY ts ASC")
+
+def create_database(path, rows):
+    """
+    Create a database with one user and `rows` blood pressure readings.
+
+    Args:
+        path (str): Path of the database file to create.
+        rows (int): Number of readings to insert.
+    """
+    with sqlite3.connect(path) as conn:
+        with open("schema.sql", "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        apply_migrations(conn)
+        conn.execute("INSERT INTO users (username, password_hash) VALUES ('bench', '')")
+        start = int(datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp())
+        conn.executemany(
+            "INSERT INTO blood_pressure (user_id, ts, tz_offset, systolic, diastolic, pulse) "
+            "VALUES (1, ?, 0, ?, ?, ?)",
+            ((start + 12 * 3600 * i, 110 + i % 30, 70 + i % 20, 60 + i % 40) for i in range(rows))
+        )
+
+def jsonify_body():
+    """
+    Produce the response body the way the endpoints did before msgspec.
+
+    Returns:
+        iterator: The response body pieces.
+    """
+    records = query_db(QUERY, (1,))
+    return jsonify([
+        {
+            "date": record["date_time"],
+            "systolic": record["systolic"],
+            "diastolic": record["diastolic"],
+            "pulse": record["pulse"]
+        }
+        for record in records
+    ]).response
+
+def msgspec_body(chunk_size):
+    """
+    Produce the response body with the msgspec streaming encoder.
+
+    Args:
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Returns:
+        iterator: The response body pieces.
+    """
+    return iter_json_array(QUERY, (1,), BloodPressurePoint, chunk_size)
+
+def measure(app, make_body):
+    """
+    Consume a response body and measure its cost.
+
+    Args:
+        app (Flask): Application providing the request context.
+        make_body (callable): Returns an iterable of body pieces.
+
+    Returns:
+        dict: Total seconds, seconds to first byte, body bytes and peak traced memory.
+    """
+    with app.test_request_context():
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        for piece in make_body():
+            if first_byte is None and len(piece) > 1:
+                first_byte = time.perf_counter() - started
+            size += len(piece)
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "total_s": round(total, 4),
+        "ttfb_s": round(first_byte or total, 4),
+        "bytes": size,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+    }
+
+def main():
+    """
+    Run both encoders against the same database and print the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Compare jsonify with the msgspec stream encoder.")
+    parser.add_argument("--rows", type=int, default=100000, help="blood pressure readings to encode")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per streamed chunk")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per encoder, best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_FILE"] = os.path.join(tmp, "bench.db")
+        os.environ["SESSION_FILE_DIR"] = os.path.join(tmp, "sessions")
+        create_database(os.environ["DB_FILE"], args.rows)
+
+        # Imported only now because Config reads DB_FILE when it is first imported
+        from app import create_app  # pylint: disable=import-outside-toplevel
+        app = create_app()
+
+        results = {"rows": args.rows, "chunk_size": args.chunk_size}
+        for name, make_body in (("jsonify", jsonify_body),
+                                ("msgspec_stream", lambda: msgspec_body(args.chunk_size))):
+            runs = [measure(app, make_body) for _ in range(args.repeat)]
+            results[name] = min(runs, key=lambda run: run["total_s"])
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Series Store Benchmark
+
+This script compares reading a blood pressure series from SQLite into NumPy
+arrays (`fetch_columns`) with reading it from the memory-mapped series store,
+for the whole history and for the last 30 days, and reports the time of the
+first (building) store read, the best time of each path and the store's
+catch-up time after a single new reading as JSON.
+
+Run from the project root:
+    python -m benchmarks.bench_series_store [--rows 100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_json_encoding import create_database
+from helpers.analytics_helpers import load_series
+from helpers.db_helpers import execute_db, query_db
+
+DAY = 86400
+
+def timed(function, repeat):
+    """
+    Call a function several times and keep the best time.
+
+    Args:
+        function (callable): The function to call.
+        repeat (int): Number of calls.
+
+    Returns:
+        tuple: Best seconds and the result of the last call.
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def compare(app, start_date, end_date, repeat):
+    """
+    Read a range with both paths and check that they return the same series.
+
+    Args:
+        app (Flask): Application providing the request context.
+        start_date (int): Start timestamp of the range, or None for all time.
+        end_date (int): End timestamp of the range, or None for all time.
+        repeat (int): Reads per path, best is reported.
+
+    Returns:
+        dict: Rows read and best seconds of each path.
+    """
+    results = {}
+    for name, enabled in (("sqlite_s", False), ("series_store_s", True)):
+        app.config['SERIES_STORE_ENABLED'] = enabled
+        with app.test_request_context():
+            results[name], series = timed(lambda: load_series('blood_pressure', 1, start_date, end_date),
+                                          repeat)
+            results[name] = round(results[name], 5)
+            results.setdefault("series", series)
+    expected = results.pop("series")
+    for key, column in series.items():
+        if not np.array_equal(column, expected[key]):
+            raise AssertionError(f"Series store column '{key}' differs from the database")
+    results["rows"] = len(series['minutes'])
+    results["speedup"] = round(results["sqlite_s"] / max(results["series_store_s"], 1e-9), 1)
+    return results
+
+def main():
+    """
+    Run both read paths against the same database and print the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Compare SQLite reads with the series store.")
+    parser.add_argument("--rows", type=int, default=100000, help="blood pressure readings to read")
+    parser.add_argument("--repeat", type=int, default=5, help="reads per path, best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_FILE"] = os.path.join(tmp, "bench.db")
+        os.environ["SESSION_FILE_DIR"] = os.path.join(tmp, "sessions")
+        create_database(os.environ["DB_FILE"], args.rows)
+
+        # Imported only now because Config reads DB_FILE when it is first imported
+        from app import create_app  # pylint: disable=import-outside-toplevel
+        app = create_app()
+        app.config['SERIES_STORE_DIR'] = os.path.join(tmp, "series_store")
+
+        app.config['SERIES_STORE_ENABLED'] = True
+        with app.test_request_context():
+            build_s, _ = timed(lambda: load_series('blood_pressure', 1), 1)
+            last = query_db("SELECT MAX(ts) FROM blood_pressure", one=True)[0]
+
+        results = {
+            "rows": args.rows,
+            "build_s": round(build_s, 4),
+            "all_time": compare(app, None, None, args.repeat),
+            "last_30_days": compare(app, last - 30 * DAY, last, args.repeat),
+        }
+
+        app.config['SERIES_STORE_ENABLED'] = True
+        with app.test_request_context():
+            execute_db("INSERT INTO blood_pressure (user_id, ts, tz_offset, systolic, diastolic, pulse) "
+                       "VALUES (1, ?, 0, 120, 80, 70)", (last + DAY,))
+            append_s, series = timed(lambda: load_series('blood_pressure', 1), 1)
+        results["append_catch_up_s"] = round(append_s, 5)
+        results["rows_after_append"] = len(series['minutes'])
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
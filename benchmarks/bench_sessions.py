@@ -0,0 +1,156 @@
+"""
+Session Store Benchmark
+
+This script compares the session backends selectable with `SESSION_TYPE`:
+Flask-Session's filesystem store, the SQLite `sessions` table and Flask's
+signed cookie. Each simulated client logs in once and then alternates page
+views with record creation, which flashes a message and so modifies the
+session twice. Latency percentiles and the on-disk footprint of the store
+are printed as JSON.
+
+Run from the project root:
+    python -m benchmarks.bench_sessions [--clients 200] [--rounds 10]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from werkzeug.security import generate_password_hash
+
+from helpers.migration_helpers import apply_migrations
+
+BACKENDS = ("filesystem", "sqlite", "cookie")
+
+def create_database(path, clients):
+    """
+    Create a database with one user per simulated client.
+
+    Args:
+        path (str): Path of the database file to create.
+        clients (int): Number of users to create.
+    """
+    # A cheap hash keeps the one-off logins from dominating the run
+    password_hash = generate_password_hash("bench", method="pbkdf2:sha256:1")
+    with sqlite3.connect(path) as conn:
+        with open("schema.sql", "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        apply_migrations(conn)
+        conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                         ((f"bench{i}", password_hash) for i in range(clients)))
+
+def percentile(samples, pct):
+    """
+    Get a percentile of a list of samples.
+
+    Args:
+        samples (list): Sorted samples.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The sample at that percentile.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def store_footprint(backend, tmp):
+    """
+    Measure how much the session store occupies on disk.
+
+    Args:
+        backend (str): One of BACKENDS.
+        tmp (str): Temporary directory of the run.
+
+    Returns:
+        dict: Number of stored sessions or files and their total size.
+    """
+    if backend == "filesystem":
+        directory = os.path.join(tmp, "sessions")
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+        return {"files": len(names), "bytes": size}
+    if backend == "sqlite":
+        with sqlite3.connect(os.environ["DB_FILE"]) as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {"rows": count, "bytes": size}
+    return {"files": 0, "bytes": 0}
+
+def run_backend(backend, clients, rounds, tmp):
+    """
+    Drive the application with one session backend and time every request.
+
+    Args:
+        backend (str): One of BACKENDS.
+        clients (int): Number of simulated clients, each with its own session.
+        rounds (int): Page view and record creation rounds per client.
+        tmp (str): Temporary directory of the run.
+
+    Returns:
+        dict: Request count, throughput, latency percentiles and store footprint.
+    """
+    # Imported only now because Config reads DB_FILE when it is first imported
+    from app import create_app  # pylint: disable=import-outside-toplevel
+    from config import Config  # pylint: disable=import-outside-toplevel
+
+    Config.SESSION_TYPE = backend
+    app = create_app()
+
+    test_clients = []
+    for i in range(clients):
+        client = app.test_client()
+        client.post("/auth/login", data={"username": f"bench{i}", "password": "bench"})
+        test_clients.append(client)
+
+    timings = []
+    started = time.perf_counter()
+    for round_number in range(rounds):
+        for client in test_clients:
+            for method, url, data in (
+                ("get", "/weight/", None),
+                ("post", "/weight/create",
+                 {"date_time": f"2024-01-01T{round_number % 24:02d}:00", "weight_value": "80"}),
+                ("get", "/weight/", None),
+            ):
+                request_started = time.perf_counter()
+                response = getattr(client, method)(url, data=data)
+                response.close()
+                timings.append(time.perf_counter() - request_started)
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "requests_per_s": round(len(timings) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "store": store_footprint(backend, tmp),
+    }
+
+def main():
+    """
+    Benchmark every session backend against the same database and print the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Compare the session store backends.")
+    parser.add_argument("--clients", type=int, default=200, help="simulated clients (sessions)")
+    parser.add_argument("--rounds", type=int, default=10, help="request rounds per client")
+    parser.add_argument("--backend", choices=BACKENDS, action="append",
+                        help="backend to run (repeatable, default: all)")
+    args = parser.parse_args()
+
+    results = {"clients": args.clients, "rounds": args.rounds}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_FILE"] = os.path.join(tmp, "bench.db")
+        os.environ["SESSION_FILE_DIR"] = os.path.join(tmp, "sessions")
+        create_database(os.environ["DB_FILE"], args.clients)
+        for backend in args.backend or BACKENDS:
+            results[backend] = run_backend(backend, args.clients, args.rounds, tmp)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -20,12 +20,98 @@ class Config:
     # Path to the SQLite database file
     DATABASE_FILE = os.getenv("DB_FILE", "healthsome.db")
 
+    # Per-user sharding of the metric data (see helpers/shard_helpers.py)
+    # The database above stays the directory of users and sessions; change the
+    # number of shards with rebalance_shards.py while the application is stopped
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))  # 1 keeps everything in DB_FILE
+    SHARD_FILE_TEMPLATE = os.getenv("SHARD_FILE_TEMPLATE", "")  # e.g. "data/shard{index}.db"
+
+    # Connection pool settings (per worker process and database)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))  # Maximum open connections
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+    DB_POOL_HEALTH_CHECK = os.getenv("DB_POOL_HEALTH_CHECK", "1") == "1"  # Verify connections on checkout
+
+    # SQLite pragmas applied once to every pooled connection
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # Wait on a locked database
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # Bytes to memory-map
+    DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # Page cache, negative values in KiB
+    DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")  # "FULL" syncs the WAL on every commit
+
+    # Group commit of single writes (per worker process and database)
+    # Writes from concurrent requests are committed together in one transaction
+    GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))  # Max extra wait to grow a batch
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))  # Statements per transaction
+    GROUP_COMMIT_MAX_RETRIES = int(os.getenv("GROUP_COMMIT_MAX_RETRIES", "5"))  # Retries on a locked database
+    GROUP_COMMIT_BACKOFF_MS = float(os.getenv("GROUP_COMMIT_BACKOFF_MS", "10"))  # First retry delay, doubled
+    GROUP_COMMIT_TIMEOUT = float(os.getenv("GROUP_COMMIT_TIMEOUT", "30"))  # Seconds a request waits for its commit
+
+    # Metric list pagination
+    LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))  # Records per page by default
+    LIST_PAGE_SIZE_MAX = int(os.getenv("LIST_PAGE_SIZE_MAX", "200"))  # Upper bound for ?limit=
+
+    # Upper bound for the ?max_points= chart downsampling budget
+    CHART_MAX_POINTS_LIMIT = int(os.getenv("CHART_MAX_POINTS_LIMIT", "2000"))
+
+    # Days covered by the home page dashboard trends and monthly adherence
+    DASHBOARD_TREND_DAYS = int(os.getenv("DASHBOARD_TREND_DAYS", "30"))
+
+    # Per-process cache of chart data responses
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))  # LRU bound
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))  # Seconds an entry is kept
+    RESPONSE_CACHE_MAX_BODY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BODY_BYTES", str(1024 * 1024)))
+    RESPONSE_CACHE_VERSION_SLOTS = int(os.getenv("RESPONSE_CACHE_VERSION_SLOTS", "65536"))  # Shared tokens
+
+    # Columnar copy of the metric series in memory-mapped files (see helpers/series_store_helpers.py)
+    # Chart and stats reads slice it instead of querying; it is brought up to date on read
+    SERIES_STORE_ENABLED = os.getenv("SERIES_STORE_ENABLED", "0") == "1"
+    SERIES_STORE_DIR = os.getenv("SERIES_STORE_DIR", "series_store")  # Shared by all worker processes
+    SERIES_STORE_INDEX_BLOCK = int(os.getenv("SERIES_STORE_INDEX_BLOCK", "1024"))  # Rows per index entry
+    SERIES_STORE_MAX_OPEN = int(os.getenv("SERIES_STORE_MAX_OPEN", "256"))  # Series kept mapped per process
+
+    # Password hashing on a bounded per-process thread pool
+    # Werkzeug method and cost, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000";
+    # hashes made with other parameters are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # Concurrent hashes
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))  # Beyond this, answer 503
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "30"))  # Seconds to wait for a hash
+
+    # Per-process cache of usernames for the logged-in user shown in templates
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))  # LRU bound
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))  # Seconds before a username is looked up again
+
+    # Bulk import of metric records
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))  # Rows validated and inserted per batch
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))  # Row errors reported back
+
+    # Streaming export of metric records
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))  # Rows fetched and encoded per chunk
+    EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))  # zlib level for ?gzip=1 exports
+
+    # Per-request SQL instrumentation, the Server-Timing header and the /metrics endpoint
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+
+    # /status/* reports of pools, caches, password hashing and group commit of each worker process
+    STATUS_ENABLED = os.getenv("STATUS_ENABLED", "0") == "1"
+
+    # Slow query log of statements run through query_db, stream_db and execute_db
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0"))  # 0 disables the log
+    SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.log")  # JSON lines, one per query
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate at
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))  # Rotated files kept
+
     # Path to the SQL schema file
     SCHEMA_FILE = os.getenv("SCHEMA_FILE", "schema.sql")
 
-    # Flask-Session configuration
-    SESSION_TYPE = "filesystem"  # Store session data in files
+    # Session configuration
+    # "sqlite" stores sessions in the application database, "cookie" keeps them in a
+    # signed cookie, and any Flask-Session type (e.g. "filesystem") uses Flask-Session
+    SESSION_TYPE = os.getenv("SESSION_TYPE", "sqlite")
     SESSION_PERMANENT = False  # Sessions will not persist beyond browser close
+    SESSION_CLEANUP_N_REQUESTS = int(os.getenv("SESSION_CLEANUP_N_REQUESTS", "1000"))  # Sweep expired sessions
+    SESSION_SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))  # Rows deleted per sweep batch
 
-    # Directory to store session files
+    # Directory to store session files (SESSION_TYPE = "filesystem" only)
     SESSION_FILE_DIR = os.getenv("SESSION_FILE_DIR", "./flask_sessions")
@@ -2,21 +2,28 @@
 Database Initialization Script
 
 This script initializes the SQLite database for the Healthsome application
-using the schema specified in the environment variables.
+using the schema specified in the environment variables. With `SHARD_COUNT`
+above 1, the shard databases are created next to it as well.
 """
 
 import os
 import sqlite3
 from app import create_app
+from helpers.migration_helpers import apply_migrations
+from helpers.shard_helpers import init_shard, set_shard_count, shard_files
 
 def initialize_database():
     """
     Initialize the database using the schema file specified in the .env file.
 
-    Reads the schema from the file and creates the SQLite database.
+    Reads the schema from the file, creates the SQLite database and applies
+    all migrations so a fresh database starts at the latest schema version.
     """
     schema_file = os.getenv("SCHEMA_FILE", "schema.sql")
     db_file = os.getenv("DB_FILE", "default.db")
+    shard_count = int(os.getenv("SHARD_COUNT", "1"))
+    shards = shard_files(db_file, shard_count, os.getenv("SHARD_FILE_TEMPLATE", "")) \
+        if shard_count > 1 else []
 
     if not os.path.exists(schema_file):
         print(f"Schema file '{schema_file}' not found.")
@@ -31,12 +38,22 @@ def initialize_database():
             print("Initialization aborted.")
             return
         os.remove(db_file)  # Remove the existing database file
+        for shard in shards:
+            if os.path.exists(shard):
+                os.remove(shard)
 
     try:
         with sqlite3.connect(db_file) as conn:
             with open(schema_file, "r", encoding="utf-8") as f:
                 conn.executescript(f.read())
+            apply_migrations(conn)
+            if shards:
+                for index, shard in enumerate(shards):
+                    init_shard(shard, index, schema_file)
+                set_shard_count(conn, shard_count)
         print(f"Database initialized successfully using schema from '{schema_file}'.")
+        if shards:
+            print(f"Created {shard_count} shard databases: {', '.join(shards)}.")
     except (sqlite3.DatabaseError, OSError) as e:
         print(f"Error initializing database: {e}")
 
@@ -0,0 +1,352 @@
+"""
+Analytics Helpers for the Healthsome application.
+
+This module computes trend statistics of a user's metric series. The series
+is streamed from the covering index into NumPy column arrays, and every
+statistic is computed with vectorized operations over the whole range:
+per-day means, rolling means over calendar days, a least-squares trend,
+variability, morning and evening blood pressure, and AHA blood pressure
+categories. Nothing loops over the readings in Python, so a multi-year
+history is summarized in milliseconds.
+"""
+
+import numpy as np
+
+from helpers.datetime_helpers import LOCAL_MINUTES_SQL, format_timestamp
+from helpers.downsample_helpers import fetch_columns
+from helpers.schedule_helpers import due_dose_columns
+from helpers.series_store_helpers import read_series
+
+MINUTES_PER_DAY = 24 * 60
+
+# Rolling mean windows in days
+ROLLING_WINDOWS = (7, 30)
+
+# Local hours counted as morning and as evening readings, [start, end)
+MORNING_HOURS = (4, 12)
+EVENING_HOURS = (16, 24)
+
+# AHA blood pressure categories, most severe first: (name, systolic above, diastolic above).
+# A reading belongs to the first category whose systolic or diastolic threshold it exceeds.
+BP_CATEGORIES = [
+    ('crisis', 180, 120),
+    ('stage_2', 139, 89),
+    ('stage_1', 129, 79),
+]
+
+# Columns of each metric analyzed, with their NumPy dtypes
+STATS_COLUMNS = {
+    'blood_pressure': (('systolic', 'i8'), ('diastolic', 'i8'), ('pulse', 'i8')),
+    'weight': (('weight_value', 'f8'),),
+    'medications': (('taken', 'i8'),),
+}
+
+def load_series(metric, user_id, start_date=None, end_date=None):
+    """
+    Load a user's series into NumPy arrays, oldest first.
+
+    With the series store enabled, the arrays are read-only slices of its
+    mapped files instead of being streamed from the database.
+
+    Args:
+        metric (str): One of the keys of STATS_COLUMNS.
+        user_id (int): ID of the user who owns the readings.
+        start_date (int, optional): Start timestamp of the range, or None for all time.
+        end_date (int, optional): End timestamp of the range, or None for all time.
+
+    Returns:
+        dict: 'ts' (UTC seconds since the epoch), 'minutes' (local minutes since the epoch)
+        and one array per column.
+    """
+    if metric not in STATS_COLUMNS:
+        raise ValueError(f"Unknown metric: {metric}")
+    series = read_series(metric, user_id, start_date, end_date)
+    if series is not None:
+        return series
+    names = [name for name, _ in STATS_COLUMNS[metric]]
+    query = f"SELECT ts, {LOCAL_MINUTES_SQL}, {', '.join(names)} FROM {metric} WHERE user_id = ?"
+    params = [user_id]
+    if start_date:
+        query += " AND ts BETWEEN ? AND ?"
+        params.extend([start_date, end_date])
+    query += " ORDER BY ts ASC"
+
+    columns = fetch_columns(query, params, ['i8', 'i8'] + [dtype for _, dtype in STATS_COLUMNS[metric]])
+    return dict(zip(['ts', 'minutes'] + names, columns))
+
+def merge_doses(series, minutes, taken):
+    """
+    Add scheduled doses to a medication series.
+
+    Args:
+        series (dict): Arrays as returned by `load_series` for medications.
+        minutes (numpy.ndarray): Local minutes since the epoch of the due doses.
+        taken (numpy.ndarray): Whether each dose was taken (0 or 1).
+
+    Returns:
+        dict: The merged series, oldest first.
+    """
+    if len(minutes) == 0:
+        return series
+    merged_minutes = np.concatenate([series['minutes'], minutes])
+    order = np.argsort(merged_minutes, kind='stable')
+    return {'minutes': merged_minutes[order],
+            'taken': np.concatenate([series['taken'], taken])[order]}
+
+def daily_means(days, values):
+    """
+    Average the values of each day.
+
+    Args:
+        days (numpy.ndarray): Day number of every reading.
+        values (numpy.ndarray): Value of every reading.
+
+    Returns:
+        tuple: (distinct days ascending, per-day sums, per-day counts).
+    """
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    sums = np.bincount(inverse, weights=values.astype(np.float64))
+    counts = np.bincount(inverse)
+    return unique_days, sums, counts
+
+def rolling_means(days, values, windows=ROLLING_WINDOWS):
+    """
+    Compute the mean of the last `window` calendar days, ending on the last day.
+
+    Days without readings count as neither readings nor zeros, so the mean is
+    over the readings that fall in the window.
+
+    Args:
+        days (numpy.ndarray): Day number of every reading.
+        values (numpy.ndarray): Value of every reading.
+        windows (tuple): Window lengths in days.
+
+    Returns:
+        dict: 'rolling_<n>d' for every window, with the mean or None for an empty window.
+    """
+    result = {}
+    if len(days) == 0:
+        return {f"rolling_{window}d": None for window in windows}
+    unique_days, sums, counts = daily_means(days, values)
+    # Prefix sums over a dense day grid make every window a difference of two entries
+    grid = unique_days - unique_days[0]
+    dense_sums = np.zeros(grid[-1] + 2)
+    dense_counts = np.zeros(grid[-1] + 2)
+    dense_sums[grid + 1] = sums
+    dense_counts[grid + 1] = counts
+    dense_sums = np.cumsum(dense_sums)
+    dense_counts = np.cumsum(dense_counts)
+    last = grid[-1] + 1
+    for window in windows:
+        first = max(0, last - window)
+        count = dense_counts[last] - dense_counts[first]
+        result[f"rolling_{window}d"] = (
+            round(float((dense_sums[last] - dense_sums[first]) / count), 2) if count else None)
+    return result
+
+def linear_trend(minutes, values):
+    """
+    Fit a least-squares line through a series.
+
+    Args:
+        minutes (numpy.ndarray): Local minutes since the epoch of every reading.
+        values (numpy.ndarray): Value of every reading.
+
+    Returns:
+        dict: The slope per day and per week, the intercept at the first reading and
+        the R² of the fit, or Nones for fewer than two distinct times.
+    """
+    empty = {"slope_per_day": None, "slope_per_week": None, "intercept": None, "r2": None}
+    if len(minutes) < 2:
+        return empty
+    x = (minutes - minutes[0]) / MINUTES_PER_DAY
+    y = values.astype(np.float64)
+    x_centered = x - x.mean()
+    y_centered = y - y.mean()
+    sxx = float(np.dot(x_centered, x_centered))
+    if sxx == 0:
+        return empty
+    slope = float(np.dot(x_centered, y_centered)) / sxx
+    intercept = float(y.mean() - slope * x.mean())
+    syy = float(np.dot(y_centered, y_centered))
+    r2 = 1 - float(np.sum((y_centered - slope * x_centered) ** 2)) / syy if syy else 1.0
+    return {
+        "slope_per_day": round(slope, 4),
+        "slope_per_week": round(slope * 7, 3),
+        "intercept": round(intercept, 2),
+        "r2": round(r2, 3),
+    }
+
+def describe(minutes, values):
+    """
+    Summarize one measurement of a series.
+
+    Args:
+        minutes (numpy.ndarray): Local minutes since the epoch of every reading.
+        values (numpy.ndarray): Value of every reading.
+
+    Returns:
+        dict: Mean, extremes, variability, rolling means and linear trend.
+    """
+    if len(values) == 0:
+        return {"mean": None, "min": None, "max": None, "std": None, "cv": None,
+                **rolling_means(minutes, values), **linear_trend(minutes, values)}
+    values = values.astype(np.float64)
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+    return {
+        "mean": round(mean, 2),
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "std": round(std, 2),
+        "cv": round(std / mean, 4) if mean else None,
+        **rolling_means(minutes // MINUTES_PER_DAY, values),
+        **linear_trend(minutes, values),
+    }
+
+def hour_mask(minutes, hours):
+    """
+    Select the readings taken within a range of local hours.
+
+    Args:
+        minutes (numpy.ndarray): Local minutes since the epoch of every reading.
+        hours (tuple): (first hour, hour after the last).
+
+    Returns:
+        numpy.ndarray: Boolean mask of the readings in the range.
+    """
+    hour = (minutes % MINUTES_PER_DAY) // 60
+    return (hour >= hours[0]) & (hour < hours[1])
+
+def classify_blood_pressure(systolic, diastolic):
+    """
+    Count the readings of each AHA blood pressure category.
+
+    Args:
+        systolic (numpy.ndarray): Systolic values.
+        diastolic (numpy.ndarray): Diastolic values.
+
+    Returns:
+        dict: Number of readings per category, from 'normal' to 'crisis'.
+    """
+    conditions = [(systolic > high_sys) | (diastolic > high_dia)
+                  for _, high_sys, high_dia in BP_CATEGORIES]
+    names = [name for name, _, _ in BP_CATEGORIES]
+    # Elevated is the only category that needs both values: systolic 120-129 and diastolic below 80
+    conditions.append((systolic >= 120) & (diastolic < 80))
+    names.append('elevated')
+    labels = np.select(conditions, np.arange(len(names)), default=len(names))
+    counts = np.bincount(labels, minlength=len(names) + 1)
+    result = {"normal": int(counts[-1])}
+    for index, name in reversed(list(enumerate(names))):
+        result[name] = int(counts[index])
+    return result
+
+def span(minutes):
+    """
+    Describe the time span of a series.
+
+    Args:
+        minutes (numpy.ndarray): Local minutes since the epoch of every reading.
+
+    Returns:
+        dict: Number of readings and the first and last local date and time.
+    """
+    return {
+        "count": int(len(minutes)),
+        "first": format_timestamp(int(minutes[0]) * 60) if len(minutes) else None,
+        "last": format_timestamp(int(minutes[-1]) * 60) if len(minutes) else None,
+    }
+
+def blood_pressure_stats(series):
+    """
+    Compute the statistics of a blood pressure series.
+
+    Args:
+        series (dict): Arrays as returned by `load_series`.
+
+    Returns:
+        dict: Span, per-measurement summaries, morning and evening means and category counts.
+    """
+    minutes = series['minutes']
+    result = span(minutes)
+    for name in ('systolic', 'diastolic', 'pulse'):
+        result[name] = describe(minutes, series[name])
+
+    for period, hours in (('morning', MORNING_HOURS), ('evening', EVENING_HOURS)):
+        mask = hour_mask(minutes, hours)
+        count = int(mask.sum())
+        result[period] = {
+            "count": count,
+            **{name: round(float(series[name][mask].mean()), 1) if count else None
+               for name in ('systolic', 'diastolic', 'pulse')},
+        }
+    morning, evening = result['morning'], result['evening']
+    result['morning_evening_difference'] = {
+        name: round(morning[name] - evening[name], 1)
+        if morning[name] is not None and evening[name] is not None else None
+        for name in ('systolic', 'diastolic', 'pulse')
+    }
+    result['categories'] = classify_blood_pressure(series['systolic'], series['diastolic'])
+    return result
+
+def weight_stats(series):
+    """
+    Compute the statistics of a weight series.
+
+    Args:
+        series (dict): Arrays as returned by `load_series`.
+
+    Returns:
+        dict: Span and the weight summary, with the change from the first to the last reading.
+    """
+    minutes, weight = series['minutes'], series['weight_value']
+    result = span(minutes)
+    result['weight'] = describe(minutes, weight)
+    result['weight']['change'] = round(float(weight[-1] - weight[0]), 2) if len(weight) else None
+    return result
+
+def medication_stats(series):
+    """
+    Compute the statistics of a medication series.
+
+    Args:
+        series (dict): Arrays as returned by `load_series`.
+
+    Returns:
+        dict: Span, taken and missed counts, and the adherence summary.
+    """
+    minutes, taken = series['minutes'], series['taken']
+    result = span(minutes)
+    result['taken'] = int(taken.sum())
+    result['missed'] = int(len(taken) - taken.sum())
+    result['adherence'] = describe(minutes, taken)
+    return result
+
+# Statistics function of each metric
+STATS_FUNCTIONS = {
+    'blood_pressure': blood_pressure_stats,
+    'weight': weight_stats,
+    'medications': medication_stats,
+}
+
+def compute_stats(metric, user_id, start_date=None, end_date=None, until=None):
+    """
+    Load a user's series for a range and compute its statistics.
+
+    Medication statistics include the doses of the user's schedules that are due.
+
+    Args:
+        metric (str): One of the keys of STATS_COLUMNS.
+        user_id (int): ID of the user who owns the readings.
+        start_date (int, optional): Start timestamp of the range, or None for all time.
+        end_date (int, optional): End timestamp of the range, or None for all time.
+        until (int, optional): Time up to which scheduled doses are due; defaults to now.
+
+    Returns:
+        dict: The statistics of the metric.
+    """
+    series = load_series(metric, user_id, start_date, end_date)
+    if metric == 'medications':
+        series = merge_doses(series, *due_dose_columns(user_id, start_date, end_date, until))
+    return STATS_FUNCTIONS[metric](series)
@@ -0,0 +1,60 @@
+"""
+Bulk Helpers for the Healthsome application.
+
+This module parses the selections of the bulk actions of the metric
+blueprints. Every bulk action runs as one set-based statement: the selected
+record IDs are bound as a single JSON array and expanded with `json_each`,
+so the statement does not depend on SQLite's limit on bound parameters, and
+a range of local days is matched with one indexed range on `ts`.
+"""
+
+import msgspec
+
+from helpers.datetime_helpers import MAX_TZ_OFFSET, MIN_TZ_OFFSET, SECONDS_PER_DAY, epoch_day
+
+# SQL condition selecting the records whose ID is in a JSON array parameter and
+# that belong to a user; the unary + keeps the planner from walking the user's
+# index instead of looking up each ID by rowid
+SELECTED_IDS_SQL = "id IN (SELECT value FROM json_each(?)) AND +user_id = ?"
+
+# SQL condition selecting the records whose local day is between two day numbers
+LOCAL_DAYS_SQL = "ts BETWEEN ? AND ? AND (ts + tz_offset * 60) / 86400 BETWEEN ? AND ?"
+
+def parse_ids(values):
+    """
+    Parse the record IDs selected in a form.
+
+    Args:
+        values (list): IDs as strings; invalid ones are ignored.
+
+    Returns:
+        str: The distinct IDs as a JSON array, for binding to SELECTED_IDS_SQL.
+    """
+    ids = {int(value) for value in values if value.isdigit()}
+    return msgspec.json.encode(sorted(ids)).decode()
+
+def local_days_params(first_day, last_day=None):
+    """
+    Build the parameters of LOCAL_DAYS_SQL for a range of local days.
+
+    The range on `ts` is widened by the largest time zone offsets so it holds
+    every reading of those days wherever it was recorded; the second condition
+    then keeps the readings of the exact local days.
+
+    Args:
+        first_day (str): First local day as 'YYYY-MM-DD'.
+        last_day (str, optional): Last local day as 'YYYY-MM-DD'; defaults to `first_day`.
+
+    Returns:
+        tuple: (ts start, ts end, first day number, last day number).
+
+    Raises:
+        ValueError: If a day is invalid or the last day is before the first.
+    """
+    first = epoch_day(first_day)
+    last = epoch_day(last_day or first_day)
+    if last < first:
+        raise ValueError("The last day is before the first day.")
+    return (first * SECONDS_PER_DAY - MAX_TZ_OFFSET * 60,
+            (last + 1) * SECONDS_PER_DAY - 1 - MIN_TZ_OFFSET * 60,
+            first, last)
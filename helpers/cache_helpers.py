@@ -0,0 +1,305 @@
+"""
+Cache Helpers for the Healthsome application.
+
+This module provides a per-process LRU cache for serialized chart responses.
+Entries are keyed by (user_id, metric, params) and carry a strong ETag, so
+repeat requests are answered from memory or with 304 Not Modified. The write
+paths of each metric blueprint invalidate exactly the entries of the user and
+metric they changed, and the user's dashboard. Writes handled by other worker
+processes are seen through a version board shared by all of them in a
+memory-mapped file: every write stores a new token for the user and metric,
+and each key includes the token it was built under, so a cache hit costs
+neither a SQL query nor serialization.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+from helpers.json_helpers import encode_json
+
+# Cache key name of the home page dashboard, which depends on every metric
+DASHBOARD = 'dashboard'
+
+# Suffix of the version board file, next to the database file
+VERSION_BOARD_SUFFIX = '-versions'
+
+# One unsigned 64-bit token per slot
+TOKEN = struct.Struct('<Q')
+
+def compute_etag(body):
+    """
+    Compute a strong ETag for a response body.
+
+    Args:
+        body (bytes): Serialized response body.
+
+    Returns:
+        str: Hex digest of the body.
+    """
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+class ResponseCache:
+    """
+    A bounded, thread-safe LRU cache of serialized response bodies.
+
+    Entries expire after `ttl` seconds as a safety net for writes made outside
+    the application, e.g. by scripts, which do not update the version board.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of cached responses.
+            ttl (float): Seconds an entry stays valid; 0 disables expiry.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Look up a cached response and mark it as recently used.
+
+        Args:
+            key (tuple): Cache key starting with (user_id, metric).
+
+        Returns:
+            tuple: (body, etag), or None if the key is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and entry[2] < time.monotonic()):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key, body):
+        """
+        Store a response body, evicting the least recently used entries if full.
+
+        Args:
+            key (tuple): Cache key starting with (user_id, metric).
+            body (bytes): Serialized response body.
+
+        Returns:
+            str: The strong ETag of the body.
+        """
+        etag = compute_etag(body)
+        with self._lock:
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return etag
+
+    def invalidate(self, user_id, metric):
+        """
+        Drop every cached response of one user's metric.
+
+        Args:
+            user_id (int): ID of the user whose data changed.
+            metric (str): Name of the metric that changed.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == user_id and key[1] == metric]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """
+        Report cache usage counters.
+
+        Returns:
+            dict: Entry count, hits, misses, evictions and invalidations.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+class VersionBoard:
+    """
+    Tokens of the cached data of every user and metric, shared by the worker processes.
+
+    The tokens live in a memory-mapped file with one slot per hash of (user_id, metric).
+    Writes store a new random token after committing, and cached responses are keyed by
+    the token read before they were built, so a write handled by any process makes every
+    process rebuild, while a cache hit only reads 8 bytes of shared memory. Users and
+    metrics sharing a slot only cause extra rebuilds.
+    """
+
+    def __init__(self, path, slots=65536):
+        """
+        Open the board, creating the file if needed.
+
+        Args:
+            path (str): Path of the board file.
+            slots (int): Number of token slots.
+        """
+        self.path = path
+        self.slots = slots
+        size = slots * TOKEN.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _offset(self, user_id, metric):
+        """
+        Get the offset of the slot of a user's metric.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): Name of the metric.
+
+        Returns:
+            int: Byte offset of the slot in the board.
+        """
+        return zlib.crc32(f"{user_id}:{metric}".encode()) % self.slots * TOKEN.size
+
+    def get(self, user_id, metric):
+        """
+        Read the current token of a user's metric.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): Name of the metric.
+
+        Returns:
+            int: The token, 0 if the metric was never written.
+        """
+        return TOKEN.unpack_from(self._map, self._offset(user_id, metric))[0]
+
+    def bump(self, user_id, metric):
+        """
+        Store a new token for a user's metric after its data changed.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): Name of the metric.
+        """
+        # Random rather than incremented, so concurrent writers never store the same token
+        TOKEN.pack_into(self._map, self._offset(user_id, metric), int.from_bytes(os.urandom(8), 'little'))
+
+def get_response_cache():
+    """
+    Get the response cache of the current application, creating it on first use.
+
+    Returns:
+        ResponseCache: The cache for the current application.
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        cache = ResponseCache(current_app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+                              current_app.config.get('RESPONSE_CACHE_TTL', 300))
+        current_app.extensions['response_cache'] = cache
+    return cache
+
+def get_version_board():
+    """
+    Get the version board of the current application's database, opening it on first use.
+
+    Returns:
+        VersionBoard: The board in `<DATABASE_FILE>-versions`.
+    """
+    path = current_app.config['DATABASE_FILE'] + VERSION_BOARD_SUFFIX
+    board = current_app.extensions.get('version_board')
+    if board is None or board.path != path:
+        board = VersionBoard(path, current_app.config.get('RESPONSE_CACHE_VERSION_SLOTS', 65536))
+        current_app.extensions['version_board'] = board
+    return board
+
+def cached_body(user_id, metric, params, build):
+    """
+    Get a serialized response body from the cache, or build, serialize and cache it.
+
+    Args:
+        user_id (int): ID of the user the response belongs to.
+        metric (str): Name of the metric the response is built from.
+        params (tuple): Every other value the response depends on.
+        build (callable): Returns the response data when it is not cached.
+
+    Returns:
+        tuple: (body, etag).
+    """
+    cache = get_response_cache()
+    key = (user_id, metric, get_version_board().get(user_id, metric)) + tuple(params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    body = encode_json(build())
+    if len(body) <= current_app.config.get('RESPONSE_CACHE_MAX_BODY_BYTES', 1048576):
+        return body, cache.set(key, body)
+    return body, compute_etag(body)  # Too large to keep, but still revalidatable
+
+def cached_json(user_id, metric, params, build):
+    """
+    Serve a JSON response from the cache, or build, serialize and cache it.
+
+    Answers with 304 Not Modified when the request's If-None-Match header
+    matches the ETag of the current response.
+
+    Args:
+        user_id (int): ID of the user the response belongs to.
+        metric (str): Name of the metric the response is built from.
+        params (tuple): Every other value the response depends on.
+        build (callable): Returns the response data when it is not cached.
+
+    Returns:
+        Response: The JSON or 304 response with a strong ETag.
+    """
+    if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return current_app.response_class(encode_json(build()), mimetype='application/json')
+
+    body, etag = cached_body(user_id, metric, params, build)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def invalidate_cache(user_id, metric):
+    """
+    Drop the cached responses of one user's metric after a write.
+
+    Must be called once the write is committed; the new tokens on the version
+    board make the other worker processes rebuild their entries too.
+
+    Args:
+        user_id (int): ID of the user whose data changed.
+        metric (str): Name of the metric that changed.
+    """
+    if current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        cache = get_response_cache()
+        board = get_version_board()
+        for name in (metric, DASHBOARD):  # The dashboard summarizes every metric
+            board.bump(user_id, name)
+            cache.invalidate(user_id, name)
@@ -0,0 +1,143 @@
+"""
+Dashboard Helpers for the Healthsome application.
+
+This module builds the home page overview of all three metrics: the latest
+reading, a daily trend and the week-over-week change of blood pressure and
+weight, and the medication adherence (including the due doses of the user's
+schedules). Every query runs inside one read
+transaction, so the overview is taken from a single consistent snapshot, and
+the trends are read from the daily rollups instead of the raw readings.
+"""
+
+from datetime import date, timedelta
+
+from helpers.datetime_helpers import LOCAL_TIME_SQL, SECONDS_PER_DAY, epoch_day
+from helpers.db_helpers import query_db, read_transaction
+from helpers.schedule_helpers import due_dose_columns
+
+# Latest reading of each metric, served by the (user_id, ts, ...) covering indexes
+LATEST_QUERIES = {
+    'blood_pressure': f"SELECT {LOCAL_TIME_SQL} AS date_time, systolic, diastolic, pulse "
+                      "FROM blood_pressure WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+    'weight': f"SELECT {LOCAL_TIME_SQL} AS date_time, weight_value "
+              "FROM weight WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+    'medications': f"SELECT {LOCAL_TIME_SQL} AS date_time, medication_name, dosage, taken "
+                   "FROM medications WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+}
+
+def daily_rollups(metric, user_id, first_day, last_day):
+    """
+    Fetch a user's daily rollups between two dates, oldest first.
+
+    Args:
+        metric (str): One of the keys of LATEST_QUERIES.
+        user_id (int): ID of the user who owns the readings.
+        first_day (str): First day as 'YYYY-MM-DD'.
+        last_day (str): Last day as 'YYYY-MM-DD'.
+
+    Returns:
+        list: Rollup rows.
+    """
+    return query_db(
+        f"SELECT * FROM {metric}_rollups WHERE user_id = ? AND period = 'day' "
+        "AND bucket BETWEEN ? AND ? ORDER BY bucket ASC",
+        (user_id, first_day, last_day)
+    )
+
+def mean_change(rows, column, week_start):
+    """
+    Compare the mean of a measurement over the last seven days with the seven days before.
+
+    Args:
+        rows (list): Daily rollup rows with `samples` and `<column>_sum` columns.
+        column (str): Name of the measurement.
+        week_start (str): First day of the last seven days as 'YYYY-MM-DD'.
+
+    Returns:
+        float: The difference of the means, or None if either week has no readings.
+    """
+    totals = {True: [0, 0.0], False: [0, 0.0]}
+    for row in rows:
+        total = totals[row['bucket'] >= week_start]
+        total[0] += row['samples']
+        total[1] += row[f'{column}_sum']
+    (recent_count, recent_sum), (earlier_count, earlier_sum) = totals[True], totals[False]
+    if not recent_count or not earlier_count:
+        return None
+    return round(recent_sum / recent_count - earlier_sum / earlier_count, 1)
+
+def build_dashboard(user_id, days=30, today=None, until=None):
+    """
+    Build the overview of every metric of a user from one database snapshot.
+
+    Args:
+        user_id (int): ID of the user who owns the readings.
+        days (int): Number of days covered by the trends and the monthly adherence.
+        today (date, optional): The current server-local date.
+        until (int, optional): Time up to which scheduled doses are due; defaults to now.
+
+    Returns:
+        dict: Per metric, the latest reading and its trend or adherence summary.
+    """
+    today = today or date.today()
+    first_day = (today - timedelta(days=max(days, 14) - 1)).isoformat()
+    week_start = (today - timedelta(days=6)).isoformat()
+    previous_week_start = (today - timedelta(days=13)).isoformat()
+    last_day = today.isoformat()
+    month_start = (today - timedelta(days=days - 1)).isoformat()
+
+    with read_transaction():
+        latest = {metric: query_db(query, (user_id,), one=True)
+                  for metric, query in LATEST_QUERIES.items()}
+        blood_pressure = daily_rollups('blood_pressure', user_id, first_day, last_day)
+        weight = daily_rollups('weight', user_id, first_day, last_day)
+        medications = daily_rollups('medications', user_id, first_day, last_day)
+        # A day of margin covers every time zone; doses are then selected by their local day
+        dose_minutes, dose_taken = due_dose_columns(
+            user_id, (epoch_day(month_start) - 1) * SECONDS_PER_DAY, None, until)
+
+    recent_bp = [row for row in blood_pressure if row['bucket'] >= previous_week_start]
+    recent_weight = [row for row in weight if row['bucket'] >= previous_week_start]
+    weekly = [row for row in medications if row['bucket'] >= week_start]
+    monthly = [row for row in medications if row['bucket'] >= month_start]
+    dose_days = dose_minutes // (24 * 60)
+    weekly_doses = dose_taken[dose_days >= epoch_day(week_start)]
+    monthly_doses = dose_taken[dose_days >= epoch_day(month_start)]
+
+    def adherence(rows, scheduled):
+        doses = sum(row['doses'] for row in rows) + len(scheduled)
+        taken = sum(row['taken'] for row in rows) + int(scheduled.sum())
+        return round(taken / doses, 3) if doses else None
+
+    return {
+        "blood_pressure": {
+            "latest": dict(latest['blood_pressure']) if latest['blood_pressure'] else None,
+            "trend": [
+                {
+                    "date": row["bucket"],
+                    "systolic": round(row["systolic_sum"] / row["samples"], 1),
+                    "diastolic": round(row["diastolic_sum"] / row["samples"], 1),
+                    "pulse": round(row["pulse_sum"] / row["samples"], 1)
+                }
+                for row in blood_pressure if row["bucket"] >= month_start
+            ],
+            "systolic_change": mean_change(recent_bp, 'systolic', week_start),
+            "diastolic_change": mean_change(recent_bp, 'diastolic', week_start),
+        },
+        "weight": {
+            "latest": dict(latest['weight']) if latest['weight'] else None,
+            "trend": [
+                {"date": row["bucket"], "weight": round(row["weight_sum"] / row["samples"], 2)}
+                for row in weight if row["bucket"] >= month_start
+            ],
+            "weight_change": mean_change(recent_weight, 'weight', week_start),
+        },
+        "medications": {
+            "latest": dict(latest['medications']) if latest['medications'] else None,
+            "taken": sum(row['taken'] for row in monthly) + int(monthly_doses.sum()),
+            "missed": sum(row['doses'] - row['taken'] for row in monthly)
+                      + int(len(monthly_doses) - monthly_doses.sum()),
+            "adherence_week": adherence(weekly, weekly_doses),
+            "adherence_month": adherence(monthly, monthly_doses),
+        },
+    }
@@ -1,12 +1,143 @@
 """
 Datetime Helpers for the Healthsome application.
 
-This module provides utility functions for handling datetime strings
-and calculating date ranges for filtering data.
+This module converts between the stored time of a reading and its local
+representations, and calculates date ranges for filtering data. Readings are
+stored as `ts`, UTC seconds since the epoch, plus `tz_offset`, the minutes the
+local clock they were recorded on was ahead of UTC. Their local 'YYYY-MM-DD HH:MM'
+time is formatted in one place: by `LOCAL_TIME_SQL` inside queries (it is also
+the definition of the generated `date_time` column) and by `format_timestamp`
+in Python. Both directions use integer arithmetic instead of `strptime`.
 """
 
-from datetime import datetime, timedelta
+import calendar
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 
+# SQL expression of a reading's local time, matching the generated date_time column.
+# Selecting it instead of date_time keeps queries on the covering indexes.
+LOCAL_TIME_SQL = "strftime('%Y-%m-%d %H:%M', ts + tz_offset * 60, 'unixepoch')"
+
+# SQL expression of a reading's local time in minutes since the epoch, for numeric series
+LOCAL_MINUTES_SQL = "(ts + tz_offset * 60) / 60"
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Largest time zone offsets in use, in minutes
+MIN_TZ_OFFSET = -12 * 60
+MAX_TZ_OFFSET = 14 * 60
+
+def parse_local(dt_str):
+    """
+    Split a local date and time string into its fields.
+
+    Args:
+        dt_str (str): 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DDTHH:MM', optionally with ':SS'.
+
+    Returns:
+        tuple: (year, month, day, hour, minute).
+
+    Raises:
+        ValueError: If the string is not in one of the accepted formats.
+    """
+    if len(dt_str) not in (16, 19) or dt_str[4] != '-' or dt_str[7] != '-' \
+            or dt_str[10] not in ' T' or dt_str[13] != ':':
+        raise ValueError(f"Invalid date and time: {dt_str!r}")
+    fields = (int(dt_str[0:4]), int(dt_str[5:7]), int(dt_str[8:10]),
+              int(dt_str[11:13]), int(dt_str[14:16]))
+    year, month, day, hour, minute = fields
+    if not (1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]
+            and hour < 24 and minute < 60):
+        raise ValueError(f"Invalid date and time: {dt_str!r}")
+    return fields
+
+def server_offset(fields):
+    """
+    Get the offset of the server's time zone at a local date and time.
+
+    Args:
+        fields (tuple): (year, month, day, hour, minute) as returned by `parse_local`.
+
+    Returns:
+        int: Minutes the server's local time is ahead of UTC at that time.
+    """
+    wall = calendar.timegm(fields + (0,))
+    return (wall - int(time.mktime(fields + (0, 0, 0, -1)))) // 60
+
+def parse_tz_offset(value):
+    """
+    Parse a time zone offset sent by a client.
+
+    Args:
+        value (str): Minutes ahead of UTC, e.g. '120' or '-300'.
+
+    Returns:
+        int: The offset, or None if it is missing or out of range.
+    """
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        return None
+    return offset if MIN_TZ_OFFSET <= offset <= MAX_TZ_OFFSET else None
+
+def to_timestamp(dt_str, tz_offset=None):
+    """
+    Convert a local date and time to the stored timestamp and offset.
+
+    Args:
+        dt_str (str): Local date and time as accepted by `parse_local`.
+        tz_offset (int, optional): Minutes the local clock is ahead of UTC; defaults to
+            the server's time zone at that date and time.
+
+    Returns:
+        tuple: (ts, tz_offset), with `ts` in UTC seconds since the epoch.
+    """
+    fields = parse_local(dt_str)
+    if tz_offset is None:
+        tz_offset = server_offset(fields)
+    return calendar.timegm(fields + (0,)) - tz_offset * 60, tz_offset
+
+@lru_cache(maxsize=4096)
+def format_timestamp(ts, tz_offset=0):
+    """
+    Format a stored timestamp as local date and time.
+
+    Args:
+        ts (int): UTC seconds since the epoch.
+        tz_offset (int): Minutes the local clock is ahead of UTC.
+
+    Returns:
+        str: The local date and time as 'YYYY-MM-DD HH:MM'.
+    """
+    t = time.gmtime(ts + tz_offset * 60)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}"
+
+def epoch_day(date_str):
+    """
+    Get the number of days between the epoch and a date.
+
+    Args:
+        date_str (str): The date as 'YYYY-MM-DD'.
+
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    return date.fromisoformat(date_str).toordinal() - date(1970, 1, 1).toordinal()
+
+def local_date(ts):
+    """
+    Get the server-local date of a timestamp.
+
+    Args:
+        ts (int): UTC seconds since the epoch.
+
+    Returns:
+        str: The date as 'YYYY-MM-DD'.
+    """
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+@lru_cache(maxsize=4096)
 def to_iso_format(dt_str):
     """
     Convert a datetime string from HTML datetime-local format to ISO format.
@@ -19,10 +150,12 @@ def to_iso_format(dt_str):
         If the input format is invalid, returns the original string.
     """
     try:
-        return datetime.strptime(dt_str, "%Y-%m-%dT%H:%M").strftime("%Y-%m-%d %H:%M")
+        parse_local(dt_str)
     except ValueError:
         return dt_str  # Return as-is if the format is invalid
+    return f"{dt_str[:10]} {dt_str[11:16]}"
 
+@lru_cache(maxsize=4096)
 def to_datetime_local(dt_str):
     """
     Convert a datetime string from ISO format to HTML datetime-local format.
@@ -35,30 +168,31 @@ def to_datetime_local(dt_str):
         If the input format is invalid, returns the original string.
     """
     try:
-        return datetime.strptime(dt_str, "%Y-%m-%d %H:%M").strftime("%Y-%m-%dT%H:%M")
+        parse_local(dt_str)
     except ValueError:
         return dt_str  # Return as-is if the format is invalid
+    return f"{dt_str[:10]}T{dt_str[11:16]}"
 
 def calculate_date_range(range_option):
     """
-    Calculate the start and end date based on the range option.
+    Calculate the start and end timestamps based on the range option.
+
+    Days start at midnight in the server's time zone.
 
     Args:
         range_option (str): One of 'last_week', 'last_month', or 'all_time'.
 
     Returns:
-        tuple: A start date (or None for all_time) and an end date.
+        tuple: A start and an end timestamp in UTC seconds (both None for all_time).
     """
-    now = datetime.now()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = int((today + timedelta(days=1)).timestamp()) - 1  # End of today
     if range_option == 'last_week':
-        start_date = (now - timedelta(days=7)).strftime('%Y-%m-%d 00:00:00')  # Start of 7 days ago
-        end_date = now.strftime('%Y-%m-%d 23:59:59')  # End of today
+        start_date = int((today - timedelta(days=7)).timestamp())  # Start of 7 days ago
     elif range_option == 'last_month':
-        start_date = (now - timedelta(days=30)).strftime('%Y-%m-%d 00:00:00')  # Start of 30 days ago
-        end_date = now.strftime('%Y-%m-%d 23:59:59')  # End of today
+        start_date = int((today - timedelta(days=30)).timestamp())  # Start of 30 days ago
     else:
         start_date = None  # No start date for 'all_time'
         end_date = None    # No end date for 'all_time'
 
     return start_date, end_date
-
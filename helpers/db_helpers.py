@@ -3,26 +3,687 @@ Database Helpers for the Healthsome application.
 
 This module provides utility functions for interacting with the SQLite database,
 including executing queries, managing connections, and ensuring proper resource cleanup.
+Connections are handed out by a per-process pool of pragma-tuned connections that
+are returned to the pool when the application context is torn down. When request
+metrics are enabled, the query helpers report each statement's time and row count
+to the request's `g.sql_stats`, and statements over the slow query threshold are
+written to the slow query log with their plan. With group commit enabled, single
+writes from concurrent requests are committed together by a per-process writer
+thread instead of each paying for its own transaction. With `SHARD_COUNT`
+above 1, the statements of a request go to the shard database of its user
+(see `helpers/shard_helpers.py`), with a pool and a writer per shard, and
+only the users and sessions queries go to the directory database.
 """
 
 import os
+import queue
+import random
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 
-from flask import g
+from flask import current_app, g, has_request_context, session
+
+from helpers.shard_helpers import get_shard_count, shard_file, shard_for
+from helpers.slow_query_helpers import get_slow_query_log
 
 DATABASE = os.getenv('DB_FILE', 'healthsome.db')
 
-def get_db():
+# Accepted values of the synchronous pragma
+SYNCHRONOUS_MODES = {"OFF": "OFF", "NORMAL": "NORMAL", "FULL": "FULL", "EXTRA": "EXTRA"}
+
+# Upper bounds of the reported group commit batch size buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available within the pool timeout."""
+
+class ConnectionPool:
+    """
+    A bounded pool of warmed SQLite connections.
+
+    Connections are opened on demand up to `size`, configured once with the
+    tuning pragmas, health-checked before being handed out and reused across
+    requests instead of being reopened every time.
+    """
+
+    def __init__(self, database, size=5, timeout=10.0, busy_timeout=5000,
+                 mmap_size=268435456, cache_size=-16000, health_check=True, synchronous="NORMAL",
+                 foreign_keys=True):
+        """
+        Initialize the pool.
+
+        Args:
+            database (str): Path to the SQLite database file.
+            size (int): Maximum number of open connections.
+            timeout (float): Seconds to wait for a free connection before giving up.
+            busy_timeout (int): Milliseconds SQLite waits on a locked database.
+            mmap_size (int): Bytes of the database file to memory-map.
+            cache_size (int): Page cache size (negative values are in KiB).
+            health_check (bool): Whether to verify connections before handing them out.
+            synchronous (str): SQLite synchronous mode, e.g. 'NORMAL' or 'FULL'.
+            foreign_keys (bool): Whether to enforce foreign keys.
+        """
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.health_check = health_check
+        self.synchronous = synchronous
+        self.foreign_keys = foreign_keys
+        self.pid = os.getpid()
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._replaced = 0
+
+    def _connect(self):
+        """
+        Open a new connection and apply the tuning pragmas.
+
+        Returns:
+            sqlite3.Connection: The configured connection.
+        """
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Switching the journal mode needs an exclusive lock that is not retried
+        # on busy, so only switch a database that is not in WAL mode yet
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS_MODES[self.synchronous.upper()]}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if self.foreign_keys else 'OFF'}")
+        return conn
+
+    def _is_healthy(self, conn):
+        """
+        Check that a pooled connection is still usable.
+
+        Args:
+            conn (sqlite3.Connection): The connection to check.
+
+        Returns:
+            bool: True if the connection answered a trivial query.
+        """
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """
+        Take a connection from the pool, opening a new one if the pool is not full.
+
+        Returns:
+            sqlite3.Connection: A healthy connection.
+
+        Raises:
+            PoolTimeoutError: If no connection becomes available within the timeout.
+        """
+        conn = None
+        with self._lock:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = False  # Open outside the lock
+
+        if conn is False:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        elif conn is None:
+            started = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._waits += 1
+                    self._timeouts += 1
+                    self._wait_time += time.perf_counter() - started
+                raise PoolTimeoutError(
+                    f"No database connection available within {self.timeout} seconds") from None
+            with self._lock:
+                self._waits += 1
+                self._wait_time += time.perf_counter() - started
+
+        if self.health_check and not self._is_healthy(conn):
+            conn = self._replace(conn)
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return conn
+
+    def _replace(self, conn):
+        """
+        Close a broken connection and open a fresh one in its place.
+
+        Args:
+            conn (sqlite3.Connection): The broken connection.
+
+        Returns:
+            sqlite3.Connection: The replacement connection.
+        """
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._replaced += 1
+        try:
+            return self._connect()
+        except sqlite3.Error:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def release(self, conn):
+        """
+        Return a connection to the pool, rolling back any unfinished transaction.
+
+        Args:
+            conn (sqlite3.Connection): The connection to return.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._in_use -= 1
+                self._opened -= 1
+                self._replaced += 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def stats(self):
+        """
+        Report pool usage counters for sizing the pool.
+
+        Returns:
+            dict: Pool size, open/idle/in-use connections, wait counts and times.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time_total": round(self._wait_time, 6),
+                "wait_time_avg": round(self._wait_time / self._waits, 6) if self._waits else 0.0,
+                "timeouts": self._timeouts,
+                "replaced": self._replaced,
+            }
+
+    def close(self):
+        """
+        Close every idle connection in the pool.
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+def create_pool(config, shard=None):
+    """
+    Create a connection pool from the application configuration.
+
+    Args:
+        config (dict): Flask application configuration.
+        shard (int, optional): Index of the shard to connect to; defaults to the directory.
+
+    Returns:
+        ConnectionPool: The configured pool.
+    """
+    database = config.get('DATABASE_FILE', DATABASE)
+    if shard is not None:
+        database = shard_file(database, shard, config.get('SHARD_COUNT', 1),
+                              config.get('SHARD_FILE_TEMPLATE', ''))
+    return ConnectionPool(
+        database,
+        size=config.get('DB_POOL_SIZE', 5),
+        timeout=config.get('DB_POOL_TIMEOUT', 10.0),
+        busy_timeout=config.get('DB_BUSY_TIMEOUT_MS', 5000),
+        mmap_size=config.get('DB_MMAP_SIZE', 268435456),
+        cache_size=config.get('DB_CACHE_SIZE', -16000),
+        health_check=config.get('DB_POOL_HEALTH_CHECK', True),
+        synchronous=config.get('DB_SYNCHRONOUS', 'NORMAL'),
+        # Shards hold no users rows, so their user_id references cannot be enforced
+        foreign_keys=shard is None,
+    )
+
+def get_pool(shard=None):
+    """
+    Get a connection pool of the current application for this process.
+
+    A pool inherited from a parent process (e.g. a preloading gunicorn master)
+    is discarded and recreated, since SQLite connections must not cross a fork.
+
+    Args:
+        shard (int, optional): Index of the shard; defaults to the directory database.
+
+    Returns:
+        ConnectionPool: The pool for the current application.
+    """
+    if shard is None:
+        pool = current_app.extensions.get('db_pool')
+    else:
+        pool = current_app.extensions.setdefault('db_shard_pools', {}).get(shard)
+    if pool is None or pool.pid != os.getpid():
+        pool = create_pool(current_app.config, shard)
+        if shard is None:
+            current_app.extensions['db_pool'] = pool
+        else:
+            current_app.extensions['db_shard_pools'][shard] = pool
+    return pool
+
+def get_shard_pools():
+    """
+    Get the pools of every shard of the current application for this process.
+
+    Returns:
+        dict: Pools by shard index, empty if the database is not sharded.
+    """
+    shard_count = current_app.config.get('SHARD_COUNT', 1)
+    if shard_count <= 1:
+        return {}
+    return {shard: get_pool(shard) for shard in range(shard_count)}
+
+def check_shard_layout(shard_count):
+    """
+    Verify once per application that the directory was sharded as configured.
+
+    Args:
+        shard_count (int): The configured number of shards.
+
+    Raises:
+        RuntimeError: If the directory records a different number of shards.
+    """
+    if current_app.extensions.get('shard_layout') == shard_count:
+        return
+    stored = get_shard_count(get_db(directory=True))
+    if stored != shard_count:
+        raise RuntimeError(
+            f"SHARD_COUNT is {shard_count} but the database has {stored} shard(s); "
+            f"run rebalance_shards.py --shards {shard_count} with the application stopped.")
+    current_app.extensions['shard_layout'] = shard_count
+
+def current_shard():
+    """
+    Get the shard the statements of the current context go to.
+
+    That is the shard of the user routed with `route_user`, or else of the
+    logged-in user, unless the context is inside `directory_db`.
+
+    Returns:
+        int: Index of the shard, or None for the directory database.
+    """
+    shard_count = current_app.config.get('SHARD_COUNT', 1)
+    if shard_count <= 1 or g.get('db_directory'):
+        return None
+    user_id = g.get('db_user_id')
+    if user_id is None and has_request_context():
+        user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    check_shard_layout(shard_count)
+    return shard_for(user_id, shard_count)
+
+def route_user(user_id):
+    """
+    Route the statements of the current application context to a user's shard.
+
+    Requests are routed to the logged-in user's shard without this; it is
+    for work done on behalf of a user outside of their requests.
+
+    Args:
+        user_id (int): ID of the user.
+    """
+    g.db_user_id = user_id
+
+@contextmanager
+def directory_db():
+    """
+    Run the statements of a block against the directory database.
+
+    The users table lives there whatever the shard of the current user is.
+
+    Yields:
+        sqlite3.Connection: The directory connection; the query helpers use it as well.
+    """
+    previous = g.get('db_directory', False)
+    g.db_directory = True
+    try:
+        yield get_db()
+    finally:
+        g.db_directory = previous
+
+def is_busy_error(error):
+    """
+    Check whether an SQLite error means the database was locked by another writer.
+
+    Args:
+        error (sqlite3.Error): The error raised by SQLite.
+
+    Returns:
+        bool: True for SQLITE_BUSY and SQLITE_LOCKED errors.
+    """
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+class GroupCommitWriter:
+    """
+    A writer thread that commits statements from concurrent requests together.
+
+    Callers hand a statement to `execute` and block until it is committed. The
+    writer thread takes the first queued statement, keeps collecting for up to
+    `window` seconds or `max_batch` statements, and runs the batch in one
+    `BEGIN IMMEDIATE` transaction, so the whole batch takes the write lock and
+    syncs once. Every statement runs in its own savepoint, so a failing
+    statement (e.g. a constraint violation) only fails its own caller. When the
+    database is locked by another process, the batch is rolled back and
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(self, pool, window=0.0, max_batch=64, max_retries=5, backoff=0.01,
+                 timeout=30.0):
+        """
+        Initialize the writer and start its thread.
+
+        Args:
+            pool (ConnectionPool): Pool the writer takes its connection from.
+            window (float): Seconds to wait for more statements after the first one; with 0,
+                a batch holds whatever was queued while the previous batch was committing.
+            max_batch (int): Maximum number of statements per transaction.
+            max_retries (int): Retries of a batch that found the database locked.
+            backoff (float): Seconds to wait before the first retry; doubled on each retry.
+            timeout (float): Seconds a caller waits for its statement to be committed.
+        """
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._conn = None  # Opened by the first batch, so a locked database is retried like a batch
+        self._statements = 0
+        self._batches = 0
+        self._batch_sizes = dict.fromkeys(BATCH_SIZE_BUCKETS + (float('inf'),), 0)
+        self._max_batch_size = 0
+        self._commit_time = 0.0
+        self._retries = 0
+        self._failed_batches = 0
+        self._failed_statements = 0
+
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def execute(self, query, args=()):
+        """
+        Execute a statement in the next group commit and wait for it to be committed.
+
+        Args:
+            query (str): The INSERT, UPDATE or DELETE statement.
+            args (tuple): The arguments for the statement.
+
+        Returns:
+            int: Number of rows the statement changed, or the rows of its RETURNING clause.
+
+        Raises:
+            sqlite3.Error: If the statement failed, or its batch could not be committed.
+            concurrent.futures.TimeoutError: If the statement was not committed within
+            `timeout`; it may still be committed later.
+        """
+        future = Future()
+        self._queue.put((query, args, future))
+        return future.result(self.timeout)
+
+    def _run(self):
+        """Collect queued statements into batches and commit them until closed."""
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                closing = False
+                deadline = time.perf_counter() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                self._commit(batch)
+                if closing:
+                    return
+        finally:
+            if self._conn is not None:
+                self.pool.release(self._conn)
+
+    def _apply(self, batch):
+        """
+        Run a batch in one transaction, each statement in its own savepoint.
+
+        Args:
+            batch (list): Tuples of (query, args, future).
+
+        Returns:
+            list: Row count (or returned rows) or exception of each statement.
+
+        Raises:
+            sqlite3.OperationalError: If the database was locked; the transaction is rolled back.
+        """
+        if self._conn is None:
+            self._conn = self.pool.acquire()
+        conn = self._conn
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for query, args, _ in batch:
+                conn.execute("SAVEPOINT statement")
+                try:
+                    cursor = conn.execute(query, args)
+                    # A statement with a RETURNING clause hands back its rows
+                    results.append(cursor.fetchall() if cursor.description else cursor.rowcount)
+                except sqlite3.Error as e:
+                    if is_busy_error(e):
+                        raise
+                    conn.execute("ROLLBACK TO statement")
+                    results.append(e)
+                conn.execute("RELEASE statement")
+            conn.commit()
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return results
+
+    def _commit(self, batch):
+        """
+        Commit a batch, retrying while the database is locked, and resolve its futures.
+
+        Args:
+            batch (list): Tuples of (query, args, future).
+        """
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                results = self._apply(batch)
+                break
+            except sqlite3.Error as e:
+                if is_busy_error(e) and attempt < self.max_retries:
+                    time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+                    attempt += 1
+                    continue
+                with self._lock:
+                    self._retries += attempt
+                    self._failed_batches += 1
+                    self._failed_statements += len(batch)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._statements += len(batch)
+            self._batches += 1
+            self._batch_sizes[next(bound for bound in self._batch_sizes if len(batch) <= bound)] += 1
+            self._max_batch_size = max(self._max_batch_size, len(batch))
+            self._commit_time += elapsed
+            self._retries += attempt
+            self._failed_statements += sum(isinstance(result, Exception) for result in results)
+        for (_, _, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        """
+        Report group commit counters.
+
+        Returns:
+            dict: Statement and batch counts, batch sizes, commit times, retries and failures.
+        """
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "queued": self._queue.qsize(),
+                "statements": self._statements,
+                "batches": self._batches,
+                "batch_size_avg": round(self._statements / self._batches, 2) if self._batches else 0.0,
+                "batch_size_max": self._max_batch_size,
+                "batch_sizes": {("+Inf" if bound == float('inf') else f"<={bound}"): count
+                                for bound, count in self._batch_sizes.items()},
+                "commit_time_avg": round(self._commit_time / self._batches, 6) if self._batches else 0.0,
+                "retries": self._retries,
+                "failed_batches": self._failed_batches,
+                "failed_statements": self._failed_statements,
+            }
+
+    def close(self):
+        """Commit the statements already queued and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self.pool.close()
+
+def get_writer(shard=None):
+    """
+    Get a group commit writer of the current application for this process.
+
+    A writer inherited from a parent process is recreated, since its thread
+    does not survive a fork.
+
+    Args:
+        shard (int, optional): Index of the shard; defaults to the directory database.
+
+    Returns:
+        GroupCommitWriter: The writer, or None if `GROUP_COMMIT_ENABLED` is not set.
+    """
+    if not current_app.config.get('GROUP_COMMIT_ENABLED'):
+        return None
+    writers = current_app.extensions.setdefault('db_writers', {})
+    writer = writers.get(shard)
+    if writer is None or writer.pid != os.getpid():
+        config = current_app.config
+        writer = GroupCommitWriter(
+            create_pool(dict(config, DB_POOL_SIZE=1), shard),
+            window=config.get('GROUP_COMMIT_WINDOW_MS', 0) / 1000,
+            max_batch=config.get('GROUP_COMMIT_MAX_BATCH', 64),
+            max_retries=config.get('GROUP_COMMIT_MAX_RETRIES', 5),
+            backoff=config.get('GROUP_COMMIT_BACKOFF_MS', 10) / 1000,
+            timeout=config.get('GROUP_COMMIT_TIMEOUT', 30.0),
+        )
+        writers[shard] = writer
+    return writer
+
+def init_app(app):
+    """
+    Register database connection handling with the Flask application.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    app.teardown_appcontext(close_db)
+
+def get_db(directory=False):
     """
     Get a database connection for the current application context.
 
+    One connection per database is taken from its pool and kept until the
+    context is torn down.
+
+    Args:
+        directory (bool): Whether to connect to the directory database instead
+            of the current user's shard.
+
     Returns:
         sqlite3.Connection: The database connection object.
     """
-    if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row
-    return g.db
+    shard = None if directory else current_shard()
+    connections = g.setdefault('db_connections', {})
+    if shard not in connections:
+        pool = get_pool(shard)
+        connections[shard] = (pool, pool.acquire())
+    return connections[shard][1]
+
+def _observe(db, query, args, seconds, rows, stats, slow_log):
+    """
+    Report a finished statement to the request metrics and the slow query log.
+
+    Args:
+        db (sqlite3.Connection): Connection the statement ran on.
+        query (str): The SQL statement.
+        args (tuple): The statement's parameters.
+        seconds (float): Time the statement took.
+        rows (int): Rows returned or changed.
+        stats (RequestStats): The request's SQL statistics, or None.
+        slow_log (SlowQueryLog): The slow query log, or None.
+    """
+    if stats is not None:
+        stats.record(query, seconds, rows)
+    if slow_log is not None:
+        slow_log.record(db, query, args, seconds, rows)
 
 def query_db(query, args=(), one=False):
     """
@@ -36,30 +697,178 @@ def query_db(query, args=(), one=False):
     Returns:
         list or sqlite3.Row: Query results as a list of rows or a single row if `one` is True.
     """
-    cur = get_db().execute(query, args)
+    stats = g.get('sql_stats')
+    slow_log = get_slow_query_log()
+    timed = stats is not None or slow_log is not None
+    started = time.perf_counter() if timed else 0.0
+    db = get_db()
+    cur = db.execute(query, args)
     rv = cur.fetchall()
     cur.close()
+    if timed:
+        _observe(db, query, args, time.perf_counter() - started, len(rv), stats, slow_log)
     return (rv[0] if rv else None) if one else rv
 
+def stream_db(query, args=(), chunk_size=1000):
+    """
+    Execute a SELECT query and yield the results in chunks.
+
+    Rows are fetched with `fetchmany` and returned as plain tuples, so callers
+    can process large ranges without materializing the full result set.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+        chunk_size (int): Number of rows fetched per chunk.
+
+    Yields:
+        list: Up to `chunk_size` result rows as tuples.
+    """
+    stats = g.get('sql_stats')
+    slow_log = get_slow_query_log()
+    timed = stats is not None or slow_log is not None
+    started = time.perf_counter() if timed else 0.0
+    db = get_db()
+    cur = db.execute(query, args)
+    cur.row_factory = None
+    elapsed = 0.0
+    count = 0
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if timed:
+                # Time spent by the consumer between chunks is not SQL time
+                elapsed += time.perf_counter() - started
+                count += len(rows)
+            if not rows:
+                break
+            yield rows
+            if timed:
+                started = time.perf_counter()
+    finally:
+        cur.close()
+        if timed:
+            _observe(db, query, args, elapsed, count, stats, slow_log)
+
 def execute_db(query, args=()):
     """
     Execute an INSERT, UPDATE, or DELETE query.
 
+    With group commit enabled, the statement is handed to the writer thread and
+    committed together with concurrent writes; the call still returns only
+    once it is committed.
+
     Args:
         query (str): The SQL query to execute.
         args (tuple): The arguments for the query.
 
     Returns:
-        None
+        int: Number of rows the query changed.
+    """
+    return _execute_write(query, args, returning=False)
+
+def execute_returning(query, args=()):
     """
+    Execute an INSERT, UPDATE, or DELETE query with a RETURNING clause.
+
+    The rows are changed and read by the same statement, so no other write can
+    come in between, and it takes a single round trip and commit.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+
+    Returns:
+        list: The rows of the RETURNING clause, one per changed row.
+    """
+    return _execute_write(query, args, returning=True)
+
+def _execute_write(query, args, returning):
+    """
+    Execute and commit a write statement, through the group commit writer if enabled.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+        returning (bool): Whether the query has a RETURNING clause to fetch.
+
+    Returns:
+        int or list: The number of changed rows, or the returned rows.
+    """
+    stats = g.get('sql_stats')
+    slow_log = get_slow_query_log()
+    writer = get_writer(current_shard())
+    if writer is not None:
+        started = time.perf_counter()
+        result = writer.execute(query, args)
+        if stats is not None or slow_log is not None:
+            db = get_db() if slow_log is not None else None
+            _observe(db, query, args, time.perf_counter() - started,
+                     len(result) if returning else result, stats, slow_log)
+        return result
+
     db = get_db()
+    if stats is None and slow_log is None:
+        cur = db.execute(query, args)
+        result = cur.fetchall() if returning else cur.rowcount
+        db.commit()
+        cur.close()
+        return result
+
+    started = time.perf_counter()
     cur = db.execute(query, args)
+    result = cur.fetchall() if returning else cur.rowcount
+    committing = time.perf_counter()
     db.commit()
+    committed = time.perf_counter()
     cur.close()
+    _observe(db, query, args, committing - started, len(result) if returning else result,
+             stats, slow_log)
+    if stats is not None:
+        stats.record_commit(committed - committing)
+    return result
+
+@contextmanager
+def transaction():
+    """
+    Run several statements in a single transaction.
+
+    Commits when the block completes and rolls back if it raises.
+
+    Yields:
+        sqlite3.Connection: The database connection to execute statements on.
+    """
+    db = get_db()
+    stats = g.get('sql_stats')
+    with db:
+        yield db
+        started = time.perf_counter() if stats is not None else 0.0
+    if stats is not None:
+        # Leaving the `with` block committed the transaction
+        stats.record_commit(time.perf_counter() - started)
+
+@contextmanager
+def read_transaction():
+    """
+    Run several queries against one consistent snapshot of the database.
+
+    The deferred transaction takes its WAL snapshot at the first query, so
+    every query in the block sees the same data even while other connections
+    commit. Nothing is written, and the transaction is always ended.
+
+    Yields:
+        sqlite3.Connection: The database connection; `query_db` uses it as well.
+    """
+    db = get_db()
+    db.execute("BEGIN DEFERRED")
+    try:
+        yield db
+    finally:
+        db.rollback()
 
 def close_db(e=None):
     """
-    Close the database connection if it exists.
+    Return the database connections taken by the context to their pools.
 
     Args:
         e (Exception, optional): An optional exception object.
@@ -67,7 +876,5 @@ def close_db(e=None):
     Returns:
         None
     """
-    db = g.pop('db', None)
-
-    if db is not None:
-        db.close()
+    for pool, db in g.pop('db_connections', {}).values():
+        pool.release(db)
@@ -0,0 +1,147 @@
+"""
+Downsampling Helpers for the Healthsome application.
+
+This module reduces metric series to a bounded number of chart points on the
+server. Rows are streamed from the cursor into NumPy column arrays, and the
+points to keep are selected with vectorized bucket operations:
+Largest-Triangle-Three-Buckets for smooth series, min/max buckets for series
+where spikes must survive, and per-period counts for taken/missed flags.
+"""
+
+import numpy as np
+
+from helpers.db_helpers import stream_db
+
+def fetch_columns(query, args, dtypes, chunk_size=5000):
+    """
+    Stream a query result into one NumPy array per column.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+        dtypes (list): NumPy dtype for each selected column.
+        chunk_size (int): Number of rows fetched per chunk.
+
+    Returns:
+        list: One NumPy array per column, all of the same length.
+    """
+    chunks = [[] for _ in dtypes]
+    for rows in stream_db(query, args, chunk_size):
+        for i, column in enumerate(zip(*rows)):
+            chunks[i].append(np.array(column, dtype=dtypes[i]))
+    return [
+        np.concatenate(column_chunks) if column_chunks else np.empty(0, dtype=dtype)
+        for column_chunks, dtype in zip(chunks, dtypes)
+    ]
+
+def lttb_indices(x, y, threshold):
+    """
+    Select the points to keep with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket; the area computation within a bucket is
+    vectorized.
+
+    Args:
+        x (numpy.ndarray): Point positions, ascending.
+        y (numpy.ndarray): Point values.
+        threshold (int): Maximum number of points to keep.
+
+    Returns:
+        numpy.ndarray: Sorted indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    # Average of every bucket, used as the third triangle vertex
+    x_sums = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    y_sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(x_sums / counts, x[-1])
+    avg_y = np.append(y_sums / counts, y[-1])
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = avg_x[bucket + 1], avg_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+def minmax_indices(values, n_buckets):
+    """
+    Select the minimum and maximum point of every bucket for each series.
+
+    Args:
+        values (list): Series sharing the same positions, e.g. systolic and diastolic.
+        n_buckets (int): Number of equal-count buckets.
+
+    Returns:
+        numpy.ndarray: Sorted, unique indices of the kept points.
+    """
+    n = len(values[0])
+    if n_buckets < 1 or n <= n_buckets * 2 * len(values):
+        return np.arange(n)
+
+    bucket_ids = (np.arange(n) * n_buckets) // n
+    starts = np.searchsorted(bucket_ids, np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    keep = [np.array([0, n - 1])]
+    for series in values:
+        # Sorting by (bucket, value) puts each bucket's minimum first and maximum last
+        order = np.lexsort((series, bucket_ids))
+        keep.append(order[starts])
+        keep.append(order[ends])
+    return np.unique(np.concatenate(keep))
+
+def count_buckets(minutes, flags, max_buckets):
+    """
+    Count set and unset flags per day, merging days when there are too many.
+
+    Args:
+        minutes (numpy.ndarray): Minutes since the epoch, ascending.
+        flags (numpy.ndarray): 0/1 flag per point.
+        max_buckets (int): Maximum number of buckets to return.
+
+    Returns:
+        tuple: (bucket start dates as 'YYYY-MM-DD' strings, set counts, unset counts).
+    """
+    if len(minutes) == 0:
+        return np.empty(0, dtype='U10'), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    days = minutes // (24 * 60)
+    span = int(days[-1] - days[0]) + 1
+    width = max(1, -(-span // max(1, max_buckets)))  # Days per bucket, rounded up
+    keys = days[0] + ((days - days[0]) // width) * width
+    bucket_days, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse)
+    taken = np.bincount(inverse, weights=flags).astype(np.int64)
+    labels = bucket_days.astype('datetime64[D]').astype('U10')
+    return labels, taken, totals - taken
+
+def get_max_points(value, limit):
+    """
+    Parse a requested point budget for a chart.
+
+    Args:
+        value (str): The requested number of points, e.g. from the query string.
+        limit (int): Largest allowed number of points.
+
+    Returns:
+        int: The point budget, or None if no valid budget was requested.
+    """
+    try:
+        max_points = int(value)
+    except (TypeError, ValueError):
+        return None
+    return max(3, min(max_points, limit))
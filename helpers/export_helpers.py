@@ -0,0 +1,208 @@
+"""
+Export Helpers for the Healthsome application.
+
+This module streams a user's full metric history as CSV or NDJSON, and all
+metrics together as a ZIP archive. Rows are read with `fetchmany` and encoded
+one chunk at a time, so memory use stays constant however many records a user
+has. The exported columns match the import format, so an export can be
+imported again as is.
+"""
+
+import csv
+import io
+import zipfile
+import zlib
+from datetime import datetime
+
+import msgspec
+from flask import Response, request, stream_with_context
+
+from helpers.datetime_helpers import LOCAL_TIME_SQL
+from helpers.db_helpers import stream_db
+from helpers.import_helpers import IMPORT_COLUMNS
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+
+encoder = msgspec.json.Encoder()
+
+def export_query(metric, user_id):
+    """
+    Build the query for a user's full history of a metric, oldest first.
+
+    Args:
+        metric (str): One of the keys of IMPORT_COLUMNS.
+        user_id (int): ID of the user who owns the records.
+
+    Returns:
+        tuple: The SQL query and its parameters.
+    """
+    # The local time is selected as an expression so the query stays on the covering index
+    columns = ', '.join((LOCAL_TIME_SQL,) + IMPORT_COLUMNS[metric][1:])
+    query = (f"SELECT {columns} FROM {metric} WHERE user_id = ? "
+             "ORDER BY ts ASC, id ASC")
+    return query, (user_id,)
+
+def iter_csv(metric, user_id, chunk_size=1000):
+    """
+    Encode a user's records of a metric as CSV, one chunk of rows at a time.
+
+    Args:
+        metric (str): One of the keys of IMPORT_COLUMNS.
+        user_id (int): ID of the user who owns the records.
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Yields:
+        bytes: The header line, then consecutive chunks of CSV lines.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(IMPORT_COLUMNS[metric])
+    yield buffer.getvalue().encode()
+
+    query, params = export_query(metric, user_id)
+    for rows in stream_db(query, params, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+def iter_ndjson(metric, user_id, chunk_size=1000):
+    """
+    Encode a user's records of a metric as NDJSON, one chunk of rows at a time.
+
+    Args:
+        metric (str): One of the keys of IMPORT_COLUMNS.
+        user_id (int): ID of the user who owns the records.
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Yields:
+        bytes: Consecutive chunks of JSON lines.
+    """
+    columns = IMPORT_COLUMNS[metric]
+    query, params = export_query(metric, user_id)
+    for rows in stream_db(query, params, chunk_size):
+        yield encoder.encode_lines([dict(zip(columns, row)) for row in rows])
+
+ENCODERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compress a stream of byte chunks into a single gzip stream.
+
+    Args:
+        chunks (iterable): Byte chunks to compress.
+        level (int): zlib compression level from 1 to 9.
+
+    Yields:
+        bytes: Consecutive pieces of the gzip stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class _StreamBuffer:
+    """A write-only, unseekable file that hands out what was written so far."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        """Collect written bytes."""
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        """Nothing to flush; the bytes are handed out by `drain`."""
+
+    def drain(self):
+        """
+        Take the bytes written since the last call.
+
+        Returns:
+            bytes: The collected bytes.
+        """
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def iter_archive(user_id, file_format='csv', chunk_size=1000):
+    """
+    Stream every metric of a user as a ZIP archive with one file per metric.
+
+    The archive is written to an unseekable buffer, so `zipfile` stores sizes
+    and checksums in data descriptors after each file and nothing has to be
+    buffered beyond the current chunk.
+
+    Args:
+        user_id (int): ID of the user who owns the records.
+        file_format (str): 'csv' or 'ndjson'.
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Yields:
+        bytes: Consecutive pieces of the ZIP archive.
+    """
+    buffer = _StreamBuffer()
+    encode = ENCODERS[file_format]
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for metric in IMPORT_COLUMNS:
+            info = zipfile.ZipInfo(f"{metric}.{file_format}",
+                                   date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=True) as member:
+                for chunk in encode(metric, user_id, chunk_size):
+                    member.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()  # Central directory
+
+def wants_gzip():
+    """
+    Check whether the current request asked for a gzip-compressed export.
+
+    Returns:
+        bool: True if `?gzip=1` was passed and the client accepts gzip.
+    """
+    return request.args.get('gzip') == '1' and 'gzip' in request.accept_encodings
+
+def export_response(chunks, filename, mimetype, compress=False, level=6):
+    """
+    Stream exported chunks to the client as a file download.
+
+    The response has no Content-Length, so it is sent with chunked transfer
+    encoding. With `compress`, the body is gzip-encoded on the fly.
+
+    Args:
+        chunks (iterable): Byte chunks of the file.
+        filename (str): Name of the downloaded file.
+        mimetype (str): Content type of the file.
+        compress (bool): Whether to gzip the response body.
+        level (int): zlib compression level from 1 to 9.
+
+    Returns:
+        Response: A streaming download response.
+    """
+    if compress:
+        chunks = gzip_chunks(chunks, level)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,279 @@
+"""
+Import Helpers for the Healthsome application.
+
+This module bulk-imports metric records from CSV or NDJSON uploads. The file
+is parsed as a stream, rows are validated in batches and each batch is
+inserted with `executemany`, all inside a single transaction. Invalid rows
+are skipped and reported with their line number, so memory use stays bounded
+by the batch size no matter how large the file is.
+"""
+
+import csv
+import io
+from datetime import datetime
+
+import msgspec
+
+from helpers.datetime_helpers import to_timestamp
+from helpers.db_helpers import transaction
+
+# Columns of the import and export files of each metric
+IMPORT_COLUMNS = {
+    'blood_pressure': ('date_time', 'systolic', 'diastolic', 'pulse'),
+    'weight': ('date_time', 'weight_value'),
+    'medications': ('date_time', 'medication_name', 'dosage', 'taken'),
+}
+
+# Accepted spellings of the medications 'taken' flag
+TAKEN_VALUES = {
+    '1': 1, 'true': 1, 'yes': 1, 'taken': 1,
+    '0': 0, 'false': 0, 'no': 0, 'missed': 0, '': 0,
+}
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded file is not valid CSV or NDJSON."""
+
+def scalar(value, name):
+    """
+    Check that an imported value can be stored in a column.
+
+    NDJSON rows can hold objects and arrays, which SQLite cannot bind.
+
+    Args:
+        value: The parsed value.
+        name (str): Column name used in error messages.
+
+    Returns:
+        The value, a string, a number or None.
+
+    Raises:
+        ValueError: If the value is an object or an array.
+    """
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError(f"{name} must be a string or a number")
+    return value
+
+def require(row, name):
+    """
+    Get a required value from an imported row.
+
+    Args:
+        row (dict): The parsed row.
+        name (str): Column name.
+
+    Returns:
+        str: The value as a stripped string.
+    """
+    value = scalar(row[name], name)
+    if value is None or str(value).strip() == '':
+        raise ValueError(f"{name} is required")
+    return str(value).strip()
+
+def parse_date_time(value):
+    """
+    Convert an imported date and time to the stored timestamp and offset.
+
+    Args:
+        value (str): ISO date and time, with a 'T' or space separator. A UTC offset
+            such as '+02:00' is kept; without one the server's time zone is assumed.
+
+    Returns:
+        tuple: (ts, tz_offset) as stored in the metric tables.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return to_timestamp(parsed.strftime("%Y-%m-%d %H:%M"))
+    return int(parsed.timestamp()), int(parsed.utcoffset().total_seconds()) // 60
+
+def parse_int(value, name, low, high):
+    """
+    Parse an integer measurement and check that it is plausible.
+
+    Args:
+        value (str): The raw value.
+        name (str): Column name used in error messages.
+        low (int): Smallest accepted value.
+        high (int): Largest accepted value.
+
+    Returns:
+        int: The parsed value.
+    """
+    number = int(value)
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+def validate_blood_pressure(row):
+    """
+    Validate an imported blood pressure row.
+
+    Args:
+        row (dict): The parsed row.
+
+    Returns:
+        tuple: ts, tz_offset and the other values in IMPORT_COLUMNS order.
+    """
+    return parse_date_time(require(row, 'date_time')) + (
+        parse_int(require(row, 'systolic'), 'systolic', 40, 300),
+        parse_int(require(row, 'diastolic'), 'diastolic', 20, 200),
+        parse_int(require(row, 'pulse'), 'pulse', 20, 250),
+    )
+
+def validate_weight(row):
+    """
+    Validate an imported weight row.
+
+    Args:
+        row (dict): The parsed row.
+
+    Returns:
+        tuple: ts, tz_offset and the other values in IMPORT_COLUMNS order.
+    """
+    weight_value = float(require(row, 'weight_value'))
+    if not 0 < weight_value < 1000:
+        raise ValueError("weight_value must be between 0 and 1000")
+    return parse_date_time(require(row, 'date_time')) + (weight_value,)
+
+def validate_medications(row):
+    """
+    Validate an imported medication row.
+
+    Args:
+        row (dict): The parsed row.
+
+    Returns:
+        tuple: ts, tz_offset and the other values in IMPORT_COLUMNS order.
+    """
+    medication_name = require(row, 'medication_name')
+    taken = TAKEN_VALUES.get(str(scalar(row.get('taken', ''), 'taken')).strip().lower())
+    if taken is None:
+        raise ValueError("taken must be 0/1, true/false or yes/no")
+    dosage = scalar(row.get('dosage'), 'dosage')
+    return parse_date_time(require(row, 'date_time')) + (medication_name, dosage or None, taken)
+
+VALIDATORS = {
+    'blood_pressure': validate_blood_pressure,
+    'weight': validate_weight,
+    'medications': validate_medications,
+}
+
+def detect_format(filename, requested=None):
+    """
+    Decide whether an upload is CSV or NDJSON.
+
+    Args:
+        filename (str): Name of the uploaded file.
+        requested (str, optional): Explicitly requested format.
+
+    Returns:
+        str: 'csv' or 'ndjson'.
+    """
+    if requested in ('csv', 'ndjson'):
+        return requested
+    if (filename or '').lower().endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
+
+def iter_rows(stream, file_format):
+    """
+    Parse an uploaded file as a stream of rows.
+
+    Args:
+        stream (file): Binary file object of the upload.
+        file_format (str): 'csv' or 'ndjson'.
+
+    Yields:
+        tuple: (line number, row dictionary or None if the line could not be parsed).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        if not reader.fieldnames:
+            raise ImportFormatError("The CSV file has no header row.")
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    decoder = msgspec.json.Decoder(dict)
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, decoder.decode(line)
+        except msgspec.DecodeError:
+            yield line_number, None
+
+def import_records(metric, user_id, rows, batch_size=5000, max_errors=100):
+    """
+    Validate and insert imported rows for a user in a single transaction.
+
+    Args:
+        metric (str): One of the keys of IMPORT_COLUMNS.
+        user_id (int): ID of the user who will own the records.
+        rows (iterable): (line number, row dictionary) pairs, e.g. from iter_rows.
+        batch_size (int): Number of rows validated and inserted per batch.
+        max_errors (int): Maximum number of row errors to report.
+
+    Returns:
+        dict: Counts of imported and rejected rows and the first `max_errors` errors.
+    """
+    # date_time is stored as its timestamp and offset
+    columns = ('ts', 'tz_offset') + IMPORT_COLUMNS[metric][1:]
+    validate = VALIDATORS[metric]
+    query = (f"INSERT INTO {metric} ({', '.join(columns)}, user_id) "
+             f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+
+    imported = 0
+    rejected = 0
+    errors = []
+    batch = []
+    with transaction() as db:
+        for line_number, row in rows:
+            try:
+                if row is None:
+                    raise ValueError("line is not valid JSON")
+                batch.append(validate(row) + (user_id,))
+            except KeyError as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line_number, "error": f"missing column {e}"})
+            except (ValueError, TypeError) as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line_number, "error": str(e)})
+
+            if len(batch) >= batch_size:
+                db.executemany(query, batch)
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            db.executemany(query, batch)
+            imported += len(batch)
+
+    return {"imported": imported, "rejected": rejected, "errors": errors}
+
+def import_upload(metric, user_id, upload, requested_format=None, batch_size=5000, max_errors=100):
+    """
+    Import an uploaded CSV or NDJSON file of metric records for a user.
+
+    Args:
+        metric (str): One of the keys of IMPORT_COLUMNS.
+        user_id (int): ID of the user who will own the records.
+        upload (FileStorage): The uploaded file.
+        requested_format (str, optional): 'csv' or 'ndjson'; guessed from the file name if omitted.
+        batch_size (int): Number of rows validated and inserted per batch.
+        max_errors (int): Maximum number of row errors to report.
+
+    Returns:
+        dict: Counts of imported and rejected rows and the first `max_errors` errors.
+
+    Raises:
+        ImportFormatError: If the file cannot be read as the detected format.
+    """
+    file_format = detect_format(upload.filename, requested_format)
+    try:
+        return import_records(metric, user_id, iter_rows(upload.stream, file_format),
+                              batch_size, max_errors)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(f"The file is not valid {file_format.upper()}: {e}") from e
@@ -0,0 +1,105 @@
+"""
+JSON Helpers for the Healthsome application.
+
+This module serializes chart data with msgspec. Raw metric series are encoded
+straight from the cursor into typed structs and streamed to the client in
+chunks, so a long range is never materialized as a list of dictionaries.
+"""
+
+import msgspec
+from flask import Response, stream_with_context
+
+from helpers.db_helpers import stream_db
+
+class BloodPressurePoint(msgspec.Struct):
+    """A blood pressure reading on the chart."""
+    date: str
+    systolic: int
+    diastolic: int
+    pulse: int
+
+class WeightPoint(msgspec.Struct):
+    """A weight reading on the chart."""
+    date: str
+    weight: float
+
+class MedicationPoint(msgspec.Struct):
+    """A medication dose on the chart."""
+    date: str
+    medication: str
+    status: str
+
+class BloodPressureRecord(msgspec.Struct):
+    """A blood pressure reading kept in the browser's series cache."""
+    id: int
+    ts: int
+    date: str
+    systolic: int
+    diastolic: int
+    pulse: int
+
+class WeightRecord(msgspec.Struct):
+    """A weight reading kept in the browser's series cache."""
+    id: int
+    ts: int
+    date: str
+    weight: float
+
+class MedicationRecord(msgspec.Struct):
+    """A medication dose kept in the browser's series cache."""
+    id: int
+    ts: int
+    date: str
+    medication: str
+    taken: int
+
+encoder = msgspec.json.Encoder()
+
+def encode_json(data):
+    """
+    Serialize data to JSON bytes.
+
+    Args:
+        data: Any msgspec-serializable value (lists, dictionaries, structs).
+
+    Returns:
+        bytes: The encoded JSON.
+    """
+    return encoder.encode(data)
+
+def iter_json_array(query, args, make_point, chunk_size=1000):
+    """
+    Encode a query result as a JSON array, one chunk of rows at a time.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+        make_point (callable): Builds a struct from a result row tuple.
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Yields:
+        bytes: Consecutive pieces of the JSON array.
+    """
+    yield b"["
+    separator = b""
+    for rows in stream_db(query, args, chunk_size):
+        chunk = encoder.encode([make_point(*row) for row in rows])
+        yield separator + chunk[1:-1]
+        separator = b","
+    yield b"]"
+
+def stream_json_array(query, args, make_point, chunk_size=1000):
+    """
+    Stream a query result to the client as a chunked JSON array.
+
+    Args:
+        query (str): The SQL query to execute.
+        args (tuple): The arguments for the query.
+        make_point (callable): Builds a struct from a result row tuple.
+        chunk_size (int): Number of rows fetched and encoded per chunk.
+
+    Returns:
+        Response: A streaming JSON response.
+    """
+    return Response(stream_with_context(iter_json_array(query, args, make_point, chunk_size)),
+                    mimetype='application/json')
@@ -0,0 +1,303 @@
+"""
+Metrics Helpers for the Healthsome application.
+
+This module instruments requests and their SQL. When `METRICS_ENABLED` is set,
+every request gets a `RequestStats` on `g` that the database helpers report
+each query, its row count and commit time to. The totals are sent back in a
+`Server-Timing` header and aggregated into per-process histograms by endpoint
+and by normalized query shape, which `/metrics` serves in the Prometheus text
+format. When disabled, no hooks are registered and the database helpers only
+pay for one `g.get` per query.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+from flask import current_app, g, request
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Upper bounds of the queries-per-request histogram buckets
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Literals replaced by '?' when normalizing SQL into a query shape
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query):
+    """
+    Reduce an SQL statement to its shape for grouping.
+
+    Collapses whitespace and replaces string and number literals with '?', so
+    statements that differ only in inlined values share one shape.
+
+    Args:
+        query (str): The SQL statement.
+
+    Returns:
+        str: The normalized statement.
+    """
+    return SQL_LITERALS.sub("?", " ".join(query.split()))
+
+class Histogram:
+    """A thread-safe Prometheus-style histogram with one series per label set."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description shown in the exposition.
+            label_names (tuple): Names of the labels of each series.
+            buckets (tuple): Ascending upper bounds of the buckets.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """
+        Record one observation.
+
+        Args:
+            labels (tuple): Label values, in `label_names` order.
+            value (float): The observed value.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        """
+        Render the histogram in the Prometheus text format.
+
+        Returns:
+            list: Exposition lines.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in series]
+        for labels, counts, total, count in series:
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{{{label_text}{',' if label_text else ''}"
+                             f"le=\"{le}\"}} {cumulative}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+class Counter:
+    """A thread-safe Prometheus-style counter with one series per label set."""
+
+    def __init__(self, name, help_text, label_names):
+        """
+        Initialize the counter.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description shown in the exposition.
+            label_names (tuple): Names of the labels of each series.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        """
+        Increase a series.
+
+        Args:
+            labels (tuple): Label values, in `label_names` order.
+            amount (float): Amount to add.
+        """
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def expose(self):
+        """
+        Render the counter in the Prometheus text format.
+
+        Returns:
+            list: Exposition lines.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+def format_labels(names, values):
+    """
+    Format a label set for the Prometheus text format.
+
+    Args:
+        names (tuple): Label names.
+        values (tuple): Label values.
+
+    Returns:
+        str: Comma-separated name="value" pairs with escaped values.
+    """
+    return ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+
+class MetricsRegistry:
+    """The request and SQL metrics of one worker process."""
+
+    def __init__(self):
+        """Create the metric series."""
+        self.request_duration = Histogram(
+            "healthsome_request_duration_seconds", "Time spent handling requests.",
+            ("endpoint", "method"), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            "healthsome_request_sql_queries", "SQL statements executed per request.",
+            ("endpoint",), COUNT_BUCKETS)
+        self.request_sql_duration = Histogram(
+            "healthsome_request_sql_seconds", "Time spent in SQL per request.",
+            ("endpoint",), LATENCY_BUCKETS)
+        self.query_duration = Histogram(
+            "healthsome_sql_query_duration_seconds", "Time spent executing each query shape.",
+            ("query",), LATENCY_BUCKETS)
+        self.query_rows = Counter(
+            "healthsome_sql_rows_total", "Rows returned or changed by each query shape.",
+            ("query",))
+        self.commit_duration = Histogram(
+            "healthsome_sql_commit_seconds", "Time spent committing transactions.",
+            ("endpoint",), LATENCY_BUCKETS)
+
+    def expose(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition document.
+        """
+        lines = []
+        for metric in (self.request_duration, self.request_queries, self.request_sql_duration,
+                       self.query_duration, self.query_rows, self.commit_duration):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+class RequestStats:
+    """SQL totals of one request, reported by the database helpers."""
+
+    def __init__(self, registry, endpoint):
+        """
+        Start collecting for a request.
+
+        Args:
+            registry (MetricsRegistry): Registry the observations are aggregated into.
+            endpoint (str): Endpoint name of the request.
+        """
+        self.registry = registry
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.sql_time = 0.0
+        self.commit_time = 0.0
+
+    def record(self, query, seconds, rows):
+        """
+        Record an executed statement.
+
+        Args:
+            query (str): The SQL statement.
+            seconds (float): Time spent executing and fetching.
+            rows (int): Rows returned or changed.
+        """
+        self.queries += 1
+        self.rows += max(rows, 0)
+        self.sql_time += seconds
+        shape = (normalize_sql(query),)
+        self.registry.query_duration.observe(shape, seconds)
+        self.registry.query_rows.inc(shape, max(rows, 0))
+
+    def record_commit(self, seconds):
+        """
+        Record a commit.
+
+        Args:
+            seconds (float): Time spent committing.
+        """
+        self.commit_time += seconds
+        self.registry.commit_duration.observe((self.endpoint,), seconds)
+
+def get_registry():
+    """
+    Get the metrics registry of the current application, creating it on first use.
+
+    Returns:
+        MetricsRegistry: The registry for the current application.
+    """
+    registry = current_app.extensions.get('metrics')
+    if registry is None:
+        registry = current_app.extensions['metrics'] = MetricsRegistry()
+    return registry
+
+def start_request_stats():
+    """Start collecting SQL statistics for the current request."""
+    g.sql_stats = RequestStats(get_registry(), request.endpoint or "unknown")
+
+def finish_request_stats(response):
+    """
+    Add the Server-Timing header and aggregate the request's statistics.
+
+    SQL run while a streamed body is sent happens after this point, so it is
+    aggregated per query shape but not included in the header.
+
+    Args:
+        response (Response): The outgoing response.
+
+    Returns:
+        Response: The response with a Server-Timing header.
+    """
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+
+    total = time.perf_counter() - stats.started
+    registry = stats.registry
+    registry.request_duration.observe((stats.endpoint, request.method), total)
+    registry.request_queries.observe((stats.endpoint,), stats.queries)
+    registry.request_sql_duration.observe((stats.endpoint,), stats.sql_time)
+
+    response.headers.add(
+        "Server-Timing",
+        f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows", '
+        f'commit;dur={stats.commit_time * 1000:.2f}, '
+        f'app;dur={total * 1000:.2f}'
+    )
+    return response
+
+def init_metrics(app):
+    """
+    Register the request instrumentation hooks if `METRICS_ENABLED` is set.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    if app.config.get('METRICS_ENABLED'):
+        app.before_request(start_request_stats)
+        app.after_request(finish_request_stats)
@@ -0,0 +1,247 @@
+"""
+Migration Helpers for the Healthsome application.
+
+This module applies versioned SQL migrations to an existing SQLite database,
+records the applied versions in the `schema_version` table, and verifies that
+the metric queries are served by indexes.
+"""
+
+import os
+import re
+import sqlite3
+
+from helpers.bulk_helpers import LOCAL_DAYS_SQL, SELECTED_IDS_SQL
+from helpers.datetime_helpers import LOCAL_MINUTES_SQL, LOCAL_TIME_SQL
+
+MIGRATIONS_DIR = os.getenv(
+    "MIGRATIONS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations"))
+
+# Migration files are named like '0001_metric_indexes.sql'
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Representative shapes of every per-user metric query issued by the blueprints,
+# checked against a deployed database by `migrate.py --check`; the tests in
+# tests/test_query_plans.py check the statements the application actually runs
+METRIC_QUERIES = [
+    "SELECT * FROM blood_pressure WHERE user_id = ? "
+    "AND ts BETWEEN ? AND ? ORDER BY ts DESC",
+    "SELECT * FROM blood_pressure WHERE user_id = ? ORDER BY ts DESC",
+    "SELECT * FROM blood_pressure WHERE user_id = ? AND ts BETWEEN ? AND ? "
+    "AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?",
+    "SELECT * FROM blood_pressure WHERE user_id = ? "
+    "AND (ts, id) > (?, ?) ORDER BY ts ASC, id ASC LIMIT ?",
+    f"SELECT {LOCAL_TIME_SQL}, systolic, diastolic, pulse FROM blood_pressure "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    f"SELECT {LOCAL_MINUTES_SQL}, systolic, diastolic, pulse FROM blood_pressure "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    "SELECT * FROM weight WHERE user_id = ? "
+    "AND ts BETWEEN ? AND ? ORDER BY ts DESC",
+    "SELECT * FROM weight WHERE user_id = ? ORDER BY ts DESC",
+    "SELECT * FROM weight WHERE user_id = ? AND ts BETWEEN ? AND ? "
+    "AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?",
+    "SELECT * FROM weight WHERE user_id = ? "
+    "AND (ts, id) > (?, ?) ORDER BY ts ASC, id ASC LIMIT ?",
+    f"SELECT {LOCAL_TIME_SQL}, weight_value FROM weight "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    f"SELECT {LOCAL_MINUTES_SQL}, weight_value FROM weight "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    "SELECT * FROM medications WHERE user_id = ? "
+    "AND ts BETWEEN ? AND ? ORDER BY ts DESC",
+    "SELECT * FROM medications WHERE user_id = ? ORDER BY ts DESC",
+    "SELECT * FROM medications WHERE user_id = ? AND ts BETWEEN ? AND ? "
+    "AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?",
+    "SELECT * FROM medications WHERE user_id = ? "
+    "AND (ts, id) > (?, ?) ORDER BY ts ASC, id ASC LIMIT ?",
+    f"SELECT {LOCAL_TIME_SQL}, medication_name, taken FROM medications "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    f"SELECT {LOCAL_MINUTES_SQL}, medication_name, taken FROM medications "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    f"SELECT {LOCAL_TIME_SQL}, systolic, diastolic, pulse FROM blood_pressure "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT {LOCAL_TIME_SQL}, weight_value FROM weight "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT {LOCAL_TIME_SQL}, medication_name, dosage, taken FROM medications "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT m.id, m.ts, {LOCAL_TIME_SQL}, systolic, diastolic, pulse FROM blood_pressure m "
+    "WHERE m.user_id = ? ORDER BY m.ts ASC, m.id ASC",
+    f"SELECT m.id, m.ts, {LOCAL_TIME_SQL}, weight_value FROM weight m "
+    "WHERE m.user_id = ? ORDER BY m.ts ASC, m.id ASC",
+    f"SELECT m.id, m.ts, {LOCAL_TIME_SQL}, medication_name, taken FROM medications m "
+    "WHERE m.user_id = ? ORDER BY m.ts ASC, m.id ASC",
+    f"SELECT c.record_id, c.deleted, m.id, m.ts, {LOCAL_TIME_SQL}, weight_value "
+    "FROM change_log c LEFT JOIN weight m ON m.id = c.record_id "
+    "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+    "SELECT MAX(seq) AS seq FROM change_log WHERE user_id = ? AND metric = ?",
+    f"SELECT id, ts, {LOCAL_MINUTES_SQL}, systolic, diastolic, pulse FROM blood_pressure "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT id, ts, {LOCAL_MINUTES_SQL}, weight_value FROM weight "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT id, ts, {LOCAL_MINUTES_SQL}, taken FROM medications "
+    "WHERE user_id = ? ORDER BY ts ASC, id ASC",
+    f"SELECT m.id, m.ts, {LOCAL_MINUTES_SQL}, systolic, diastolic, pulse "
+    "FROM change_log c JOIN blood_pressure m ON m.id = c.record_id "
+    "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+    "SELECT record_id FROM change_log WHERE user_id = ? AND metric = ? AND seq > ?",
+    "SELECT * FROM medication_schedules WHERE user_id = ? "
+    "AND start_date <= date(?, 'unixepoch', '+1 day') "
+    "AND (end_date IS NULL OR end_date >= date(?, 'unixepoch', '-1 day')) "
+    "ORDER BY start_date ASC, id ASC",
+    "SELECT ts, taken FROM medication_schedule_overrides WHERE schedule_id = ? AND ts BETWEEN ? AND ?",
+    f"SELECT {LOCAL_MINUTES_SQL}, taken FROM medications "
+    "WHERE user_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
+    "UPDATE medications SET taken = 1 - taken WHERE id = ? AND user_id = ? RETURNING taken",
+    f"UPDATE medications SET taken = 1 WHERE user_id = ? AND {LOCAL_DAYS_SQL} AND taken = 0",
+    f"DELETE FROM blood_pressure WHERE {SELECTED_IDS_SQL}",
+    f"DELETE FROM weight WHERE {SELECTED_IDS_SQL}",
+    f"DELETE FROM medications WHERE {SELECTED_IDS_SQL}",
+    f"SELECT {LOCAL_TIME_SQL} AS date_time, systolic, diastolic, pulse "
+    "FROM blood_pressure WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+    f"SELECT {LOCAL_TIME_SQL} AS date_time, weight_value "
+    "FROM weight WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+    f"SELECT {LOCAL_TIME_SQL} AS date_time, medication_name, dosage, taken "
+    "FROM medications WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
+    f"SELECT c.record_id, c.deleted, m.id, m.ts, {LOCAL_TIME_SQL}, systolic, diastolic, pulse "
+    "FROM change_log c LEFT JOIN blood_pressure m ON m.id = c.record_id "
+    "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+    f"SELECT c.record_id, c.deleted, m.id, m.ts, {LOCAL_TIME_SQL}, medication_name, taken "
+    "FROM change_log c LEFT JOIN medications m ON m.id = c.record_id "
+    "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+    "SELECT * FROM blood_pressure_rollups WHERE user_id = ? AND period = ? ORDER BY bucket ASC",
+    "SELECT * FROM blood_pressure_rollups WHERE user_id = ? AND period = ? "
+    "AND bucket BETWEEN ? AND ? ORDER BY bucket ASC",
+    "SELECT * FROM weight_rollups WHERE user_id = ? AND period = ? "
+    "AND bucket BETWEEN ? AND ? ORDER BY bucket ASC",
+    "SELECT * FROM medications_rollups WHERE user_id = ? AND period = ? "
+    "AND bucket BETWEEN ? AND ? ORDER BY bucket ASC",
+]
+
+# Query plan details that indicate a full table scan or an explicit sort step;
+# scanning json_each only walks the JSON array bound to the query
+BAD_PLAN_PATTERNS = [
+    re.compile(r"^SCAN (?!json_each\b)"),
+    re.compile(r"USE TEMP B-TREE"),
+]
+
+# Statements selecting records by a JSON array of IDs, as with SELECTED_IDS_SQL
+ID_LIST_PATTERN = re.compile(r"\bid IN \(SELECT value FROM json_each\(")
+
+# Query plan details of such statements that are not a lookup by rowid, e.g. a
+# walk of the user's whole history in the user's index
+ID_LOOKUP_PATTERN = re.compile(r"^SEARCH (?!json_each\b)(?!.*\(rowid=\?\))")
+
+def list_migrations(migrations_dir=MIGRATIONS_DIR):
+    """
+    List the available migration files ordered by version.
+
+    Args:
+        migrations_dir (str): Directory containing the migration files.
+
+    Returns:
+        list: Tuples of (version, name, path) sorted by version.
+    """
+    migrations = []
+    for filename in os.listdir(migrations_dir):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append(
+                (int(match.group(1)), match.group(2), os.path.join(migrations_dir, filename)))
+    return sorted(migrations)
+
+def ensure_version_table(conn):
+    """
+    Create the `schema_version` table if it does not exist yet.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.commit()
+
+def get_schema_version(conn):
+    """
+    Get the version of the most recently applied migration.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+
+    Returns:
+        int: The current schema version, or 0 if no migration has been applied.
+    """
+    ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def apply_migrations(conn, migrations_dir=MIGRATIONS_DIR):
+    """
+    Apply every migration newer than the current schema version.
+
+    Each migration runs in its own transaction together with its version
+    record, so a failing migration leaves the database at the previous version.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        migrations_dir (str): Directory containing the migration files.
+
+    Returns:
+        list: Tuples of (version, name) for the migrations that were applied.
+    """
+    current_version = get_schema_version(conn)
+    applied = []
+    for version, name, path in list_migrations(migrations_dir):
+        if version <= current_version:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            script = f.read()
+        try:
+            conn.executescript(
+                f"BEGIN;\n{script}\n"
+                f"INSERT INTO schema_version (version, name) VALUES ({version}, '{name}');\n"
+                "COMMIT;"
+            )
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append((version, name))
+    return applied
+
+def plan_problems(conn, query, args=None):
+    """
+    Run EXPLAIN QUERY PLAN for one statement and report its unindexed steps.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        query (str): The SQL statement.
+        args (tuple, optional): Its parameters; NULLs are bound if omitted.
+
+    Returns:
+        list: Plan details of every full scan, temp B-tree sort, or selection
+        by ID that is not a rowid lookup.
+    """
+    if args is None:
+        args = (None,) * query.count("?")
+    patterns = BAD_PLAN_PATTERNS
+    if ID_LIST_PATTERN.search(query):
+        patterns = BAD_PLAN_PATTERNS + [ID_LOOKUP_PATTERN]
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", args)
+            if any(pattern.search(row[-1]) for pattern in patterns)]
+
+def find_plan_problems(conn, queries=None):
+    """
+    Run EXPLAIN QUERY PLAN for the metric queries and report unindexed steps.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        queries (list, optional): Queries to check. Defaults to METRIC_QUERIES.
+
+    Returns:
+        list: Tuples of (query, plan detail) for every full scan, temp B-tree
+        sort, or selection by ID that is not a rowid lookup.
+    """
+    return [(query, detail) for query in queries or METRIC_QUERIES
+            for detail in plan_problems(conn, query)]
@@ -0,0 +1,130 @@
+"""
+Pagination Helpers for the Healthsome application.
+
+This module provides keyset (cursor) pagination over the metric tables.
+Pages are ordered newest first by (ts, id), and opaque cursors point
+just past the first or last record of a page, so fetching any page costs
+the same index range search no matter how much history a user has.
+"""
+
+import base64
+import json
+
+from helpers.db_helpers import query_db
+
+# Tables that can be paginated (table names cannot be bound as parameters)
+PAGINATED_TABLES = ('blood_pressure', 'weight', 'medications')
+
+def encode_cursor(direction, ts, record_id):
+    """
+    Encode a page boundary into an opaque URL-safe cursor.
+
+    Args:
+        direction (str): 'next' for older records, 'prev' for newer records.
+        ts (int): The timestamp of the boundary record.
+        record_id (int): The ID of the boundary record.
+
+    Returns:
+        str: The encoded cursor.
+    """
+    raw = json.dumps([direction, ts, record_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque cursor back into a page boundary.
+
+    Args:
+        cursor (str): The encoded cursor.
+
+    Returns:
+        tuple: (direction, ts, record_id), or None if the cursor is missing or invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, ts, record_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(ts, int) \
+            or not isinstance(record_id, int):
+        return None
+    return direction, ts, record_id
+
+def paginate_records(table, user_id, start_date, end_date, cursor=None, page_size=50):
+    """
+    Fetch one page of a user's records, newest first.
+
+    Args:
+        table (str): One of PAGINATED_TABLES.
+        user_id (int): ID of the user who owns the records.
+        start_date (int): Start timestamp of the date range, or None for all time.
+        end_date (int): End timestamp of the date range, or None for all time.
+        cursor (str, optional): Cursor returned with a previous page.
+        page_size (int): Maximum number of records on the page.
+
+    Returns:
+        tuple: (records, next_cursor, prev_cursor); a cursor is None when there is no such page.
+    """
+    if table not in PAGINATED_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+
+    boundary = decode_cursor(cursor)
+    direction = boundary[0] if boundary else 'next'
+
+    query = f"SELECT * FROM {table} WHERE user_id = ?"
+    params = [user_id]
+
+    if start_date:
+        query += " AND ts BETWEEN ? AND ?"
+        params.extend([start_date, end_date])
+
+    if boundary and direction == 'next':
+        query += " AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC"
+        params.extend(boundary[1:])
+    elif boundary:
+        query += " AND (ts, id) > (?, ?) ORDER BY ts ASC, id ASC"
+        params.extend(boundary[1:])
+    else:
+        query += " ORDER BY ts DESC, id DESC"
+
+    # Fetch one extra row to learn whether another page exists
+    query += " LIMIT ?"
+    params.append(page_size + 1)
+
+    records = query_db(query, params)
+    has_more = len(records) > page_size
+    records = records[:page_size]
+
+    if direction == 'prev':
+        records.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = boundary is not None, has_more
+
+    if not records:
+        return records, None, None
+
+    first, last = records[0], records[-1]
+    next_cursor = encode_cursor('next', last['ts'], last['id']) if has_older else None
+    prev_cursor = encode_cursor('prev', first['ts'], first['id']) if has_newer else None
+    return records, next_cursor, prev_cursor
+
+def get_page_size(value, default, maximum):
+    """
+    Parse a requested page size and clamp it to the allowed range.
+
+    Args:
+        value (str): The requested page size, e.g. from the query string.
+        default (int): Page size to use when none or an invalid one is requested.
+        maximum (int): Largest allowed page size.
+
+    Returns:
+        int: The page size to use.
+    """
+    try:
+        page_size = int(value) if value else default
+    except ValueError:
+        page_size = default
+    return max(1, min(page_size, maximum))
@@ -0,0 +1,190 @@
+"""
+Password Helpers for the Healthsome application.
+
+This module runs password hashing and verification on a small, bounded thread
+pool instead of inline on the request thread. Werkzeug's scrypt and pbkdf2
+hashes are computed by OpenSSL with the GIL released, so a few worker threads
+cap how much CPU a login burst can take while other requests keep being
+served. When too many hashes are already queued, new ones are refused with
+`HashingBusyError` so the caller can answer 503 instead of piling up work.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+class HashingBusyError(RuntimeError):
+    """Raised when the password hashing pool has no room for more work."""
+
+def normalize_method(method):
+    """
+    Expand a Werkzeug hash method to the full form stored in password hashes.
+
+    Args:
+        method (str): A method such as 'scrypt', 'scrypt:16384:8:1' or 'pbkdf2:sha256'.
+
+    Returns:
+        str: The method with every cost parameter filled in, e.g. 'scrypt:32768:8:1'.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        raise ValueError(f"Unsupported password hash method: {method}")
+    return ':'.join([name] + args + defaults[len(args):])
+
+class PasswordHasher:
+    """
+    A bounded thread pool for password hashing and verification.
+
+    At most `workers` hashes run at once and at most `max_pending` are
+    accepted (running or queued); beyond that `HashingBusyError` is raised
+    immediately.
+    """
+
+    def __init__(self, method='scrypt', workers=2, max_pending=16, timeout=30.0):
+        """
+        Initialize the pool.
+
+        Args:
+            method (str): Werkzeug hash method and cost for new hashes.
+            workers (int): Number of hashing threads.
+            max_pending (int): Maximum number of accepted hashing jobs.
+            timeout (float): Seconds to wait for a hashing job to finish.
+        """
+        self.method = normalize_method(method)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def _run(self, func, *args):
+        """
+        Run a function on the pool and wait for its result.
+
+        Args:
+            func (callable): The hashing function.
+            *args: Arguments for the function.
+
+        Returns:
+            The function's result.
+
+        Raises:
+            HashingBusyError: If `max_pending` jobs are already accepted, or the job
+            did not finish within `timeout`.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusyError("Too many password hashing requests in progress.")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job is done, not until the caller stops
+        # waiting, so jobs that timed out still count against `max_pending`
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()  # Frees the slot now if the job has not started yet
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusyError("Password hashing timed out.") from e
+        with self._lock:
+            self._completed += 1
+        return result
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method.
+
+        Args:
+            password (str): The plain-text password.
+
+        Returns:
+            str: The password hash.
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        """
+        Check a password against a stored hash.
+
+        Args:
+            password_hash (str): The stored password hash.
+            password (str): The plain-text password.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Check whether a stored hash was made with a different method or cost.
+
+        Args:
+            password_hash (str): The stored password hash.
+
+        Returns:
+            bool: True if the hash should be replaced with one of the configured method.
+        """
+        return password_hash.split('$', 1)[0] != self.method
+
+    def count_rehash(self):
+        """Count a password hash that was upgraded on login."""
+        with self._lock:
+            self._rehashed += 1
+
+    def stats(self):
+        """
+        Report pool usage counters.
+
+        Returns:
+            dict: Method, pool limits, and completed, rejected and rehashed counts.
+        """
+        with self._lock:
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "rehashed": self._rehashed,
+            }
+
+def get_password_hasher():
+    """
+    Get the password hashing pool of the current application for this process.
+
+    A pool inherited from a parent process is recreated, since its threads do
+    not survive a fork.
+
+    Returns:
+        PasswordHasher: The pool for the current application.
+    """
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None or hasher.pid != os.getpid():
+        hasher = PasswordHasher(
+            current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+            max_pending=current_app.config.get('PASSWORD_HASH_MAX_PENDING', 16),
+            timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 30.0),
+        )
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
@@ -0,0 +1,103 @@
+"""
+Rollup Helpers for the Healthsome application.
+
+This module reads and rebuilds the daily and weekly metric rollups. The rollup
+tables are kept up to date by the triggers created in
+`migrations/0002_metric_rollups.sql`; the rebuild functions here recompute
+them from the raw readings, e.g. after a bulk load with triggers disabled.
+"""
+
+from datetime import datetime, timedelta
+
+from helpers.datetime_helpers import local_date
+from helpers.db_helpers import query_db
+
+# Bucket sizes supported by the rollup tables
+PERIODS = ('day', 'week')
+
+# SQL expression for the bucket start of each period
+BUCKET_EXPRESSIONS = {
+    'day': "date(date_time)",
+    'week': "date(date_time, '-6 days', 'weekday 1')",
+}
+
+# Aggregate columns of each rollup table, in table order
+ROLLUP_AGGREGATES = {
+    'blood_pressure': "COUNT(*), SUM(systolic), MIN(systolic), MAX(systolic), "
+                      "SUM(diastolic), MIN(diastolic), MAX(diastolic), "
+                      "SUM(pulse), MIN(pulse), MAX(pulse)",
+    'weight': "COUNT(*), SUM(weight_value), MIN(weight_value), MAX(weight_value)",
+    'medications': "COUNT(*), SUM(taken)",
+}
+
+def bucket_start(date_str, period):
+    """
+    Get the bucket that contains a date.
+
+    Args:
+        date_str (str): A date or datetime string starting with 'YYYY-MM-DD'.
+        period (str): 'day' or 'week'.
+
+    Returns:
+        str: The bucket start date as 'YYYY-MM-DD' (the Monday for weekly buckets).
+    """
+    day = datetime.strptime(date_str[:10], "%Y-%m-%d")
+    if period == 'week':
+        day -= timedelta(days=day.weekday())
+    return day.strftime("%Y-%m-%d")
+
+def query_rollups(metric, user_id, period, start_date=None, end_date=None):
+    """
+    Fetch a user's rollup rows for a date range, oldest first.
+
+    Args:
+        metric (str): One of the keys of ROLLUP_AGGREGATES.
+        user_id (int): ID of the user who owns the readings.
+        period (str): 'day' or 'week'.
+        start_date (int, optional): Start timestamp of the date range, or None for all time.
+        end_date (int, optional): End timestamp of the date range, or None for all time.
+
+    Returns:
+        list: Rollup rows with a `bucket` column and the aggregate columns.
+    """
+    if metric not in ROLLUP_AGGREGATES or period not in PERIODS:
+        raise ValueError(f"Unknown rollup: {metric}/{period}")
+
+    query = f"SELECT * FROM {metric}_rollups WHERE user_id = ? AND period = ?"
+    params = [user_id, period]
+
+    if start_date:
+        query += " AND bucket BETWEEN ? AND ?"
+        params.extend([bucket_start(local_date(start_date), period),
+                       bucket_start(local_date(end_date), period)])
+
+    query += " ORDER BY bucket ASC"
+    return query_db(query, params)
+
+def rebuild_rollups(conn, metric, user_id=None):
+    """
+    Recompute a metric's rollups from the raw readings.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        metric (str): One of the keys of ROLLUP_AGGREGATES.
+        user_id (int, optional): Only rebuild this user's rollups.
+
+    Returns:
+        int: Number of rollup rows written.
+    """
+    user_filter = " WHERE user_id = ?" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    written = 0
+    with conn:
+        conn.execute(f"DELETE FROM {metric}_rollups{user_filter}", params)
+        for period, bucket in BUCKET_EXPRESSIONS.items():
+            cur = conn.execute(
+                f"INSERT INTO {metric}_rollups "
+                f"SELECT user_id, '{period}', {bucket}, {ROLLUP_AGGREGATES[metric]} "
+                f"FROM {metric}{user_filter} GROUP BY user_id, {bucket}",
+                params
+            )
+            written += cur.rowcount
+    return written
@@ -0,0 +1,379 @@
+"""
+Schedule Helpers for the Healthsome application.
+
+This module expands recurring medication schedules into their doses. A
+schedule stores a medication, its local dose times and a recurrence rule
+(days of the week, every N days from a first day, until an optional last
+day), and its doses are generated with NumPy for the requested range only.
+A due dose has the schedule's default status unless the user marked it
+otherwise; only those overrides are stored, so a chronic medication costs
+one schedule row instead of a row per dose.
+"""
+
+import time
+
+import msgspec
+import numpy as np
+
+from helpers.datetime_helpers import SECONDS_PER_DAY, epoch_day, format_timestamp
+from helpers.db_helpers import execute_db, query_db
+
+# Bit mask of every day of the week, bit 0 being Monday
+ALL_WEEKDAYS = 0b1111111
+
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Doses become due in steps of this many seconds, so results derived from the
+# due doses can be cached for that long
+DUE_STEP = 300
+
+# Status of a dose that is not due yet and has no override
+PENDING = -1
+
+def parse_times(value):
+    """
+    Parse dose times entered by a user.
+
+    Args:
+        value (str): Local times as 'HH:MM' separated by commas or spaces, e.g. '08:00, 20:00'.
+
+    Returns:
+        list: Distinct minutes after midnight, ascending.
+
+    Raises:
+        ValueError: If there is no time or a time is invalid.
+    """
+    minutes = set()
+    for part in value.replace(',', ' ').split():
+        hours, _, mins = part.partition(':')
+        if not (hours.isdigit() and mins.isdigit() and len(mins) == 2
+                and int(hours) < 24 and int(mins) < 60):
+            raise ValueError(f"Invalid dose time: {part!r}")
+        minutes.add(int(hours) * 60 + int(mins))
+    if not minutes:
+        raise ValueError("At least one dose time is required.")
+    return sorted(minutes)
+
+def format_times(times):
+    """
+    Format the stored dose times of a schedule.
+
+    Args:
+        times (str): Minutes after midnight separated by commas, as stored.
+
+    Returns:
+        str: The times as 'HH:MM, HH:MM'.
+    """
+    return ', '.join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in schedule_minutes(times))
+
+def schedule_minutes(times):
+    """
+    Split the stored dose times of a schedule.
+
+    Args:
+        times (str): Minutes after midnight separated by commas, as stored.
+
+    Returns:
+        list: The minutes after midnight.
+    """
+    return [int(minute) for minute in times.split(',')]
+
+def parse_weekdays(values):
+    """
+    Build the weekday mask of a schedule from the selected days.
+
+    Args:
+        values (list): Day numbers as strings, 0 for Monday to 6 for Sunday.
+
+    Returns:
+        int: The bit mask, or every day if none is selected.
+    """
+    mask = 0
+    for value in values:
+        if value.isdigit() and int(value) < 7:
+            mask |= 1 << int(value)
+    return mask or ALL_WEEKDAYS
+
+def format_weekdays(mask):
+    """
+    Describe the weekday mask of a schedule.
+
+    Args:
+        mask (int): Bit mask of the days, bit 0 being Monday.
+
+    Returns:
+        str: 'Every day' or the names of the days, e.g. 'Mon, Wed, Fri'.
+    """
+    if mask == ALL_WEEKDAYS:
+        return "Every day"
+    return ', '.join(name for day, name in enumerate(WEEKDAY_NAMES) if mask & (1 << day))
+
+def due_until(now=None):
+    """
+    Get the time up to which doses are due.
+
+    Args:
+        now (float, optional): The current time; defaults to `time.time()`.
+
+    Returns:
+        int: The current time rounded down to DUE_STEP.
+    """
+    now = time.time() if now is None else now
+    return int(now) // DUE_STEP * DUE_STEP
+
+def expand_schedule(schedule, start_ts, end_ts):
+    """
+    Generate the doses of a schedule within a range.
+
+    Args:
+        schedule (sqlite3.Row): A medication_schedules row.
+        start_ts (int): Start of the range, UTC seconds since the epoch.
+        end_ts (int): End of the range, UTC seconds since the epoch.
+
+    Returns:
+        numpy.ndarray: The times of the doses, ascending.
+    """
+    offset = schedule['tz_offset'] * 60
+    first_day = epoch_day(schedule['start_date'])
+    last_day = epoch_day(schedule['end_date']) if schedule['end_date'] else None
+
+    # Local days that can hold a dose of the range, limited to the schedule's days
+    low = max(first_day, (start_ts + offset) // SECONDS_PER_DAY)
+    high = (end_ts + offset) // SECONDS_PER_DAY
+    if last_day is not None:
+        high = min(high, last_day)
+    if high < low:
+        return np.empty(0, dtype=np.int64)
+
+    days = np.arange(low, high + 1, dtype=np.int64)
+    # 1970-01-01 was a Thursday, so (day + 3) % 7 is the weekday with Monday as 0
+    keep = ((days - first_day) % schedule['every_days'] == 0) \
+        & ((schedule['weekdays'] >> ((days + 3) % 7)) & 1 == 1)
+    minutes = np.array(schedule_minutes(schedule['times']), dtype=np.int64)
+    doses = (days[keep, None] * SECONDS_PER_DAY + minutes[None, :] * 60 - offset).ravel()
+    return doses[(doses >= start_ts) & (doses <= end_ts)]
+
+def load_schedules(user_id, start_ts=None, end_ts=None):
+    """
+    Fetch a user's schedules that may have doses within a range.
+
+    Args:
+        user_id (int): ID of the user who owns the schedules.
+        start_ts (int, optional): Start of the range, or None for all time.
+        end_ts (int, optional): End of the range, or None for all time.
+
+    Returns:
+        list: medication_schedules rows, oldest first.
+    """
+    query = "SELECT * FROM medication_schedules WHERE user_id = ?"
+    params = [user_id]
+    # A day of margin on both sides covers every time zone offset
+    if end_ts is not None:
+        query += " AND start_date <= date(?, 'unixepoch', '+1 day')"
+        params.append(end_ts)
+    if start_ts is not None:
+        query += " AND (end_date IS NULL OR end_date >= date(?, 'unixepoch', '-1 day'))"
+        params.append(start_ts)
+    query += " ORDER BY start_date ASC, id ASC"
+    return query_db(query, params)
+
+def scheduled_doses(user_id, start_ts=None, end_ts=None, until=None):
+    """
+    Generate a user's doses within a range with their status.
+
+    Args:
+        user_id (int): ID of the user who owns the schedules.
+        start_ts (int, optional): Start of the range, or None for all time.
+        end_ts (int, optional): End of the range, or None for up to `until`.
+        until (int, optional): Time up to which doses are due; defaults to `due_until()`.
+
+    Returns:
+        dict: 'schedules' (the rows) and arrays sorted by time: 'ts', 'schedule' (index
+        into 'schedules'), 'taken' (1, 0 or PENDING) and 'overridden'.
+    """
+    until = due_until() if until is None else until
+    end_ts = until if end_ts is None else end_ts
+    schedules = load_schedules(user_id, start_ts, end_ts)
+
+    columns = {'ts': [], 'schedule': [], 'taken': [], 'overridden': []}
+    for index, schedule in enumerate(schedules):
+        first = epoch_day(schedule['start_date']) * SECONDS_PER_DAY - schedule['tz_offset'] * 60
+        doses = expand_schedule(schedule, first if start_ts is None else start_ts, end_ts)
+        if not len(doses):
+            continue
+        taken = np.where(doses <= until, schedule['default_taken'], PENDING).astype(np.int8)
+        overridden = np.zeros(len(doses), dtype=bool)
+
+        overrides = query_db(
+            "SELECT ts, taken FROM medication_schedule_overrides "
+            "WHERE schedule_id = ? AND ts BETWEEN ? AND ?",
+            (schedule['id'], int(doses[0]), int(doses[-1]))
+        )
+        if overrides:
+            override_ts = np.array([row['ts'] for row in overrides], dtype=np.int64)
+            positions = np.searchsorted(doses, override_ts)
+            # Overrides of doses the rule no longer generates are ignored
+            valid = (positions < len(doses)) & (doses[np.minimum(positions, len(doses) - 1)]
+                                                == override_ts)
+            taken[positions[valid]] = np.array([row['taken'] for row in overrides],
+                                               dtype=np.int8)[valid]
+            overridden[positions[valid]] = True
+
+        columns['ts'].append(doses)
+        columns['schedule'].append(np.full(len(doses), index, dtype=np.int64))
+        columns['taken'].append(taken)
+        columns['overridden'].append(overridden)
+
+    result = {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+              for (name, arrays), dtype in zip(columns.items(),
+                                               (np.int64, np.int64, np.int8, bool))}
+    order = np.argsort(result['ts'], kind='stable')
+    result = {name: array[order] for name, array in result.items()}
+    result['schedules'] = schedules
+    return result
+
+def due_dose_columns(user_id, start_ts=None, end_ts=None, until=None):
+    """
+    Get the local times and statuses of a user's due doses, for numeric series.
+
+    Args:
+        user_id (int): ID of the user who owns the schedules.
+        start_ts (int, optional): Start of the range, or None for all time.
+        end_ts (int, optional): End of the range, or None for all time.
+        until (int, optional): Time up to which doses are due; defaults to `due_until()`.
+
+    Returns:
+        tuple: (local minutes since the epoch, taken) arrays of the due doses, oldest first.
+    """
+    until = due_until() if until is None else until
+    doses = scheduled_doses(user_id, start_ts, end_ts if end_ts is None else min(end_ts, until),
+                            until)
+    due = doses['taken'] != PENDING
+    offsets = np.array([schedule['tz_offset'] for schedule in doses['schedules']],
+                       dtype=np.int64)
+    local = doses['ts'][due] + offsets[doses['schedule'][due]] * 60
+    return local // 60, doses['taken'][due].astype(np.int64)
+
+def count_doses(minutes, taken, period):
+    """
+    Count due doses per day or per week, like the medication rollups.
+
+    Args:
+        minutes (numpy.ndarray): Local minutes since the epoch of the doses.
+        taken (numpy.ndarray): Whether each dose was taken (0 or 1).
+        period (str): 'day' or 'week'.
+
+    Returns:
+        list: Tuples of (bucket start date as 'YYYY-MM-DD', taken doses, doses), the
+        bucket of a week being its Monday.
+    """
+    days = minutes // (24 * 60)
+    if period == 'week':
+        days = days - (days + 3) % 7  # 1970-01-01 was a Thursday
+    buckets, inverse = np.unique(days, return_inverse=True)
+    bucket_taken = np.bincount(inverse, weights=taken, minlength=len(buckets)).astype(np.int64)
+    bucket_doses = np.bincount(inverse, minlength=len(buckets))
+    return list(zip(buckets.astype('datetime64[D]').astype('U10').tolist(),
+                    bucket_taken.tolist(), bucket_doses.tolist()))
+
+def dose_list(user_id, start_ts=None, end_ts=None, limit=None, until=None):
+    """
+    List a user's doses within a range, newest first.
+
+    Args:
+        user_id (int): ID of the user who owns the schedules.
+        start_ts (int, optional): Start of the range, or None for all time.
+        end_ts (int, optional): End of the range, or None for up to now.
+        limit (int, optional): Maximum number of doses, the newest being kept.
+        until (int, optional): Time up to which doses are due; defaults to `due_until()`.
+
+    Returns:
+        list: Doses as dictionaries with the schedule's medication.
+    """
+    doses = scheduled_doses(user_id, start_ts, end_ts, until)
+    indexes = np.arange(len(doses['ts']))[::-1][:limit]
+    result = []
+    for i in indexes.tolist():
+        schedule = doses['schedules'][doses['schedule'][i]]
+        ts = int(doses['ts'][i])
+        taken = int(doses['taken'][i])
+        result.append({
+            "schedule_id": schedule['id'],
+            "ts": ts,
+            "date": format_timestamp(ts, schedule['tz_offset']),
+            "medication_name": schedule['medication_name'],
+            "dosage": schedule['dosage'],
+            "taken": None if taken == PENDING else bool(taken),
+            "overridden": bool(doses['overridden'][i]),
+        })
+    return result
+
+def set_dose_status(user_id, schedule_id, ts, taken):
+    """
+    Mark a scheduled dose as taken or missed.
+
+    Only a status that differs from the schedule's default is stored; marking a
+    dose with the default status removes its override.
+
+    Args:
+        user_id (int): ID of the user who owns the schedule.
+        schedule_id (int): ID of the schedule.
+        ts (int): Time of the dose, UTC seconds since the epoch.
+        taken (bool): Whether the dose was taken.
+
+    Returns:
+        bool: False if the schedule does not exist or has no dose at that time.
+    """
+    schedule = query_db("SELECT * FROM medication_schedules WHERE id = ? AND user_id = ?",
+                        (schedule_id, user_id), one=True)
+    if not schedule or ts not in expand_schedule(schedule, ts, ts):
+        return False
+    if int(taken) == schedule['default_taken']:
+        execute_db("DELETE FROM medication_schedule_overrides WHERE schedule_id = ? AND ts = ?",
+                   (schedule_id, ts))
+    else:
+        execute_db("INSERT OR REPLACE INTO medication_schedule_overrides (schedule_id, ts, taken) "
+                   "VALUES (?, ?, ?)", (schedule_id, ts, int(taken)))
+    return True
+
+def mark_scheduled_doses_taken(db, user_id, start_ts, end_ts, first_day, last_day, until=None):
+    """
+    Mark every due scheduled dose of a range of local days as taken.
+
+    Doses of schedules that count as taken by default lose their overrides, and
+    the others get taken overrides, with one set-based statement each.
+
+    Args:
+        db (sqlite3.Connection): Connection inside the caller's transaction.
+        user_id (int): ID of the user who owns the schedules.
+        start_ts (int): Start of the range, UTC seconds since the epoch.
+        end_ts (int): End of the range, UTC seconds since the epoch.
+        first_day (int): First local day, in days since the epoch.
+        last_day (int): Last local day, in days since the epoch.
+        until (int, optional): Time up to which doses are due; defaults to `due_until()`.
+
+    Returns:
+        int: Number of due doses in the range.
+    """
+    until = due_until() if until is None else until
+    # Doses that are not due yet keep their status, so marking today leaves the evening dose open
+    doses = scheduled_doses(user_id, start_ts, min(end_ts, until), until)
+    offsets = np.array([schedule['tz_offset'] for schedule in doses['schedules']], dtype=np.int64)
+    defaults = np.array([schedule['default_taken'] for schedule in doses['schedules']],
+                        dtype=np.int8)
+    ids = np.array([schedule['id'] for schedule in doses['schedules']], dtype=np.int64)
+    days = (doses['ts'] + offsets[doses['schedule']] * 60) // SECONDS_PER_DAY
+    in_range = (days >= first_day) & (days <= last_day)
+
+    pairs_sql = ("SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') "
+                 "FROM json_each(?)")
+    for default, statement in (
+            (0, "INSERT OR REPLACE INTO medication_schedule_overrides (schedule_id, ts, taken) "
+                f"SELECT *, 1 FROM ({pairs_sql})"),
+            (1, "DELETE FROM medication_schedule_overrides "
+                f"WHERE (schedule_id, ts) IN ({pairs_sql})")):
+        selected = in_range & (defaults[doses['schedule']] == default)
+        if selected.any():
+            pairs = np.column_stack([ids[doses['schedule'][selected]], doses['ts'][selected]])
+            db.execute(statement, (msgspec.json.encode(pairs.tolist()).decode(),))
+    return int(in_range.sum())
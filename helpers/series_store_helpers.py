@@ -0,0 +1,471 @@
+"""
+Series Store Helpers for the Healthsome application.
+
+This module keeps a columnar copy of each user's metric series in
+memory-mapped files, so the chart and stats endpoints read a date range as
+slices of read-only arrays instead of streaming rows out of SQLite. SQLite
+stays the source of truth: writes still go to the metric tables only, and a
+series is brought up to date when it is read, from the `change_log` entries
+logged after the version it was stored at.
+
+Every series is a directory `<SERIES_STORE_DIR>/<user_id>/<metric>/` with one
+raw little-endian file per column (`id`, `ts`, `minutes` and the metric's
+values), sorted by (ts, id) like the covering index, and a `manifest.json`
+with the row count, the change_log version, the file generation and a small
+timestamp index: the first `ts` of every block of rows. Readers map the files
+of the manifest they read, which is replaced atomically, so rows still being
+appended are not visible until they are complete.
+
+Readings inserted after the last stored one are appended to the column files.
+Edits, deletions and readings inserted out of order are applied by
+compaction: the stored rows are merged with the changes and written as a new
+generation of files, which the manifest then switches to.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from flask import current_app
+
+from helpers.datetime_helpers import LOCAL_MINUTES_SQL
+from helpers.db_helpers import query_db, read_transaction
+from helpers.downsample_helpers import fetch_columns
+from helpers.sync_helpers import data_version, latest_seq
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the threads of one process are serialized
+    fcntl = None
+
+# Columns stored for every series, before the metric's value columns
+BASE_COLUMNS = (('id', 'i8'), ('ts', 'i8'), ('minutes', 'i8'))
+
+# Value columns of each metric, with their NumPy dtypes
+SERIES_COLUMNS = {
+    'blood_pressure': (('systolic', 'i8'), ('diastolic', 'i8'), ('pulse', 'i8')),
+    'weight': (('weight_value', 'f8'),),
+    'medications': (('taken', 'i8'),),
+}
+
+class SeriesStore:
+    """
+    A per-process view of the memory-mapped metric series.
+
+    Mapped columns are kept for the most recently read series, up to
+    `max_open`, and shared by every request of the process. Bringing a series
+    up to date is serialized across threads and, with `fcntl`, processes.
+    """
+
+    def __init__(self, root, index_block=1024, max_open=256):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory of the series files.
+            index_block (int): Rows per timestamp index entry.
+            max_open (int): Maximum number of series kept mapped.
+        """
+        self.root = root
+        self.index_block = index_block
+        self.max_open = max_open
+        self.pid = os.getpid()
+
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reads = 0
+        self._current = 0
+        self._appends = 0
+        self._compactions = 0
+        self._rebuilds = 0
+
+    def _path(self, user_id, metric, name=""):
+        """
+        Get the path of a series' directory or of one of its files.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+            name (str): File name within the directory.
+
+        Returns:
+            str: The path.
+        """
+        return os.path.join(self.root, str(user_id), metric, name)
+
+    def _column_file(self, user_id, metric, name, generation):
+        """
+        Get the path of a column file.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+            name (str): Name of the column.
+            generation (int): Generation of the files.
+
+        Returns:
+            str: The path.
+        """
+        return self._path(user_id, metric, f"{name}.{generation}.bin")
+
+    def _load_manifest(self, user_id, metric):
+        """
+        Read the manifest of a series.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+
+        Returns:
+            dict: The manifest, or None if the series was never stored.
+        """
+        try:
+            with open(self._path(user_id, metric, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, user_id, metric, manifest):
+        """
+        Replace the manifest of a series atomically.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+            manifest (dict): The new manifest.
+        """
+        path = self._path(user_id, metric, "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def _open(self, user_id, metric, manifest):
+        """
+        Map the columns of the rows a manifest covers, read-only.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+            manifest (dict): The series manifest.
+
+        Returns:
+            dict: One array per column, the timestamp index as '_index' and its
+            rows per entry as '_block'.
+        """
+        series = (user_id, metric)
+        state = (manifest['created'], manifest['generation'], manifest['rows'])
+        with self._lock:
+            cached = self._maps.get(series)
+            if cached is not None and cached[0] == state:
+                self._maps.move_to_end(series)
+                return cached[1]
+
+        rows = manifest['rows']
+        columns = {'_index': np.array(manifest['index'], dtype=np.int64), '_block': manifest['block']}
+        for name, dtype in BASE_COLUMNS + SERIES_COLUMNS[metric]:
+            if rows:
+                columns[name] = np.memmap(
+                    self._column_file(user_id, metric, name, manifest['generation']),
+                    dtype=f"<{dtype}", mode='r', shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+
+        with self._lock:
+            # Replaces the maps of an older state of the series, which are unmapped
+            # once the slices handed out to running requests are released
+            self._maps[series] = (state, columns)
+            self._maps.move_to_end(series)
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)
+        return columns
+
+    def _bound(self, columns, value, side):
+        """
+        Find where a timestamp falls in a series, through the timestamp index.
+
+        The index narrows the search to one block of rows, so only that block
+        of the `ts` file is read.
+
+        Args:
+            columns (dict): Columns as returned by `_open`.
+            value (int): The timestamp.
+            side (str): 'left' for the first row at or after `value`, 'right'
+                for the first row after it.
+
+        Returns:
+            int: The row position.
+        """
+        ts = columns['ts']
+        if len(ts) == 0:
+            return 0
+        size = columns['_block']
+        start = max(0, int(np.searchsorted(columns['_index'], value, side)) - 1) * size
+        return start + int(np.searchsorted(ts[start:start + size], value, side))
+
+    def read(self, metric, user_id, start_date=None, end_date=None):
+        """
+        Read a user's series for a date range, oldest first.
+
+        Args:
+            metric (str): One of the keys of SERIES_COLUMNS.
+            user_id (int): ID of the user who owns the readings.
+            start_date (int, optional): Start timestamp of the range, or None for all time.
+            end_date (int, optional): End timestamp of the range, or None for all time.
+
+        Returns:
+            dict: 'ts' (UTC seconds since the epoch), 'minutes' (local minutes since the
+            epoch) and one array per value column, as read-only slices of the mapped files.
+        """
+        if metric not in SERIES_COLUMNS:
+            raise ValueError(f"Unknown metric: {metric}")
+        manifest = self.refresh(metric, user_id)
+        columns = self._open(user_id, metric, manifest)
+        start, end = 0, manifest['rows']
+        if start_date:
+            start = self._bound(columns, start_date, 'left')
+            end = self._bound(columns, end_date, 'right')
+        with self._lock:
+            self._reads += 1
+        names = ['ts', 'minutes'] + [name for name, _ in SERIES_COLUMNS[metric]]
+        return {name: columns[name][start:end] for name in names}
+
+    def refresh(self, metric, user_id):
+        """
+        Bring a series up to date with the database.
+
+        Args:
+            metric (str): One of the keys of SERIES_COLUMNS.
+            user_id (int): ID of the user who owns the readings.
+
+        Returns:
+            dict: The manifest of the up-to-date series.
+        """
+        version = data_version(metric, user_id)
+        manifest = self._load_manifest(user_id, metric)
+        if manifest is not None and manifest['version'] == version:
+            with self._lock:
+                self._current += 1
+            return manifest
+        with self._locked(user_id, metric):
+            # Another thread or process may have caught up in the meantime
+            manifest = self._load_manifest(user_id, metric)
+            if manifest is not None and manifest['version'] == version:
+                return manifest
+            return self._catch_up(metric, user_id, manifest)
+
+    @contextmanager
+    def _locked(self, user_id, metric):
+        """
+        Hold the write lock of a series.
+
+        Args:
+            user_id (int): ID of the user.
+            metric (str): One of the keys of SERIES_COLUMNS.
+        """
+        os.makedirs(self._path(user_id, metric), exist_ok=True)
+        with self._write_lock, open(self._path(user_id, metric, "lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _catch_up(self, metric, user_id, manifest):
+        """
+        Apply the changes logged after a series' version, or store it from scratch.
+
+        A series is stored from scratch if it was never stored, or if its
+        version is ahead of the database (e.g. the database was recreated).
+
+        Args:
+            metric (str): One of the keys of SERIES_COLUMNS.
+            user_id (int): ID of the user who owns the readings.
+            manifest (dict): The current manifest, or None.
+
+        Returns:
+            dict: The new manifest.
+        """
+        names = [name for name, _ in BASE_COLUMNS + SERIES_COLUMNS[metric]]
+        dtypes = [dtype for _, dtype in BASE_COLUMNS + SERIES_COLUMNS[metric]]
+        values = ', '.join(name for name, _ in SERIES_COLUMNS[metric])
+
+        # The changes and the version they bring the series to come from one snapshot
+        with read_transaction():
+            version = data_version(metric, user_id)
+            rebuild = manifest is None or manifest['version'] > latest_seq()
+            if rebuild:
+                rows = fetch_columns(
+                    f"SELECT id, ts, {LOCAL_MINUTES_SQL}, {values} FROM {metric} "
+                    "WHERE user_id = ? ORDER BY ts ASC, id ASC", (user_id,), dtypes)
+            else:
+                # change_log has no ts or tz_offset columns, so they need no table prefix
+                changed = fetch_columns(
+                    f"SELECT m.id, m.ts, {LOCAL_MINUTES_SQL}, {values} "
+                    f"FROM change_log c JOIN {metric} m ON m.id = c.record_id "
+                    "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+                    (user_id, metric, manifest['version']), dtypes)
+                changed_ids = np.array([row['record_id'] for row in query_db(
+                    "SELECT record_id FROM change_log WHERE user_id = ? AND metric = ? AND seq > ?",
+                    (user_id, metric, manifest['version']))], dtype=np.int64)
+
+        if rebuild:
+            return self._write_generation(
+                metric, user_id, manifest, dict(zip(names, rows)), version, 'rebuild')
+
+        stored = self._open(user_id, metric, manifest)
+        changed = dict(zip(names, changed))
+        order = np.lexsort((changed['id'], changed['ts']))
+        changed = {name: column[order] for name, column in changed.items()}
+
+        replaced = np.isin(stored['id'], changed_ids)
+        in_order = manifest['rows'] == 0 or len(order) == 0 or \
+            (changed['ts'][0], changed['id'][0]) > (stored['ts'][-1], stored['id'][-1])
+        if not replaced.any() and in_order:
+            return self._append(metric, user_id, manifest, changed, version)
+
+        kept = ~replaced
+        merged = {name: np.concatenate([stored[name][kept], changed[name]]) for name in names}
+        order = np.lexsort((merged['id'], merged['ts']))
+        merged = {name: column[order] for name, column in merged.items()}
+        return self._write_generation(metric, user_id, manifest, merged, version, 'compaction')
+
+    def _append(self, metric, user_id, manifest, rows, version):
+        """
+        Append readings that come after the last stored one.
+
+        Each file is first cut back to the rows of the manifest, so a write
+        that was interrupted before its manifest was replaced is overwritten.
+
+        Args:
+            metric (str): One of the keys of SERIES_COLUMNS.
+            user_id (int): ID of the user who owns the readings.
+            manifest (dict): The current manifest.
+            rows (dict): The new rows, one array per column, sorted.
+            version (int): Version of the series after the append.
+
+        Returns:
+            dict: The new manifest.
+        """
+        count = len(rows['id'])
+        generation = manifest['generation']
+        if count:
+            for name, dtype in BASE_COLUMNS + SERIES_COLUMNS[metric]:
+                with open(self._column_file(user_id, metric, name, generation), "ab") as f:
+                    f.truncate(manifest['rows'] * np.dtype(dtype).itemsize)
+                    f.write(rows[name].astype(f"<{dtype}").tobytes())
+        total = manifest['rows'] + count
+        index = manifest['index']
+        if count:
+            ts = np.memmap(self._column_file(user_id, metric, 'ts', generation),
+                           dtype='<i8', mode='r', shape=(total,))
+            index = ts[::manifest['block']].tolist()
+        manifest = dict(manifest, version=version, rows=total, index=index)
+        self._write_manifest(user_id, metric, manifest)
+        with self._lock:
+            self._appends += 1
+        return manifest
+
+    def _write_generation(self, metric, user_id, manifest, rows, version, reason):
+        """
+        Write a series as a new generation of files and switch the manifest to it.
+
+        The files of the previous generation are kept for readers that loaded
+        the old manifest; older ones are deleted.
+
+        Args:
+            metric (str): One of the keys of SERIES_COLUMNS.
+            user_id (int): ID of the user who owns the readings.
+            manifest (dict): The current manifest, or None.
+            rows (dict): All rows of the series, one array per column, sorted.
+            version (int): Version of the series.
+            reason (str): 'compaction' or 'rebuild', for the statistics.
+
+        Returns:
+            dict: The new manifest.
+        """
+        generation = manifest['generation'] + 1 if manifest is not None else 0
+        os.makedirs(self._path(user_id, metric), exist_ok=True)
+        for name, dtype in BASE_COLUMNS + SERIES_COLUMNS[metric]:
+            with open(self._column_file(user_id, metric, name, generation), "wb") as f:
+                f.write(rows[name].astype(f"<{dtype}").tobytes())
+        # A series stored again after its directory was deleted starts over at
+        # generation 0, so mappings of the deleted files are told apart by 'created'
+        created = manifest['created'] if manifest is not None else time.time_ns()
+        manifest = {'version': version, 'generation': generation, 'rows': len(rows['id']),
+                    'block': self.index_block, 'index': rows['ts'][::self.index_block].tolist(),
+                    'created': created}
+        self._write_manifest(user_id, metric, manifest)
+
+        if generation >= 2:
+            for name, _ in BASE_COLUMNS + SERIES_COLUMNS[metric]:
+                try:
+                    os.remove(self._column_file(user_id, metric, name, generation - 2))
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            if reason == 'compaction':
+                self._compactions += 1
+            else:
+                self._rebuilds += 1
+        return manifest
+
+    def stats(self):
+        """
+        Report series store counters.
+
+        Returns:
+            dict: Mapped series, reads, up-to-date reads, appends, compactions and rebuilds.
+        """
+        with self._lock:
+            return {
+                "enabled": True,
+                "mapped": len(self._maps),
+                "max_open": self.max_open,
+                "reads": self._reads,
+                "current": self._current,
+                "appends": self._appends,
+                "compactions": self._compactions,
+                "rebuilds": self._rebuilds,
+            }
+
+def get_series_store():
+    """
+    Get the series store of the current application for this process.
+
+    Returns:
+        SeriesStore: The store, or None if `SERIES_STORE_ENABLED` is not set.
+    """
+    if not current_app.config.get('SERIES_STORE_ENABLED'):
+        return None
+    store = current_app.extensions.get('series_store')
+    if store is None or store.pid != os.getpid():
+        config = current_app.config
+        store = SeriesStore(
+            config.get('SERIES_STORE_DIR', 'series_store'),
+            index_block=config.get('SERIES_STORE_INDEX_BLOCK', 1024),
+            max_open=config.get('SERIES_STORE_MAX_OPEN', 256),
+        )
+        current_app.extensions['series_store'] = store
+    return store
+
+def read_series(metric, user_id, start_date=None, end_date=None):
+    """
+    Read a user's series from the series store, if it is enabled.
+
+    Args:
+        metric (str): One of the keys of SERIES_COLUMNS.
+        user_id (int): ID of the user who owns the readings.
+        start_date (int, optional): Start timestamp of the range, or None for all time.
+        end_date (int, optional): End timestamp of the range, or None for all time.
+
+    Returns:
+        dict: 'minutes' and one read-only array per value column, or None if the
+        store is disabled and the series has to be queried from the database.
+    """
+    store = get_series_store()
+    if store is None:
+        return None
+    return store.read(metric, user_id, start_date, end_date)
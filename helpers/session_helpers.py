@@ -0,0 +1,193 @@
+"""
+Session Helpers for the Healthsome application.
+
+This module selects the session backend from `SESSION_TYPE`:
+
+- 'sqlite' stores sessions in the `sessions` table of the application (directory) database,
+  through the pooled connections, with expiry and batched sweeping of stale rows.
+- 'cookie' keeps the whole session in Flask's signed cookie, with no server storage.
+- any other value is handed to Flask-Session (e.g. 'filesystem').
+"""
+
+import time
+
+from flask import current_app, g
+from flask_session import Session
+from flask_session.base import ServerSideSession, ServerSideSessionInterface
+
+from helpers.db_helpers import get_db
+
+class SQLiteSession(ServerSideSession):
+    """A session stored in the application database."""
+
+class SQLiteSessionInterface(ServerSideSessionInterface):
+    """
+    Store server-side sessions in the `sessions` table of the application database.
+
+    An unchanged session is only written back once more than half of its
+    lifetime has passed, so ordinary page views do not cause a write. Expired
+    sessions are ignored when read and deleted in batches, on average every
+    `cleanup_n_requests` requests or with `flask session_cleanup`.
+    """
+
+    session_class = SQLiteSession
+    ttl = False
+
+    def __init__(self, app, key_prefix='session:', permanent=True, sid_length=32,
+                 serialization_format='msgpack', cleanup_n_requests=None, sweep_batch_size=500):
+        """
+        Initialize the session interface.
+
+        Args:
+            app (Flask): The application.
+            key_prefix (str): Prefix added to session IDs in the table.
+            permanent (bool): Whether new sessions are permanent.
+            sid_length (int): Length in bytes of generated session IDs.
+            serialization_format (str): 'msgpack' or 'json'.
+            cleanup_n_requests (int, optional): Sweep on average every N requests;
+                without it, sweep with the `flask session_cleanup` command instead.
+            sweep_batch_size (int): Expired sessions deleted per sweep transaction.
+        """
+        self.sweep_batch_size = sweep_batch_size
+        super().__init__(app, key_prefix, False, permanent, sid_length,
+                         serialization_format, cleanup_n_requests)
+
+    def open_session(self, app, request):
+        """
+        Load the session of a request, after checking that the database can store sessions.
+
+        Args:
+            app (Flask): The application.
+            request (Request): The current request.
+
+        Returns:
+            SQLiteSession: The stored session, or a new one.
+        """
+        check_sessions_table()
+        return super().open_session(app, request)
+
+    def _retrieve_session_data(self, store_id):
+        """
+        Load the data of a session that has not expired.
+
+        Args:
+            store_id (str): Prefixed session ID.
+
+        Returns:
+            dict: The session data, or None if there is no valid session.
+        """
+        row = get_db(directory=True).execute(
+            "SELECT data, expiry FROM sessions WHERE id = ? AND expiry > ?",
+            (store_id, int(time.time()))).fetchone()
+        if row is None:
+            return None
+        g.session_expiry = row['expiry']
+        return self.serializer.decode(row['data'])
+
+    def _delete_session(self, store_id):
+        """
+        Delete a session.
+
+        Args:
+            store_id (str): Prefixed session ID.
+        """
+        with get_db(directory=True) as db:
+            db.execute("DELETE FROM sessions WHERE id = ?", (store_id,))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        """
+        Insert or replace a session and push back its expiry.
+
+        Args:
+            session_lifetime (timedelta): How long the session stays valid.
+            session (SQLiteSession): The session to store.
+            store_id (str): Prefixed session ID.
+        """
+        expiry = int(time.time() + session_lifetime.total_seconds())
+        with get_db(directory=True) as db:
+            db.execute(
+                "INSERT INTO sessions (id, data, expiry) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET data = excluded.data, expiry = excluded.expiry",
+                (store_id, self.serializer.encode(session), expiry)
+            )
+
+    def _delete_expired_sessions(self):
+        """
+        Delete expired sessions in batches of `sweep_batch_size`.
+
+        Each batch is its own short transaction, so a large backlog never holds
+        the write lock for long.
+
+        Returns:
+            int: Number of deleted sessions.
+        """
+        now = int(time.time())
+        deleted = 0
+        db = get_db(directory=True)
+        while True:
+            with db:
+                cur = db.execute(
+                    "DELETE FROM sessions WHERE id IN "
+                    "(SELECT id FROM sessions WHERE expiry <= ? LIMIT ?)",
+                    (now, self.sweep_batch_size)
+                )
+            deleted += cur.rowcount
+            if cur.rowcount < self.sweep_batch_size:
+                return deleted
+
+    def should_set_storage(self, app, session):
+        """
+        Decide whether the session has to be written back after this request.
+
+        Args:
+            app (Flask): The application.
+            session (SQLiteSession): The current session.
+
+        Returns:
+            bool: True if the session changed, or if it is refreshed on every request
+            and more than half of its lifetime has passed.
+        """
+        if session.modified:
+            return True
+        if not app.config['SESSION_REFRESH_EACH_REQUEST']:
+            return False
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        expiry = g.get('session_expiry', 0)
+        return expiry - time.time() < lifetime / 2
+
+def check_sessions_table():
+    """
+    Verify once per application that the directory database has the `sessions` table.
+
+    Raises:
+        RuntimeError: If the table is missing, i.e. migration 0003 was not applied.
+    """
+    if current_app.extensions.get('sessions_table'):
+        return
+    found = get_db(directory=True).execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'").fetchone()
+    if found is None:
+        raise RuntimeError(
+            "SESSION_TYPE is 'sqlite' but the database has no sessions table; "
+            "run python migrate.py, or set SESSION_TYPE=filesystem.")
+    current_app.extensions['sessions_table'] = True
+
+def init_session(app):
+    """
+    Set up the session backend selected by `SESSION_TYPE`.
+
+    Args:
+        app (Flask): The application.
+    """
+    session_type = app.config.get('SESSION_TYPE')
+    if session_type == 'sqlite':
+        app.session_interface = SQLiteSessionInterface(
+            app,
+            key_prefix=app.config.get('SESSION_KEY_PREFIX', 'session:'),
+            permanent=app.config.get('SESSION_PERMANENT', True),
+            cleanup_n_requests=app.config.get('SESSION_CLEANUP_N_REQUESTS'),
+            sweep_batch_size=app.config.get('SESSION_SWEEP_BATCH_SIZE', 500),
+        )
+    elif session_type != 'cookie':
+        # 'cookie' keeps Flask's default signed-cookie sessions
+        Session(app)
@@ -0,0 +1,238 @@
+"""
+Shard Helpers for the Healthsome application.
+
+With more than one shard, each user's readings, schedules and change log
+live in one of several shard databases instead of the main database, so
+writes of users on different shards take different SQLite write locks and
+commit in parallel. The main database stays the directory: it keeps the
+users, the sessions and the number of shards in its `shard_layout` table.
+
+A user's shard is chosen by a jump consistent hash of the user ID, which
+needs no lookup table and moves only the users whose shard changes when the
+number of shards changes (about 1/N of them when going from N - 1 to N
+shards); `rebalance_shards.py` moves them. With a single shard, the
+directory holds everything, as an unsharded database does.
+
+IDs and change_log sequence numbers of shard k start at (k + 1) << 40, so
+they are unique across shards: a moved user's records get new IDs in the
+target shard, and a sync cursor issued by one shard is never taken for one
+issued by another.
+"""
+
+import os
+import sqlite3
+
+from helpers.migration_helpers import apply_migrations
+
+# Bits of the IDs and sequence numbers below the range of each shard
+SEQUENCE_BITS = 40
+
+# Tables whose AUTOINCREMENT sequence starts at the shard's range
+SEQUENCE_TABLES = ('blood_pressure', 'weight', 'medications', 'medication_schedules', 'change_log')
+
+# Tables of a user's readings, which are moved with their rollups and change log
+METRIC_TABLES = ('blood_pressure', 'weight', 'medications')
+
+def jump_hash(key, buckets):
+    """
+    Map a key to a bucket with Lamping and Veach's jump consistent hash.
+
+    Args:
+        key (int): The key, e.g. a user ID.
+        buckets (int): Number of buckets.
+
+    Returns:
+        int: The bucket, between 0 and `buckets` - 1.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def shard_for(user_id, shard_count):
+    """
+    Get the shard holding a user's data.
+
+    Args:
+        user_id (int): ID of the user.
+        shard_count (int): Number of shards.
+
+    Returns:
+        int: Index of the user's shard.
+    """
+    return jump_hash(user_id, shard_count) if shard_count > 1 else 0
+
+def shard_file(database, index, shard_count, template=""):
+    """
+    Get the path of a shard database.
+
+    Args:
+        database (str): Path of the directory database.
+        index (int): Index of the shard.
+        shard_count (int): Number of shards.
+        template (str): Path with an `{index}` placeholder; defaults to
+            'healthsome.shard<index>.db' next to the directory database.
+
+    Returns:
+        str: The shard's path, which is the directory itself with a single shard.
+    """
+    if shard_count <= 1:
+        return database
+    if template:
+        return template.format(index=index)
+    root, ext = os.path.splitext(database)
+    return f"{root}.shard{index}{ext or '.db'}"
+
+def shard_files(database, shard_count, template=""):
+    """
+    Get the paths of all shard databases.
+
+    Args:
+        database (str): Path of the directory database.
+        shard_count (int): Number of shards.
+        template (str): Path with an `{index}` placeholder, as for `shard_file`.
+
+    Returns:
+        list: The shard paths ordered by index.
+    """
+    return [shard_file(database, index, shard_count, template) for index in range(shard_count)]
+
+def get_shard_count(conn):
+    """
+    Read the number of shards from the directory database.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the directory database.
+
+    Returns:
+        int: The number of shards, 1 if the database was never sharded.
+    """
+    try:
+        row = conn.execute("SELECT shard_count FROM shard_layout WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 1  # No shard_layout table yet
+    return row[0] if row else 1
+
+def set_shard_count(conn, shard_count):
+    """
+    Record the number of shards in the directory database.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the directory database.
+        shard_count (int): Number of shards.
+    """
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS shard_layout ("
+                     "id INTEGER PRIMARY KEY CHECK (id = 1), "
+                     "shard_count INTEGER NOT NULL CHECK (shard_count >= 1))")
+        conn.execute("INSERT INTO shard_layout (id, shard_count) VALUES (1, ?) "
+                     "ON CONFLICT (id) DO UPDATE SET shard_count = excluded.shard_count",
+                     (shard_count,))
+
+def init_shard(path, index, schema_file):
+    """
+    Create a shard database, or bring an existing one to the latest schema version.
+
+    A new shard gets the full schema, so its tables and indexes match the
+    directory's, and sequences starting at the shard's ID range.
+
+    Args:
+        path (str): Path of the shard database.
+        index (int): Index of the shard.
+        schema_file (str): Path of the SQL schema file.
+
+    Returns:
+        bool: True if the shard was created.
+    """
+    created = not os.path.exists(path)
+    conn = sqlite3.connect(path)
+    try:
+        if created:
+            with open(schema_file, "r", encoding="utf-8") as f:
+                conn.executescript(f.read())
+        apply_migrations(conn)
+        if created:
+            with conn:
+                # Rebuilt tables (migration 0004) may have left an entry without a value
+                conn.executemany("DELETE FROM sqlite_sequence WHERE name = ?",
+                                 ((table,) for table in SEQUENCE_TABLES))
+                conn.executemany("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                                 ((table, (index + 1) << SEQUENCE_BITS) for table in SEQUENCE_TABLES))
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+    return created
+
+def _copied_columns(conn, table):
+    """
+    List the stored columns of a table except its ID.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the source database.
+        table (str): Name of the table.
+
+    Returns:
+        str: The column names separated by commas; generated columns are left out.
+    """
+    return ', '.join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")
+                     if row[1] != 'id')
+
+def move_user(conn, user_id):
+    """
+    Move a user's data from one shard to another.
+
+    `conn` is connected to the source shard with the target shard attached
+    as `target`. The readings and schedules are copied with new IDs from the
+    target's range, and tombstones of their old IDs are added to the
+    target's change log, so a client that synced from the source drops them
+    on its next sync. The triggers of the target fill its rollups and change
+    log; the user's rows, rollups and change log are then deleted from the
+    source. Everything happens in one transaction, which commits atomically
+    across both files unless the source is in WAL mode.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the source shard, not in a transaction.
+        user_id (int): ID of the user to move.
+
+    Returns:
+        int: Number of moved readings and schedules.
+    """
+    moved = 0
+    with conn:
+        for table in METRIC_TABLES:
+            columns = _copied_columns(conn, table)
+            moved += conn.execute(f"INSERT INTO target.{table} ({columns}) "
+                                  f"SELECT {columns} FROM main.{table} WHERE user_id = ? ORDER BY id",
+                                  (user_id,)).rowcount
+            conn.execute("INSERT OR REPLACE INTO target.change_log (user_id, metric, record_id, deleted) "
+                         f"SELECT user_id, '{table}', id, 1 FROM main.{table} WHERE user_id = ?",
+                         (user_id,))
+
+        columns = _copied_columns(conn, 'medication_schedules')
+        schedule_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM main.medication_schedules WHERE user_id = ? ORDER BY id", (user_id,))]
+        for schedule_id in schedule_ids:
+            new_id = conn.execute(f"INSERT INTO target.medication_schedules ({columns}) "
+                                  f"SELECT {columns} FROM main.medication_schedules WHERE id = ?",
+                                  (schedule_id,)).lastrowid
+            conn.execute("INSERT INTO target.medication_schedule_overrides (schedule_id, ts, taken) "
+                         "SELECT ?, ts, taken FROM main.medication_schedule_overrides "
+                         "WHERE schedule_id = ?", (new_id, schedule_id))
+        moved += len(schedule_ids)
+
+        # Earlier deletions are kept for clients that have not synced them yet
+        conn.execute("INSERT OR IGNORE INTO target.change_log (user_id, metric, record_id, deleted) "
+                     "SELECT user_id, metric, record_id, 1 FROM main.change_log "
+                     "WHERE user_id = ? AND deleted = 1", (user_id,))
+
+        conn.execute("DELETE FROM main.medication_schedule_overrides WHERE schedule_id IN "
+                     "(SELECT id FROM main.medication_schedules WHERE user_id = ?)", (user_id,))
+        conn.execute("DELETE FROM main.medication_schedules WHERE user_id = ?", (user_id,))
+        for table in METRIC_TABLES:
+            conn.execute(f"DELETE FROM main.{table} WHERE user_id = ?", (user_id,))
+            conn.execute(f"DELETE FROM main.{table}_rollups WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM main.change_log WHERE user_id = ?", (user_id,))
+    return moved
@@ -0,0 +1,135 @@
+"""
+Slow Query Helpers for the Healthsome application.
+
+This module records SQL statements that take longer than `SLOW_QUERY_THRESHOLD_MS`
+to a rotating JSON-lines log. Each entry holds the normalized statement, the
+shapes of its bound parameters (their types, never their values, since they are
+health data), the row count, the request endpoint and the `EXPLAIN QUERY PLAN`
+output, so a slow page can be traced to its range, its row count or a bad plan.
+`slow_queries.py` summarizes the log.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_request_context, request
+
+from helpers.metrics_helpers import normalize_sql
+from helpers.migration_helpers import BAD_PLAN_PATTERNS
+
+# Names of bound parameter types as written to the log
+PARAM_TYPES = {
+    type(None): "null",
+    int: "int",
+    float: "real",
+    str: "text",
+    bytes: "blob",
+    bool: "int",
+}
+
+def param_shapes(args):
+    """
+    Describe bound parameters by type without revealing their values.
+
+    Args:
+        args (tuple or dict): Positional or named query parameters.
+
+    Returns:
+        list or dict: Type names in parameter order, or by parameter name.
+    """
+    if isinstance(args, dict):
+        return {name: PARAM_TYPES.get(type(value), type(value).__name__)
+                for name, value in args.items()}
+    return [PARAM_TYPES.get(type(value), type(value).__name__) for value in args]
+
+def explain_plan(db, query, args):
+    """
+    Get the query plan of a statement.
+
+    Args:
+        db (sqlite3.Connection): Connection the statement ran on.
+        query (str): The SQL statement.
+        args (tuple or dict): The statement's parameters.
+
+    Returns:
+        list: Plan step details, or None if the statement cannot be explained.
+    """
+    try:
+        return [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {query}", args)]
+    except sqlite3.Error:
+        return None
+
+class SlowQueryLog:
+    """A rotating JSON-lines log of statements slower than a threshold."""
+
+    def __init__(self, path, threshold_ms, max_bytes=10 * 1024 * 1024, backups=5):
+        """
+        Open the log.
+
+        Args:
+            path (str): Path of the log file.
+            threshold_ms (float): Statements taking at least this long are logged.
+            max_bytes (int): Size at which the file is rotated.
+            backups (int): Number of rotated files kept.
+        """
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.logger = logging.getLogger(f"healthsome.slow_queries.{os.path.abspath(path)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                          encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def record(self, db, query, args, seconds, rows):
+        """
+        Log a statement if it reached the threshold.
+
+        Args:
+            db (sqlite3.Connection): Connection the statement ran on.
+            query (str): The SQL statement.
+            args (tuple or dict): The statement's parameters.
+            seconds (float): Time the statement took.
+            rows (int): Rows returned or changed.
+        """
+        if seconds < self.threshold:
+            return
+        plan = explain_plan(db, query, args)
+        self.logger.info(json.dumps({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "endpoint": request.endpoint if has_request_context() else None,
+            "sql": normalize_sql(query),
+            "params": param_shapes(args),
+            "rows": rows,
+            "ms": round(seconds * 1000, 3),
+            "plan": plan,
+            "unindexed": any(pattern.search(detail) for detail in plan or ()
+                             for pattern in BAD_PLAN_PATTERNS),
+        }))
+
+def get_slow_query_log():
+    """
+    Get the slow query log of the current application, creating it on first use.
+
+    Returns:
+        SlowQueryLog: The log, or None if `SLOW_QUERY_THRESHOLD_MS` is not set.
+    """
+    if not current_app.config.get('SLOW_QUERY_THRESHOLD_MS'):
+        return None
+    log = current_app.extensions.get('slow_query_log')
+    if log is None:
+        # A '{pid}' placeholder gives every worker process its own file to rotate
+        log = SlowQueryLog(
+            current_app.config.get('SLOW_QUERY_LOG_FILE', 'slow_queries.log').format(pid=os.getpid()),
+            current_app.config['SLOW_QUERY_THRESHOLD_MS'],
+            max_bytes=current_app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backups=current_app.config.get('SLOW_QUERY_LOG_BACKUPS', 5),
+        )
+        current_app.extensions['slow_query_log'] = log
+    return log
@@ -0,0 +1,140 @@
+"""
+Sync Helpers for the Healthsome application.
+
+This module serves incremental chart data. The chart scripts keep a user's
+full series in the browser and send back the cursor of their last sync as
+`/data?since=<cursor>`; only the records inserted, updated or deleted after
+the cursor are returned, with deleted records as tombstones. Changes are
+read from the `change_log` table maintained by the triggers of
+`migrations/0005_change_log.sql`, whose sequence numbers are the cursors.
+"""
+
+from flask import current_app, stream_with_context
+
+from helpers.datetime_helpers import LOCAL_TIME_SQL
+from helpers.db_helpers import query_db, read_transaction
+from helpers.json_helpers import encode_json, iter_json_array
+
+# Columns of each metric sent to the client, after the ID, timestamp and local time
+SYNC_COLUMNS = {
+    'blood_pressure': ('systolic', 'diastolic', 'pulse'),
+    'weight': ('weight_value',),
+    'medications': ('medication_name', 'taken'),
+}
+
+def parse_since(value):
+    """
+    Parse the cursor sent by a client.
+
+    Args:
+        value (str): The `since` query parameter.
+
+    Returns:
+        int: The cursor, or 0 (a full sync) if it is missing or invalid.
+    """
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+def latest_seq():
+    """
+    Get the sequence number of the latest logged change.
+
+    Returns:
+        int: The sequence number, or 0 if nothing has been logged yet.
+    """
+    row = query_db("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'", one=True)
+    return row['seq'] if row and row['seq'] else 0
+
+def data_version(metric, user_id):
+    """
+    Get the version of a user's records of a metric.
+
+    The version changes whenever one of the records is inserted, updated or
+    deleted, by any worker process, so it can key cached results derived from them.
+
+    Args:
+        metric (str): One of the keys of SYNC_COLUMNS, or 'medication_schedules'.
+        user_id (int): ID of the user who owns the records.
+
+    Returns:
+        int: Sequence number of the latest change, or 0 if none was logged.
+    """
+    row = query_db("SELECT MAX(seq) AS seq FROM change_log WHERE user_id = ? AND metric = ?",
+                   (user_id, metric), one=True)
+    return row['seq'] or 0
+
+def iter_sync_json(metric, user_id, since, make_point, chunk_size=1000):
+    """
+    Encode a user's records of a metric that changed after a cursor as JSON.
+
+    With a cursor of 0, or one the database has never issued (e.g. after the
+    database was recreated), every record is returned and `reset` is set so
+    the client drops what it has. Those records are streamed in chunks, as
+    for the raw `/data` series, so memory use does not grow with the
+    history; the changes after a valid cursor are encoded at once.
+
+    Args:
+        metric (str): One of the keys of SYNC_COLUMNS.
+        user_id (int): ID of the user who owns the records.
+        since (int): Cursor returned by the previous sync.
+        make_point (callable): Builds a client record from (id, ts, local time, columns...).
+        chunk_size (int): Number of records fetched and encoded per chunk.
+
+    Yields:
+        bytes: Consecutive pieces of a JSON object with the new cursor, whether
+        the client must replace its copy, the IDs of deleted records and the
+        changed records.
+    """
+    if metric not in SYNC_COLUMNS:
+        raise ValueError(f"Unknown metric: {metric}")
+    # change_log has no ts, tz_offset or measurement columns, so they need no table prefix
+    columns = ', '.join((LOCAL_TIME_SQL,) + SYNC_COLUMNS[metric])
+
+    # The cursor and the records are read from the same snapshot, so a change
+    # committed in between is neither skipped nor sent twice
+    with read_transaction():
+        cursor = latest_seq()
+        if since == 0 or since > cursor:
+            yield (b'{"cursor":' + encode_json(str(cursor)) +
+                   b',"reset":true,"deleted":[],"records":')
+            yield from iter_json_array(
+                f"SELECT m.id, m.ts, {columns} FROM {metric} m "
+                "WHERE m.user_id = ? ORDER BY m.ts ASC, m.id ASC",
+                (user_id,), make_point, chunk_size)
+            yield b"}"
+            return
+
+        changes = query_db(
+            f"SELECT c.record_id, c.deleted, m.id, m.ts, {columns} "
+            f"FROM change_log c LEFT JOIN {metric} m ON m.id = c.record_id "
+            "WHERE c.user_id = ? AND c.metric = ? AND c.seq > ? ORDER BY c.seq ASC",
+            (user_id, metric, since)
+        )
+    yield encode_json({
+        "cursor": str(cursor),
+        "reset": False,
+        "deleted": [change['record_id'] for change in changes if change['deleted']],
+        "records": [make_point(*tuple(change)[2:]) for change in changes if not change['deleted']],
+    })
+
+def sync_response(metric, user_id, since, make_point):
+    """
+    Answer a `/data?since=<cursor>` request.
+
+    Args:
+        metric (str): One of the keys of SYNC_COLUMNS.
+        user_id (int): ID of the user who owns the records.
+        since (str): The `since` query parameter.
+        make_point (callable): Builds a client record from (id, ts, local time, columns...).
+
+    Returns:
+        Response: The sync result as streamed JSON.
+    """
+    response = current_app.response_class(
+        stream_with_context(iter_sync_json(metric, user_id, parse_since(since), make_point)),
+        mimetype='application/json')
+    # The result depends on the cursor, and the client keeps its own copy
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
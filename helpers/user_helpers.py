@@ -0,0 +1,160 @@
+"""
+User Helpers for the Healthsome application.
+
+This module resolves the username of the logged-in user for templates without
+querying the `users` table on every render. The username is looked up, in
+order, in a request-scoped memo, in the session (where it is stored at login)
+and in a per-process TTL cache; only when all three miss is the database
+queried, at most once per request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, session
+
+from helpers.db_helpers import directory_db, query_db
+
+# Where a username lookup was answered from, in lookup order
+LOOKUP_SOURCES = ('request', 'session', 'cache', 'database')
+
+class UserCache:
+    """
+    A bounded, thread-safe TTL cache of usernames by user ID.
+
+    Also counts where each username lookup was answered from, so the hit rate
+    of the identity cache can be reported.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of cached usernames.
+            ttl (float): Seconds an entry stays valid; 0 disables expiry.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = dict.fromkeys(LOOKUP_SOURCES, 0)
+
+    def get(self, user_id):
+        """
+        Look up a cached username.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            str: The username, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if self.ttl and entry[1] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def set(self, user_id, username):
+        """
+        Cache a username, evicting the least recently used entries if full.
+
+        Args:
+            user_id (int): ID of the user.
+            username (str): The user's username.
+        """
+        with self._lock:
+            self._entries[user_id] = (username, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached username of a user after the user changed.
+
+        Args:
+            user_id (int): ID of the user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def record(self, source):
+        """
+        Count a username lookup.
+
+        Args:
+            source (str): One of LOOKUP_SOURCES.
+        """
+        with self._lock:
+            self.lookups[source] += 1
+
+    def stats(self):
+        """
+        Report cache usage counters.
+
+        Returns:
+            dict: Entry count, lookups by source and the share answered without the database.
+        """
+        with self._lock:
+            total = sum(self.lookups.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "lookups": dict(self.lookups),
+                "hit_rate": round(1 - self.lookups['database'] / total, 4) if total else None,
+            }
+
+def get_user_cache():
+    """
+    Get the user cache of the current application, creating it on first use.
+
+    Returns:
+        UserCache: The cache for the current application.
+    """
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        cache = UserCache(current_app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+                          current_app.config.get('USER_CACHE_TTL', 300))
+        current_app.extensions['user_cache'] = cache
+    return cache
+
+def get_current_username():
+    """
+    Get the username of the logged-in user.
+
+    Returns:
+        str: The username, or None if no user is logged in or the user no longer exists.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+
+    cache = get_user_cache()
+    if 'current_username' in g:
+        cache.record('request')
+        return g.current_username
+
+    username = session.get('username')
+    if username:
+        cache.record('session')
+    else:
+        username = cache.get(user_id)
+        if username:
+            cache.record('cache')
+        else:
+            cache.record('database')
+            with directory_db():
+                user = query_db("SELECT username FROM users WHERE id = ?", (user_id,), one=True)
+            username = user['username'] if user else None
+            if username:
+                cache.set(user_id, username)
+
+    g.current_username = username
+    return username
@@ -0,0 +1,91 @@
+"""
+Database Migration Script
+
+This script upgrades an existing Healthsome database in place by applying the
+versioned migrations from the `migrations/` directory, and can verify that
+every metric query is served by an index. A sharded database is migrated and
+checked shard by shard after the directory.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from dotenv import load_dotenv
+
+from helpers.migration_helpers import apply_migrations, find_plan_problems, get_schema_version
+from helpers.shard_helpers import get_shard_count, shard_files
+
+# Load environment variables from .env file
+load_dotenv()
+
+DB_FILE = os.getenv("DB_FILE", "healthsome.db")
+SHARD_FILE_TEMPLATE = os.getenv("SHARD_FILE_TEMPLATE", "")
+
+def migrate(conn):
+    """
+    Apply pending migrations and report the resulting schema version.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+    """
+    applied = apply_migrations(conn)
+    for version, name in applied:
+        print(f"Applied migration {version:04d}_{name}.")
+    if not applied:
+        print("Database is already up to date.")
+    print(f"Schema version: {get_schema_version(conn)}.")
+
+def check_plans(conn):
+    """
+    Verify that no metric query falls back to a full scan or a temp B-tree sort.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+
+    Returns:
+        bool: True if every query plan is indexed, False otherwise.
+    """
+    problems = find_plan_problems(conn)
+    for query, detail in problems:
+        print(f"Unindexed plan step '{detail}' in query: {query}")
+    if not problems:
+        print("All metric queries are served by indexes.")
+    return not problems
+
+def main():
+    """
+    Parse command line arguments and migrate or check the database.
+    """
+    parser = argparse.ArgumentParser(description="Upgrade the Healthsome database schema.")
+    parser.add_argument("--check", action="store_true",
+                        help="verify metric query plans after migrating and exit non-zero on failure")
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_FILE):
+        print(f"Database file '{DB_FILE}' not found. Run create_db.py first.")
+        sys.exit(1)
+
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            shard_count = get_shard_count(conn)
+            databases = [DB_FILE]
+            if shard_count > 1:
+                databases += shard_files(DB_FILE, shard_count, SHARD_FILE_TEMPLATE)
+        passed = True
+        for database in databases:
+            if len(databases) > 1:
+                print(f"{database}:")
+            with sqlite3.connect(database) as conn:
+                migrate(conn)
+                if args.check:
+                    passed = check_plans(conn) and passed
+        if not passed:
+            sys.exit(1)
+    except sqlite3.DatabaseError as e:
+        print(f"Error migrating database: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+-- Composite indexes for per-user, time-ordered metric queries.
+--
+-- Every list page and chart endpoint filters by user_id and a date_time range
+-- and orders by date_time. The indexes lead with (user_id, date_time, id) so
+-- those queries become a range search with no sort step; id breaks ties
+-- between readings taken at the same minute. The value columns are appended
+-- so the indexes cover the queries and the table itself is never visited.
+
+-- Blood pressure: covers list pages and chart data
+CREATE INDEX IF NOT EXISTS idx_blood_pressure_user_date
+    ON blood_pressure (user_id, date_time, id, systolic, diastolic, pulse);
+
+-- Weight: covers list pages and chart data
+CREATE INDEX IF NOT EXISTS idx_weight_user_date
+    ON weight (user_id, date_time, id, weight_value);
+
+-- Medications: covers list pages and chart data
+CREATE INDEX IF NOT EXISTS idx_medications_user_date
+    ON medications (user_id, date_time, id, medication_name, dosage, taken);
@@ -0,0 +1,284 @@
+-- Daily and weekly rollups of every metric, per user.
+--
+-- Each rollup row summarizes one user's readings for one bucket: a calendar
+-- day ('YYYY-MM-DD') or an ISO week, keyed by the date of its Monday. The
+-- rollups are maintained by triggers, so they change in the same transaction
+-- as the write that changed the readings. Inserts adjust their buckets
+-- incrementally; updates and deletes recompute the affected buckets from the
+-- indexed readings, since a minimum or maximum cannot be taken back.
+
+-- Table for blood pressure rollups
+CREATE TABLE blood_pressure_rollups (
+    -- ID of the user who owns the readings
+    user_id INTEGER NOT NULL,
+    -- Bucket size: 'day' or 'week'
+    period TEXT NOT NULL CHECK (period IN ('day', 'week')),
+    -- Bucket start date (the Monday for weekly buckets)
+    bucket TEXT NOT NULL,
+    -- Number of readings in the bucket
+    samples INTEGER NOT NULL,
+    -- Sum, minimum and maximum of each measurement
+    systolic_sum INTEGER NOT NULL,
+    systolic_min INTEGER NOT NULL,
+    systolic_max INTEGER NOT NULL,
+    diastolic_sum INTEGER NOT NULL,
+    diastolic_min INTEGER NOT NULL,
+    diastolic_max INTEGER NOT NULL,
+    pulse_sum INTEGER NOT NULL,
+    pulse_min INTEGER NOT NULL,
+    pulse_max INTEGER NOT NULL,
+    PRIMARY KEY (user_id, period, bucket)
+) WITHOUT ROWID;
+
+-- Table for weight rollups
+CREATE TABLE weight_rollups (
+    -- ID of the user who owns the readings
+    user_id INTEGER NOT NULL,
+    -- Bucket size: 'day' or 'week'
+    period TEXT NOT NULL CHECK (period IN ('day', 'week')),
+    -- Bucket start date (the Monday for weekly buckets)
+    bucket TEXT NOT NULL,
+    -- Number of readings in the bucket
+    samples INTEGER NOT NULL,
+    -- Sum, minimum and maximum of the weight values
+    weight_sum REAL NOT NULL,
+    weight_min REAL NOT NULL,
+    weight_max REAL NOT NULL,
+    PRIMARY KEY (user_id, period, bucket)
+) WITHOUT ROWID;
+
+-- Table for medication rollups
+CREATE TABLE medications_rollups (
+    -- ID of the user who owns the records
+    user_id INTEGER NOT NULL,
+    -- Bucket size: 'day' or 'week'
+    period TEXT NOT NULL CHECK (period IN ('day', 'week')),
+    -- Bucket start date (the Monday for weekly buckets)
+    bucket TEXT NOT NULL,
+    -- Number of scheduled doses in the bucket
+    doses INTEGER NOT NULL,
+    -- Number of doses marked as taken
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (user_id, period, bucket)
+) WITHOUT ROWID;
+
+-- Blood pressure: fold a new reading into its day and week
+CREATE TRIGGER blood_pressure_rollups_insert AFTER INSERT ON blood_pressure
+BEGIN
+    INSERT INTO blood_pressure_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1,
+                NEW.systolic, NEW.systolic, NEW.systolic,
+                NEW.diastolic, NEW.diastolic, NEW.diastolic,
+                NEW.pulse, NEW.pulse, NEW.pulse),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1,
+                NEW.systolic, NEW.systolic, NEW.systolic,
+                NEW.diastolic, NEW.diastolic, NEW.diastolic,
+                NEW.pulse, NEW.pulse, NEW.pulse)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            samples = samples + 1,
+            systolic_sum = systolic_sum + excluded.systolic_sum,
+            systolic_min = min(systolic_min, excluded.systolic_min),
+            systolic_max = max(systolic_max, excluded.systolic_max),
+            diastolic_sum = diastolic_sum + excluded.diastolic_sum,
+            diastolic_min = min(diastolic_min, excluded.diastolic_min),
+            diastolic_max = max(diastolic_max, excluded.diastolic_max),
+            pulse_sum = pulse_sum + excluded.pulse_sum,
+            pulse_min = min(pulse_min, excluded.pulse_min),
+            pulse_max = max(pulse_max, excluded.pulse_max);
+END;
+
+-- Blood pressure: recompute the buckets a reading left and entered
+CREATE TRIGGER blood_pressure_rollups_update AFTER UPDATE ON blood_pressure
+BEGIN
+    DELETE FROM blood_pressure_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO blood_pressure_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(systolic), MIN(systolic), MAX(systolic),
+               SUM(diastolic), MIN(diastolic), MAX(diastolic),
+               SUM(pulse), MIN(pulse), MAX(pulse)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN blood_pressure
+            ON blood_pressure.user_id = b.user_id
+            AND blood_pressure.date_time >= b.bucket AND blood_pressure.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Blood pressure: recompute the buckets a deleted reading belonged to
+CREATE TRIGGER blood_pressure_rollups_delete AFTER DELETE ON blood_pressure
+BEGIN
+    DELETE FROM blood_pressure_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO blood_pressure_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(systolic), MIN(systolic), MAX(systolic),
+               SUM(diastolic), MIN(diastolic), MAX(diastolic),
+               SUM(pulse), MIN(pulse), MAX(pulse)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN blood_pressure
+            ON blood_pressure.user_id = b.user_id
+            AND blood_pressure.date_time >= b.bucket AND blood_pressure.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Weight: fold a new reading into its day and week
+CREATE TRIGGER weight_rollups_insert AFTER INSERT ON weight
+BEGIN
+    INSERT INTO weight_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1,
+                NEW.weight_value, NEW.weight_value, NEW.weight_value),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1,
+                NEW.weight_value, NEW.weight_value, NEW.weight_value)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            samples = samples + 1,
+            weight_sum = weight_sum + excluded.weight_sum,
+            weight_min = min(weight_min, excluded.weight_min),
+            weight_max = max(weight_max, excluded.weight_max);
+END;
+
+-- Weight: recompute the buckets a reading left and entered
+CREATE TRIGGER weight_rollups_update AFTER UPDATE ON weight
+BEGIN
+    DELETE FROM weight_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO weight_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(weight_value), MIN(weight_value), MAX(weight_value)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN weight
+            ON weight.user_id = b.user_id
+            AND weight.date_time >= b.bucket AND weight.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Weight: recompute the buckets a deleted reading belonged to
+CREATE TRIGGER weight_rollups_delete AFTER DELETE ON weight
+BEGIN
+    DELETE FROM weight_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO weight_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(weight_value), MIN(weight_value), MAX(weight_value)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN weight
+            ON weight.user_id = b.user_id
+            AND weight.date_time >= b.bucket AND weight.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Medications: fold a new dose into its day and week
+CREATE TRIGGER medications_rollups_insert AFTER INSERT ON medications
+BEGIN
+    INSERT INTO medications_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1, NEW.taken),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1, NEW.taken)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            doses = doses + 1,
+            taken = taken + excluded.taken;
+END;
+
+-- Medications: recompute the buckets a dose left and entered
+CREATE TRIGGER medications_rollups_update AFTER UPDATE ON medications
+BEGIN
+    DELETE FROM medications_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO medications_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*), SUM(taken)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN medications
+            ON medications.user_id = b.user_id
+            AND medications.date_time >= b.bucket AND medications.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Medications: recompute the buckets a deleted dose belonged to
+CREATE TRIGGER medications_rollups_delete AFTER DELETE ON medications
+BEGIN
+    DELETE FROM medications_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO medications_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*), SUM(taken)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN medications
+            ON medications.user_id = b.user_id
+            AND medications.date_time >= b.bucket AND medications.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Build the rollups for the readings that already exist
+INSERT INTO blood_pressure_rollups
+    SELECT user_id, 'day', date(date_time), COUNT(*),
+           SUM(systolic), MIN(systolic), MAX(systolic),
+           SUM(diastolic), MIN(diastolic), MAX(diastolic),
+           SUM(pulse), MIN(pulse), MAX(pulse)
+    FROM blood_pressure GROUP BY user_id, date(date_time)
+    UNION ALL
+    SELECT user_id, 'week', date(date_time, '-6 days', 'weekday 1'), COUNT(*),
+           SUM(systolic), MIN(systolic), MAX(systolic),
+           SUM(diastolic), MIN(diastolic), MAX(diastolic),
+           SUM(pulse), MIN(pulse), MAX(pulse)
+    FROM blood_pressure GROUP BY user_id, date(date_time, '-6 days', 'weekday 1');
+
+INSERT INTO weight_rollups
+    SELECT user_id, 'day', date(date_time), COUNT(*),
+           SUM(weight_value), MIN(weight_value), MAX(weight_value)
+    FROM weight GROUP BY user_id, date(date_time)
+    UNION ALL
+    SELECT user_id, 'week', date(date_time, '-6 days', 'weekday 1'), COUNT(*),
+           SUM(weight_value), MIN(weight_value), MAX(weight_value)
+    FROM weight GROUP BY user_id, date(date_time, '-6 days', 'weekday 1');
+
+INSERT INTO medications_rollups
+    SELECT user_id, 'day', date(date_time), COUNT(*), SUM(taken)
+    FROM medications GROUP BY user_id, date(date_time)
+    UNION ALL
+    SELECT user_id, 'week', date(date_time, '-6 days', 'weekday 1'), COUNT(*), SUM(taken)
+    FROM medications GROUP BY user_id, date(date_time, '-6 days', 'weekday 1');
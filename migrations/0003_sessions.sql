@@ -0,0 +1,17 @@
+-- Server-side session store in the application database.
+--
+-- Replaces the one-file-per-session filesystem store. Sessions are keyed by
+-- their random session ID and carry an absolute expiry as a Unix timestamp;
+-- the expiry index lets stale sessions be swept in small batches without
+-- scanning live ones.
+
+CREATE TABLE IF NOT EXISTS sessions (
+    -- Prefixed session ID from the session cookie
+    id TEXT PRIMARY KEY,
+    -- Serialized session data
+    data BLOB NOT NULL,
+    -- Unix time after which the session is no longer valid
+    expiry INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expiry);
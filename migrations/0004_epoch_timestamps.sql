@@ -0,0 +1,336 @@
+-- Integer epoch timestamps for the metric tables.
+--
+-- Every reading now stores its time as `ts`, UTC seconds since the epoch, and
+-- `tz_offset`, the offset of the local clock it was recorded on from UTC in
+-- minutes. `date_time` becomes a virtual generated column holding the local
+-- 'YYYY-MM-DD HH:MM' time: it is computed on read and takes no space, and
+-- templates, exports and the rollup triggers keep reading it unchanged. Range
+-- filters, ordering and pagination compare the integer `ts` instead of text,
+-- and the covering indexes lead with (user_id, ts, id).
+--
+-- Existing readings were stored as local wall-clock time without an offset.
+-- They are converted with SQLite's 'utc' modifier, i.e. in the time zone of
+-- the process applying this migration, which is the server time zone the
+-- application used to interpret them.
+--
+-- SQLite cannot change a column in place, so each table is rebuilt: copied
+-- into a new table, dropped and renamed. The AUTOINCREMENT counters are
+-- carried over so deleted IDs are not reused, and the rollup triggers, which
+-- are dropped with their table, are recreated. Their recompute joins now
+-- narrow by `ts` (a local day lies within 14 hours of the same UTC day) before
+-- matching the local `date_time`, so they stay index searches.
+
+-- Blood pressure: rebuild with ts and tz_offset
+CREATE TABLE blood_pressure_new (
+    -- Unique record ID
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- ID of the user who owns this record
+    user_id INTEGER NOT NULL,
+    -- Systolic blood pressure
+    systolic INTEGER NOT NULL,
+    -- Diastolic blood pressure
+    diastolic INTEGER NOT NULL,
+    -- Pulse
+    pulse INTEGER NOT NULL,
+    -- Time of the measurement in UTC seconds since the epoch
+    ts INTEGER NOT NULL,
+    -- Offset of the local time of the measurement from UTC, in minutes
+    tz_offset INTEGER NOT NULL DEFAULT 0,
+    -- Local date and time of the measurement ('YYYY-MM-DD HH:MM'), computed on read
+    date_time TEXT GENERATED ALWAYS AS (
+        strftime('%Y-%m-%d %H:%M', ts + tz_offset * 60, 'unixepoch')) VIRTUAL,
+    -- Foreign key linking to users table
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+INSERT INTO blood_pressure_new (id, user_id, systolic, diastolic, pulse, ts, tz_offset)
+    SELECT id, user_id, systolic, diastolic, pulse,
+           CAST(strftime('%s', date_time, 'utc') AS INTEGER),
+           (CAST(strftime('%s', date_time) AS INTEGER)
+            - CAST(strftime('%s', date_time, 'utc') AS INTEGER)) / 60
+    FROM blood_pressure ORDER BY id;
+
+UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'blood_pressure')
+    WHERE name = 'blood_pressure_new';
+
+DROP TABLE blood_pressure;
+ALTER TABLE blood_pressure_new RENAME TO blood_pressure;
+
+-- Weight: rebuild with ts and tz_offset
+CREATE TABLE weight_new (
+    -- Unique record ID
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- ID of the user who owns this record
+    user_id INTEGER NOT NULL,
+    -- Weight value in kilograms
+    weight_value REAL NOT NULL,
+    -- Time of the measurement in UTC seconds since the epoch
+    ts INTEGER NOT NULL,
+    -- Offset of the local time of the measurement from UTC, in minutes
+    tz_offset INTEGER NOT NULL DEFAULT 0,
+    -- Local date and time of the measurement ('YYYY-MM-DD HH:MM'), computed on read
+    date_time TEXT GENERATED ALWAYS AS (
+        strftime('%Y-%m-%d %H:%M', ts + tz_offset * 60, 'unixepoch')) VIRTUAL,
+    -- Foreign key linking to users table
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+INSERT INTO weight_new (id, user_id, weight_value, ts, tz_offset)
+    SELECT id, user_id, weight_value,
+           CAST(strftime('%s', date_time, 'utc') AS INTEGER),
+           (CAST(strftime('%s', date_time) AS INTEGER)
+            - CAST(strftime('%s', date_time, 'utc') AS INTEGER)) / 60
+    FROM weight ORDER BY id;
+
+UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'weight')
+    WHERE name = 'weight_new';
+
+DROP TABLE weight;
+ALTER TABLE weight_new RENAME TO weight;
+
+-- Medications: rebuild with ts and tz_offset
+CREATE TABLE medications_new (
+    -- Unique record ID
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- ID of the user who owns this record
+    user_id INTEGER NOT NULL,
+    -- Name of the medication
+    medication_name TEXT NOT NULL,
+    -- Dosage information (optional)
+    dosage TEXT,
+    -- Whether the medication was taken (0 = no, 1 = yes)
+    taken BOOLEAN NOT NULL CHECK (taken IN (0, 1)),
+    -- Time of the record in UTC seconds since the epoch
+    ts INTEGER NOT NULL,
+    -- Offset of the local time of the record from UTC, in minutes
+    tz_offset INTEGER NOT NULL DEFAULT 0,
+    -- Local date and time of the record ('YYYY-MM-DD HH:MM'), computed on read
+    date_time TEXT GENERATED ALWAYS AS (
+        strftime('%Y-%m-%d %H:%M', ts + tz_offset * 60, 'unixepoch')) VIRTUAL,
+    -- Foreign key linking to users table
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+INSERT INTO medications_new (id, user_id, medication_name, dosage, taken, ts, tz_offset)
+    SELECT id, user_id, medication_name, dosage, taken,
+           CAST(strftime('%s', date_time, 'utc') AS INTEGER),
+           (CAST(strftime('%s', date_time) AS INTEGER)
+            - CAST(strftime('%s', date_time, 'utc') AS INTEGER)) / 60
+    FROM medications ORDER BY id;
+
+UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'medications')
+    WHERE name = 'medications_new';
+
+DROP TABLE medications;
+ALTER TABLE medications_new RENAME TO medications;
+
+-- Covering indexes for per-user, time-ordered queries on the integer timestamp
+CREATE INDEX idx_blood_pressure_user_ts
+    ON blood_pressure (user_id, ts, id, tz_offset, systolic, diastolic, pulse);
+CREATE INDEX idx_weight_user_ts
+    ON weight (user_id, ts, id, tz_offset, weight_value);
+CREATE INDEX idx_medications_user_ts
+    ON medications (user_id, ts, id, tz_offset, medication_name, dosage, taken);
+
+-- Blood pressure: fold a new reading into its day and week
+CREATE TRIGGER blood_pressure_rollups_insert AFTER INSERT ON blood_pressure
+BEGIN
+    INSERT INTO blood_pressure_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1,
+                NEW.systolic, NEW.systolic, NEW.systolic,
+                NEW.diastolic, NEW.diastolic, NEW.diastolic,
+                NEW.pulse, NEW.pulse, NEW.pulse),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1,
+                NEW.systolic, NEW.systolic, NEW.systolic,
+                NEW.diastolic, NEW.diastolic, NEW.diastolic,
+                NEW.pulse, NEW.pulse, NEW.pulse)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            samples = samples + 1,
+            systolic_sum = systolic_sum + excluded.systolic_sum,
+            systolic_min = min(systolic_min, excluded.systolic_min),
+            systolic_max = max(systolic_max, excluded.systolic_max),
+            diastolic_sum = diastolic_sum + excluded.diastolic_sum,
+            diastolic_min = min(diastolic_min, excluded.diastolic_min),
+            diastolic_max = max(diastolic_max, excluded.diastolic_max),
+            pulse_sum = pulse_sum + excluded.pulse_sum,
+            pulse_min = min(pulse_min, excluded.pulse_min),
+            pulse_max = max(pulse_max, excluded.pulse_max);
+END;
+
+-- Blood pressure: recompute the buckets a reading left and entered
+CREATE TRIGGER blood_pressure_rollups_update AFTER UPDATE ON blood_pressure
+BEGIN
+    DELETE FROM blood_pressure_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO blood_pressure_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(systolic), MIN(systolic), MAX(systolic),
+               SUM(diastolic), MIN(diastolic), MAX(diastolic),
+               SUM(pulse), MIN(pulse), MAX(pulse)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN blood_pressure
+            ON blood_pressure.user_id = b.user_id
+            AND blood_pressure.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND blood_pressure.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND blood_pressure.date_time >= b.bucket AND blood_pressure.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Blood pressure: recompute the buckets a deleted reading belonged to
+CREATE TRIGGER blood_pressure_rollups_delete AFTER DELETE ON blood_pressure
+BEGIN
+    DELETE FROM blood_pressure_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO blood_pressure_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(systolic), MIN(systolic), MAX(systolic),
+               SUM(diastolic), MIN(diastolic), MAX(diastolic),
+               SUM(pulse), MIN(pulse), MAX(pulse)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN blood_pressure
+            ON blood_pressure.user_id = b.user_id
+            AND blood_pressure.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND blood_pressure.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND blood_pressure.date_time >= b.bucket AND blood_pressure.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Weight: fold a new reading into its day and week
+CREATE TRIGGER weight_rollups_insert AFTER INSERT ON weight
+BEGIN
+    INSERT INTO weight_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1,
+                NEW.weight_value, NEW.weight_value, NEW.weight_value),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1,
+                NEW.weight_value, NEW.weight_value, NEW.weight_value)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            samples = samples + 1,
+            weight_sum = weight_sum + excluded.weight_sum,
+            weight_min = min(weight_min, excluded.weight_min),
+            weight_max = max(weight_max, excluded.weight_max);
+END;
+
+-- Weight: recompute the buckets a reading left and entered
+CREATE TRIGGER weight_rollups_update AFTER UPDATE ON weight
+BEGIN
+    DELETE FROM weight_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO weight_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(weight_value), MIN(weight_value), MAX(weight_value)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN weight
+            ON weight.user_id = b.user_id
+            AND weight.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND weight.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND weight.date_time >= b.bucket AND weight.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Weight: recompute the buckets a deleted reading belonged to
+CREATE TRIGGER weight_rollups_delete AFTER DELETE ON weight
+BEGIN
+    DELETE FROM weight_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO weight_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*),
+               SUM(weight_value), MIN(weight_value), MAX(weight_value)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN weight
+            ON weight.user_id = b.user_id
+            AND weight.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND weight.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND weight.date_time >= b.bucket AND weight.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Medications: fold a new dose into its day and week
+CREATE TRIGGER medications_rollups_insert AFTER INSERT ON medications
+BEGIN
+    INSERT INTO medications_rollups
+        VALUES (NEW.user_id, 'day', date(NEW.date_time), 1, NEW.taken),
+               (NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'), 1, NEW.taken)
+        ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+            doses = doses + 1,
+            taken = taken + excluded.taken;
+END;
+
+-- Medications: recompute the buckets a dose left and entered
+CREATE TRIGGER medications_rollups_update AFTER UPDATE ON medications
+BEGIN
+    DELETE FROM medications_rollups
+        WHERE (user_id = OLD.user_id AND period = 'day' AND bucket = date(OLD.date_time))
+           OR (user_id = OLD.user_id AND period = 'week'
+               AND bucket = date(OLD.date_time, '-6 days', 'weekday 1'))
+           OR (user_id = NEW.user_id AND period = 'day' AND bucket = date(NEW.date_time))
+           OR (user_id = NEW.user_id AND period = 'week'
+               AND bucket = date(NEW.date_time, '-6 days', 'weekday 1'));
+    INSERT OR REPLACE INTO medications_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*), SUM(taken)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')
+              UNION SELECT NEW.user_id, 'day', date(NEW.date_time), date(NEW.date_time, '+1 day')
+              UNION SELECT NEW.user_id, 'week', date(NEW.date_time, '-6 days', 'weekday 1'),
+                     date(NEW.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN medications
+            ON medications.user_id = b.user_id
+            AND medications.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND medications.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND medications.date_time >= b.bucket AND medications.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
+
+-- Medications: recompute the buckets a deleted dose belonged to
+CREATE TRIGGER medications_rollups_delete AFTER DELETE ON medications
+BEGIN
+    DELETE FROM medications_rollups
+        WHERE user_id = OLD.user_id
+          AND ((period = 'day' AND bucket = date(OLD.date_time))
+               OR (period = 'week' AND bucket = date(OLD.date_time, '-6 days', 'weekday 1')));
+    INSERT OR REPLACE INTO medications_rollups
+        SELECT b.user_id, b.period, b.bucket, COUNT(*), SUM(taken)
+        FROM (SELECT OLD.user_id AS user_id, 'day' AS period, date(OLD.date_time) AS bucket,
+                     date(OLD.date_time, '+1 day') AS bucket_end
+              UNION SELECT OLD.user_id, 'week', date(OLD.date_time, '-6 days', 'weekday 1'),
+                     date(OLD.date_time, '-6 days', 'weekday 1', '+7 days')) AS b
+        JOIN medications
+            ON medications.user_id = b.user_id
+            AND medications.ts >= CAST(strftime('%s', b.bucket) AS INTEGER) - 50400
+            AND medications.ts < CAST(strftime('%s', b.bucket_end) AS INTEGER) + 50400
+            AND medications.date_time >= b.bucket AND medications.date_time < b.bucket_end
+        GROUP BY b.user_id, b.period, b.bucket;
+END;
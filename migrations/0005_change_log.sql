@@ -0,0 +1,86 @@
+-- Change log for incremental chart sync.
+--
+-- Every insert, update and delete of a metric record is logged with a
+-- monotonically increasing sequence number, so a client holding a cursor
+-- (the highest sequence number it has seen) can fetch only the records that
+-- changed since. Each record keeps only its latest entry: a change replaces
+-- the previous one, so the log holds at most one row per record ever
+-- written, and deleted records stay as tombstones. Records that have not
+-- changed since this migration have no entry; clients get them with their
+-- first full sync.
+
+CREATE TABLE change_log (
+    -- Sequence number of the change; AUTOINCREMENT never reuses a number
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- ID of the user who owns the record
+    user_id INTEGER NOT NULL,
+    -- Table of the record: 'blood_pressure', 'weight' or 'medications'
+    metric TEXT NOT NULL,
+    -- ID of the record in its table
+    record_id INTEGER NOT NULL,
+    -- 1 if the record was deleted
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+
+-- Serves the delta query of a user's metric after a cursor
+CREATE INDEX idx_change_log_user_seq ON change_log (user_id, metric, seq);
+
+-- Finds the previous entry of a record when it changes again
+CREATE UNIQUE INDEX idx_change_log_record ON change_log (metric, record_id);
+
+-- Blood pressure: log inserts, updates and deletes
+CREATE TRIGGER blood_pressure_change_log_insert AFTER INSERT ON blood_pressure
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'blood_pressure', NEW.id, 0);
+END;
+
+CREATE TRIGGER blood_pressure_change_log_update AFTER UPDATE ON blood_pressure
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'blood_pressure', NEW.id, 0);
+END;
+
+CREATE TRIGGER blood_pressure_change_log_delete AFTER DELETE ON blood_pressure
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (OLD.user_id, 'blood_pressure', OLD.id, 1);
+END;
+
+-- Weight: log inserts, updates and deletes
+CREATE TRIGGER weight_change_log_insert AFTER INSERT ON weight
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'weight', NEW.id, 0);
+END;
+
+CREATE TRIGGER weight_change_log_update AFTER UPDATE ON weight
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'weight', NEW.id, 0);
+END;
+
+CREATE TRIGGER weight_change_log_delete AFTER DELETE ON weight
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (OLD.user_id, 'weight', OLD.id, 1);
+END;
+
+-- Medications: log inserts, updates and deletes
+CREATE TRIGGER medications_change_log_insert AFTER INSERT ON medications
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'medications', NEW.id, 0);
+END;
+
+CREATE TRIGGER medications_change_log_update AFTER UPDATE ON medications
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'medications', NEW.id, 0);
+END;
+
+CREATE TRIGGER medications_change_log_delete AFTER DELETE ON medications
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (OLD.user_id, 'medications', OLD.id, 1);
+END;
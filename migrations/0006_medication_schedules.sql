@@ -0,0 +1,90 @@
+-- Recurring medication schedules.
+--
+-- A schedule stores a medication, its local dose times and a recurrence rule
+-- (days of the week, every N days from a first day, until an optional last
+-- day). Its doses are generated on demand for the requested range instead of
+-- being stored as one `medications` row each; only the doses the user marked
+-- differently from the schedule's default status are stored, as overrides.
+
+CREATE TABLE medication_schedules (
+    -- Unique schedule ID
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- ID of the user who owns this schedule
+    user_id INTEGER NOT NULL,
+    -- Name of the medication
+    medication_name TEXT NOT NULL,
+    -- Dosage information (optional)
+    dosage TEXT,
+    -- Local times of the doses as minutes after midnight, separated by commas (e.g. '480,1200')
+    times TEXT NOT NULL,
+    -- Days of the week with doses: bit 0 is Monday, bit 6 is Sunday
+    weekdays INTEGER NOT NULL DEFAULT 127 CHECK (weekdays BETWEEN 1 AND 127),
+    -- Doses are due every this many days, counted from start_date
+    every_days INTEGER NOT NULL DEFAULT 1 CHECK (every_days >= 1),
+    -- First local day of the schedule as 'YYYY-MM-DD'
+    start_date TEXT NOT NULL,
+    -- Last local day of the schedule, or NULL if it has no end
+    end_date TEXT,
+    -- Minutes the local clock of the dose times is ahead of UTC
+    tz_offset INTEGER NOT NULL DEFAULT 0,
+    -- Status of a due dose without an override (0 = missed, 1 = taken)
+    default_taken INTEGER NOT NULL DEFAULT 0 CHECK (default_taken IN (0, 1)),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE INDEX idx_medication_schedules_user ON medication_schedules (user_id, start_date);
+
+CREATE TABLE medication_schedule_overrides (
+    -- ID of the schedule of the dose
+    schedule_id INTEGER NOT NULL REFERENCES medication_schedules(id) ON DELETE CASCADE,
+    -- Time of the dose, UTC seconds since the epoch
+    ts INTEGER NOT NULL,
+    -- Whether the dose was taken (0 = no, 1 = yes)
+    taken INTEGER NOT NULL CHECK (taken IN (0, 1)),
+    PRIMARY KEY (schedule_id, ts)
+) WITHOUT ROWID;
+
+-- Schedules and their overrides are logged to change_log under the schedule's ID,
+-- so the version of a user's schedules changes with any of them
+CREATE TRIGGER medication_schedules_change_log_insert AFTER INSERT ON medication_schedules
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'medication_schedules', NEW.id, 0);
+END;
+
+CREATE TRIGGER medication_schedules_change_log_update AFTER UPDATE ON medication_schedules
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (NEW.user_id, 'medication_schedules', NEW.id, 0);
+END;
+
+CREATE TRIGGER medication_schedules_change_log_delete AFTER DELETE ON medication_schedules
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        VALUES (OLD.user_id, 'medication_schedules', OLD.id, 1);
+END;
+
+CREATE TRIGGER medication_schedule_overrides_change_log_insert
+AFTER INSERT ON medication_schedule_overrides
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        SELECT user_id, 'medication_schedules', id, 0
+        FROM medication_schedules WHERE id = NEW.schedule_id;
+END;
+
+CREATE TRIGGER medication_schedule_overrides_change_log_update
+AFTER UPDATE ON medication_schedule_overrides
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        SELECT user_id, 'medication_schedules', id, 0
+        FROM medication_schedules WHERE id = NEW.schedule_id;
+END;
+
+-- Deleting a schedule removes its overrides, whose schedule is then already gone
+CREATE TRIGGER medication_schedule_overrides_change_log_delete
+AFTER DELETE ON medication_schedule_overrides
+BEGIN
+    INSERT OR REPLACE INTO change_log (user_id, metric, record_id, deleted)
+        SELECT user_id, 'medication_schedules', id, 0
+        FROM medication_schedules WHERE id = OLD.schedule_id;
+END;
@@ -5,8 +5,9 @@ This module handles user authentication, including login, registration, and logo
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from helpers.db_helpers import query_db, execute_db
+from helpers.db_helpers import directory_db, query_db, execute_db, execute_returning
+from helpers.password_helpers import HashingBusyError, get_password_hasher
+from helpers.user_helpers import get_user_cache
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -24,10 +25,21 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        user = query_db('SELECT * FROM users WHERE username = ?', (username,), one=True)
-
-        if user and check_password_hash(user['password_hash'], password):
+        with directory_db():
+            user = query_db('SELECT * FROM users WHERE username = ?', (username,), one=True)
+        hasher = get_password_hasher()
+
+        try:
+            valid = user is not None and hasher.check(user['password_hash'], password)
+        except HashingBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('auth/login.html'), 503
+
+        if valid:
+            if hasher.needs_rehash(user['password_hash']):
+                rehash_password(hasher, user['id'], password)
             session['user_id'] = user['id']
+            session['username'] = user['username']  # Saves a users lookup on every render
             flash('Login successful!', 'success')
             return redirect(url_for('main.index'))
         else:
@@ -35,6 +47,27 @@ def login():
 
     return render_template('auth/login.html')
 
+def rehash_password(hasher, user_id, password):
+    """
+    Replace a user's password hash with one made with the configured method and cost.
+
+    Skipped without an error when the hashing pool is busy; the hash is then
+    upgraded on a later login.
+
+    Args:
+        hasher (PasswordHasher): The password hashing pool.
+        user_id (int): ID of the user.
+        password (str): The verified plain-text password.
+    """
+    try:
+        password_hash = hasher.hash(password)
+        with directory_db():
+            execute_db('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
+        get_user_cache().invalidate(user_id)
+        hasher.count_rehash()
+    except HashingBusyError:
+        pass
+
 @bp.route('/register', methods=['GET', 'POST'])
 def register():
     """
@@ -55,14 +88,22 @@ def register():
             flash('Passwords do not match.', 'error')
             return render_template('auth/register.html')
 
-        existing_user = query_db('SELECT * FROM users WHERE username = ?', (username,), one=True)
+        with directory_db():
+            existing_user = query_db('SELECT * FROM users WHERE username = ?', (username,), one=True)
         if existing_user:
             flash('Username already taken.', 'error')
             return render_template('auth/register.html')
 
-        hashed_password = generate_password_hash(password)
-        execute_db('INSERT INTO users (username, password_hash) VALUES (?, ?)',
-                   (username, hashed_password))
+        try:
+            hashed_password = get_password_hasher().hash(password)
+        except HashingBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('auth/register.html'), 503
+        with directory_db():
+            rows = execute_returning('INSERT INTO users (username, password_hash) VALUES (?, ?) RETURNING id',
+                                     (username, hashed_password))
+        # A reused ID must not show the username cached for its previous owner
+        get_user_cache().invalidate(rows[0]['id'])
         flash('Registration successful! You can now log in.', 'success')
         return redirect(url_for('auth.login'))
 
@@ -73,11 +114,16 @@ def logout():
     """
     Handle user logout.
 
-    Clears the session and redirects to the login page.
+    Clears the session and redirects to the login page. The series the charts
+    keep in the browser are cleared too, so the next user of a shared browser
+    cannot read them: by the Clear-Site-Data header where the browser supports
+    it, and by the login page's script otherwise.
 
     Returns:
         str: Redirect to the login page.
     """
     session.clear()
     flash('You have been logged out.', 'success')
-    return redirect(url_for('auth.login'))
+    response = redirect(url_for('auth.login'))
+    response.headers['Clear-Site-Data'] = '"storage"'
+    return response
@@ -1,10 +1,20 @@
 """
 Main Blueprint for the Healthsome application.
 
-This module defines the main routes for the application, handling requests to the home page and the About page.
+This module defines the main routes for the application, handling requests to the home page and its dashboard,
+the About page, the all-metrics export archive, and the Prometheus metrics of request and SQL timings.
 """
 
-from flask import Blueprint, render_template, session
+from datetime import date
+
+import msgspec
+from flask import (Blueprint, render_template, request, redirect, url_for, session, flash, jsonify,
+                   current_app, abort, Response)
+from helpers.cache_helpers import DASHBOARD, cached_body, cached_json
+from helpers.dashboard_helpers import build_dashboard
+from helpers.schedule_helpers import due_until
+from helpers.export_helpers import EXPORT_FORMATS, MIMETYPES, export_response, iter_archive
+from helpers.metrics_helpers import get_registry
 
 bp = Blueprint('main', __name__)
 
@@ -13,13 +23,61 @@ def index():
     """
     Handle requests to the home page.
 
+    The overview of every metric is rendered into the page from the cached
+    dashboard, so loading the home page costs a single request.
+
     Returns:
         str: Rendered HTML template for the home page if user is logged in,
         otherwise redirects to the login page.
     """
-    if 'user_id' in session:
-        return render_template('index.html')
-    return render_template('auth/login.html')
+    user_id = session.get('user_id')
+    if not user_id:
+        return render_template('auth/login.html')
+
+    params, build = dashboard_args(user_id)
+    if current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        body, _ = cached_body(user_id, DASHBOARD, params, build)
+        dashboard_data = msgspec.json.decode(body)
+    else:
+        dashboard_data = build()
+    return render_template('index.html', dashboard=dashboard_data)
+
+@bp.route('/dashboard')
+def dashboard():
+    """
+    Return the overview of every metric of the logged-in user as JSON.
+
+    The latest readings, trends and adherence are read in one transaction from
+    one snapshot and cached per user until any of the user's records change in
+    any worker process, and sent with a strong ETag so unchanged data is
+    answered with 304.
+
+    Returns:
+        Response: The dashboard JSON, or 401 if not logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+    params, build = dashboard_args(user_id)
+    return cached_json(user_id, DASHBOARD, params, build)
+
+def dashboard_args(user_id):
+    """
+    Get the cache parameters and the builder of a user's dashboard.
+
+    Args:
+        user_id (int): ID of the user.
+
+    Returns:
+        tuple: (cache key parameters, callable building the dashboard data).
+    """
+    days = current_app.config['DASHBOARD_TREND_DAYS']
+    until = due_until()
+    # Writes of every metric, in any worker process, replace the user's dashboard
+    # token the cache key includes; the day is part of the key so the trends roll
+    # over at midnight, and the due time so that scheduled doses count once they are due
+    return ((date.today().isoformat(), days, until),
+            lambda: build_dashboard(user_id, days, until=until))
 
 @bp.route('/about')
 def about():
@@ -30,3 +88,38 @@ def about():
         str: Rendered HTML template for the About page.
     """
     return render_template('about.html')
+
+@bp.route('/export')
+def export_archive():
+    """
+    Download every metric of the logged-in user as a ZIP archive of CSV or NDJSON files.
+
+    The archive is written and streamed in chunks, so memory use does not grow
+    with the number of records.
+
+    Returns:
+        Response: A streaming ZIP download, or redirect to login page if not logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to export your records.", "error")
+        return redirect(url_for('auth.login'))
+
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        file_format = 'csv'
+
+    chunks = iter_archive(user_id, file_format, current_app.config['EXPORT_CHUNK_SIZE'])
+    return export_response(chunks, "healthsome-export.zip", MIMETYPES['zip'])
+
+@bp.route('/metrics')
+def metrics():
+    """
+    Expose request and SQL metrics of the current worker process to Prometheus.
+
+    Returns:
+        Response: The metrics in the Prometheus text format, or 404 if metrics are disabled.
+    """
+    if not current_app.config.get('METRICS_ENABLED'):
+        abort(404)
+    return Response(get_registry().expose(), mimetype='text/plain; version=0.0.4')
@@ -6,16 +6,29 @@ including listing, creating, editing, deleting, and filtering records by date ra
 """
 
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import (Blueprint, render_template, request, redirect, url_for, session, flash, jsonify,
+                   current_app)
 from helpers.db_helpers import query_db, execute_db
-from helpers.datetime_helpers import calculate_date_range
+from helpers.bulk_helpers import SELECTED_IDS_SQL, parse_ids
+from helpers.datetime_helpers import (LOCAL_MINUTES_SQL, LOCAL_TIME_SQL, calculate_date_range,
+                                      format_timestamp, parse_tz_offset, to_timestamp)
+from helpers.pagination_helpers import paginate_records, get_page_size
+from helpers.rollup_helpers import PERIODS, query_rollups
+from helpers.cache_helpers import cached_json, invalidate_cache
+from helpers.import_helpers import IMPORT_COLUMNS, ImportFormatError, import_upload
+from helpers.export_helpers import EXPORT_FORMATS, ENCODERS, MIMETYPES, export_response, wants_gzip
+from helpers.json_helpers import stream_json_array, BloodPressurePoint, BloodPressureRecord
+from helpers.series_store_helpers import read_series
+from helpers.sync_helpers import sync_response
+from helpers.analytics_helpers import compute_stats
+from helpers.downsample_helpers import fetch_columns, minmax_indices, get_max_points
 
 bp = Blueprint('blood_pressure', __name__, url_prefix='/blood_pressure')
 
 @bp.route('/')
 def list_records():
     """
-    Display a list of blood pressure records for the logged-in user based on selected date range.
+    Display one page of blood pressure records for the logged-in user based on selected date range.
 
     Returns:
         str: Rendered template with records or redirect to login page if not logged in.
@@ -28,17 +41,14 @@ def list_records():
     range_option = request.args.get('range', 'last_week')  # Default to 'last_week'
     start_date, end_date = calculate_date_range(range_option)
 
-    query = "SELECT * FROM blood_pressure WHERE user_id = ?"
-    params = [user_id]
-
-    if start_date:
-        query += " AND date_time BETWEEN ? AND ? ORDER BY date_time DESC"
-        params.extend([start_date, end_date])
-    else:
-        query += " ORDER BY date_time DESC"
+    page_size = get_page_size(request.args.get('limit'), current_app.config['LIST_PAGE_SIZE'],
+                              current_app.config['LIST_PAGE_SIZE_MAX'])
 
-    records = query_db(query, params)
-    return render_template('metrics/blood_pressure/list.html', records=records, range_option=range_option)
+    records, next_cursor, prev_cursor = paginate_records(
+        'blood_pressure', user_id, start_date, end_date, request.args.get('cursor'), page_size)
+    return render_template('metrics/blood_pressure/list.html', records=records, range_option=range_option,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor,
+                           start_date=start_date, end_date=end_date)
 
 @bp.route('/create', methods=['GET', 'POST'])
 def create_record():
@@ -54,17 +64,19 @@ def create_record():
         return redirect(url_for('auth.login'))
 
     if request.method == 'POST':
-        date_time = request.form['date_time'].replace('T', ' ')
         systolic = request.form['systolic']
         diastolic = request.form['diastolic']
         pulse = request.form.get('pulse')
 
         try:
+            ts, tz_offset = to_timestamp(request.form['date_time'],
+                                         parse_tz_offset(request.form.get('tz_offset')))
             execute_db(
-                "INSERT INTO blood_pressure (date_time, systolic, diastolic, pulse, user_id) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (date_time, systolic, diastolic, pulse, user_id)
+                "INSERT INTO blood_pressure (ts, tz_offset, systolic, diastolic, pulse, user_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ts, tz_offset, systolic, diastolic, pulse, user_id)
             )
+            invalidate_cache(user_id, 'blood_pressure')
             flash("Record added successfully.", "success")
             return redirect(url_for('blood_pressure.list_records'))
         except Exception as e:
@@ -90,17 +102,19 @@ def edit_record(record_id):
         return redirect(url_for('auth.login'))
 
     if request.method == 'POST':
-        date_time = request.form['date_time'].replace('T', ' ')
         systolic = request.form['systolic']
         diastolic = request.form['diastolic']
         pulse = request.form.get('pulse')
 
         try:
+            ts, tz_offset = to_timestamp(request.form['date_time'],
+                                         parse_tz_offset(request.form.get('tz_offset')))
             execute_db(
-                "UPDATE blood_pressure SET date_time = ?, systolic = ?, diastolic = ?, pulse = ? "
-                "WHERE id = ? AND user_id = ?",
-                (date_time, systolic, diastolic, pulse, record_id, user_id)
+                "UPDATE blood_pressure SET ts = ?, tz_offset = ?, systolic = ?, diastolic = ?, "
+                "pulse = ? WHERE id = ? AND user_id = ?",
+                (ts, tz_offset, systolic, diastolic, pulse, record_id, user_id)
             )
+            invalidate_cache(user_id, 'blood_pressure')
             flash("Record updated successfully.", "success")
             return redirect(url_for('blood_pressure.list_records'))
         except Exception as e:
@@ -132,40 +146,238 @@ def delete_record(record_id):
 
     try:
         execute_db("DELETE FROM blood_pressure WHERE id = ? AND user_id = ?", (record_id, user_id))
+        invalidate_cache(user_id, 'blood_pressure')
         flash("Record deleted successfully.", "success")
     except Exception as e:
         flash(f"An error occurred: {e}", "error")
 
     return redirect(url_for('blood_pressure.list_records'))
 
+@bp.route('/delete_selected', methods=['POST'])
+def delete_selected():
+    """
+    Delete the blood pressure records selected on the list page with one statement.
+
+    Returns:
+        str: Redirect to record list.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to delete records.", "error")
+        return redirect(url_for('auth.login'))
+
+    try:
+        deleted = execute_db(f"DELETE FROM blood_pressure WHERE {SELECTED_IDS_SQL}",
+                             (parse_ids(request.form.getlist('ids')), user_id))
+        invalidate_cache(user_id, 'blood_pressure')
+        flash(f"Deleted {deleted} records.", "success")
+    except Exception as e:
+        flash(f"An error occurred: {e}", "error")
+
+    return redirect(url_for('blood_pressure.list_records', range=request.form.get('range')))
+
+@bp.route('/import', methods=['GET', 'POST'])
+def import_data():
+    """
+    Bulk-import blood pressure records for the logged-in user from a CSV or NDJSON file.
+
+    Valid rows are inserted in a single transaction; invalid rows are skipped and
+    reported with their line numbers. Clients that accept JSON get the result as JSON.
+
+    Returns:
+        str: Rendered template with the import result, or a JSON result.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to import records.", "error")
+        return redirect(url_for('auth.login'))
+
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Please choose a file to import.", "error")
+        else:
+            try:
+                result = import_upload('blood_pressure', user_id, upload, request.form.get('format'),
+                                       current_app.config['IMPORT_BATCH_SIZE'],
+                                       current_app.config['IMPORT_MAX_ERRORS'])
+                invalidate_cache(user_id, 'blood_pressure')
+                flash(f"Imported {result['imported']} records.", "success")
+            except ImportFormatError as e:
+                flash(str(e), "error")
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({"error": str(e)}), 400
+
+        if result and request.accept_mimetypes.best == 'application/json':
+            return jsonify(result)
+
+    return render_template('metrics/import.html', title='Blood Pressure', result=result,
+                           columns=IMPORT_COLUMNS['blood_pressure'], endpoint='blood_pressure.import_data',
+                           list_endpoint='blood_pressure.list_records')
+
+@bp.route('/export')
+def export_data():
+    """
+    Download the full blood pressure history of the logged-in user as CSV or NDJSON.
+
+    The file is streamed in chunks straight from the database cursor, and is
+    gzip-encoded on the fly with `gzip=1`.
+
+    Returns:
+        Response: A streaming file download, or redirect to login page if not logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to export your records.", "error")
+        return redirect(url_for('auth.login'))
+
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        file_format = 'csv'
+
+    chunks = ENCODERS[file_format]('blood_pressure', user_id, current_app.config['EXPORT_CHUNK_SIZE'])
+    return export_response(chunks, f"blood_pressure.{file_format}", MIMETYPES[file_format],
+                           wants_gzip(), current_app.config['EXPORT_GZIP_LEVEL'])
+
+@bp.route('/stats')
+def blood_pressure_stats():
+    """
+    Return blood pressure statistics as JSON for the selected date range.
+
+    The statistics are the rolling means, linear trend and variability of each
+    measurement, morning and evening means, and counts of the AHA categories.
+
+    Results are cached per user, range and data version, so they are only
+    recomputed after the user's blood pressure records change.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    range_option = request.args.get('range', 'last_month')  # Default to 'last_month'
+    start_date, end_date = calculate_date_range(range_option)
+    return cached_json(
+        user_id, 'blood_pressure', ('stats', start_date, end_date),
+        lambda: compute_stats('blood_pressure', user_id, start_date, end_date))
+
 @bp.route('/data')
 def blood_pressure_data():
     """
     Return blood pressure data as JSON for the chart, filtered by the selected date range.
+
+    With `max_points`, the series is reduced to the minimum and maximum readings
+    of evenly sized buckets so the payload stays bounded for long ranges.
+
+    With `granularity=day|week`, daily or weekly means, minimums and maximums are
+    served from the rollup tables instead of the raw readings.
+
+    With `since=<cursor>`, only the records changed after the cursor of the previous
+    call are returned (all of them for `since=0`), for the series kept by the chart script.
+
+    Without any of these options, the raw blood pressure readings are encoded with msgspec and streamed
+    in chunks. Bounded responses are cached per user, parameters and data version, so a
+    write handled by any worker process is seen, and carry a strong ETag so unchanged data
+    is answered with 304.
     """
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
+    if 'since' in request.args:
+        # Incremental sync of the full series cached by the chart script
+        return sync_response('blood_pressure', user_id, request.args['since'], BloodPressureRecord)
+
     range_option = request.args.get('range', 'last_week')  # Default to 'last_week'
     start_date, end_date = calculate_date_range(range_option)
 
-    query = "SELECT date_time, systolic, diastolic, pulse FROM blood_pressure WHERE user_id = ?"
+    granularity = request.args.get('granularity')
+    if granularity not in PERIODS:
+        granularity = None
+    max_points = get_max_points(request.args.get('max_points'),
+                                current_app.config['CHART_MAX_POINTS_LIMIT'])
+
+    if not granularity and not max_points:
+        # The raw series can be arbitrarily long, so stream it instead of caching it
+        query, params = series_query(user_id, start_date, end_date)
+        return stream_json_array(query, params, BloodPressurePoint)
+
+    return cached_json(
+        user_id, 'blood_pressure', (start_date, end_date, granularity, max_points),
+        lambda: build_chart_data(user_id, start_date, end_date, granularity, max_points))
+
+def build_chart_data(user_id, start_date, end_date, granularity=None, max_points=None):
+    """
+    Build the blood pressure chart series for a date range.
+
+    Args:
+        user_id (int): ID of the user who owns the records.
+        start_date (int): Start timestamp of the date range, or None for all time.
+        end_date (int): End timestamp of the date range, or None for all time.
+        granularity (str, optional): 'day' or 'week' to read from the rollups.
+        max_points (int, optional): Point budget for downsampling when not using the rollups.
+
+    Returns:
+        list: Chart points as dictionaries.
+    """
+    if granularity:
+        rollups = query_rollups('blood_pressure', user_id, granularity, start_date, end_date)
+        return [
+            {
+                "date": row["bucket"],
+                "samples": row["samples"],
+                "systolic": round(row["systolic_sum"] / row["samples"], 1),
+                "systolic_min": row["systolic_min"],
+                "systolic_max": row["systolic_max"],
+                "diastolic": round(row["diastolic_sum"] / row["samples"], 1),
+                "diastolic_min": row["diastolic_min"],
+                "diastolic_max": row["diastolic_max"],
+                "pulse": round(row["pulse_sum"] / row["samples"], 1),
+                "pulse_min": row["pulse_min"],
+                "pulse_max": row["pulse_max"]
+            }
+            for row in rollups
+        ]
+
+    series = read_series('blood_pressure', user_id, start_date, end_date)
+    if series is not None:
+        minutes, systolic, diastolic, pulse = (
+            series['minutes'], series['systolic'], series['diastolic'], series['pulse'])
+    else:
+        query, params = series_query(user_id, start_date, end_date, LOCAL_MINUTES_SQL)
+        minutes, systolic, diastolic, pulse = fetch_columns(query, params, ['i8', 'i8', 'i8', 'i8'])
+
+    # Keep each bucket's extremes so spikes survive downsampling; buckets are runs of rows in UTC
+    # order, so local minutes going back at an offset change do not matter
+    keep = minmax_indices([systolic, diastolic, pulse], max(1, max_points // 6))
+    return [
+        {"date": format_timestamp(minute * 60), "systolic": sys_value, "diastolic": dia_value,
+         "pulse": pulse_value}
+        for minute, sys_value, dia_value, pulse_value in zip(
+            minutes[keep].tolist(), systolic[keep].tolist(),
+            diastolic[keep].tolist(), pulse[keep].tolist())
+    ]
+
+def series_query(user_id, start_date, end_date, time_sql=LOCAL_TIME_SQL):
+    """
+    Build the query for a user's raw chart series, oldest first.
+
+    Args:
+        user_id (int): ID of the user who owns the records.
+        start_date (int): Start timestamp of the date range, or None for all time.
+        end_date (int): End timestamp of the date range, or None for all time.
+        time_sql (str): SQL expression selected as the first column; the local
+            date and time string by default.
+
+    Returns:
+        tuple: The SQL query and its parameters.
+    """
+    query = f"SELECT {time_sql}, systolic, diastolic, pulse FROM blood_pressure WHERE user_id = ?"
     params = [user_id]
 
     if start_date:
-        query += " AND date_time BETWEEN ? AND ?"
+        query += " AND ts BETWEEN ? AND ?"
         params.extend([start_date, end_date])
 
-    query += " ORDER BY date_time ASC"
-
-    records = query_db(query, params)
-    return jsonify([
-        {
-            "date": record["date_time"],
-            "systolic": record["systolic"],
-            "diastolic": record["diastolic"],
-            "pulse": record["pulse"]
-        }
-        for record in records
-    ])
+    query += " ORDER BY ts ASC"
+    return query, params
@@ -3,20 +3,38 @@ Medications Metrics Blueprint for the Healthsome application.
 
 This module provides functionality for managing medication records,
 including listing, creating, editing, deleting, toggling medication statuses,
-and filtering records by date range.
+and filtering records by date range, as well as recurring medication schedules
+whose doses are generated for the displayed range.
 """
 
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from helpers.db_helpers import query_db, execute_db
-from helpers.datetime_helpers import calculate_date_range
+from flask import (Blueprint, render_template, request, redirect, url_for, session, flash, jsonify,
+                   current_app)
+from helpers.db_helpers import query_db, execute_db, execute_returning, transaction
+from helpers.bulk_helpers import LOCAL_DAYS_SQL, SELECTED_IDS_SQL, local_days_params, parse_ids
+from helpers.datetime_helpers import (LOCAL_MINUTES_SQL, LOCAL_TIME_SQL, calculate_date_range,
+                                      parse_tz_offset, to_timestamp)
+from helpers.pagination_helpers import paginate_records, get_page_size
+from helpers.rollup_helpers import PERIODS, query_rollups
+from helpers.cache_helpers import cached_json, invalidate_cache
+from helpers.import_helpers import IMPORT_COLUMNS, ImportFormatError, import_upload
+from helpers.export_helpers import EXPORT_FORMATS, ENCODERS, MIMETYPES, export_response, wants_gzip
+from helpers.json_helpers import stream_json_array, MedicationPoint, MedicationRecord
+from helpers.series_store_helpers import read_series
+from helpers.sync_helpers import sync_response
+from helpers.analytics_helpers import compute_stats, merge_doses
+from helpers.schedule_helpers import (DUE_STEP, WEEKDAY_NAMES, count_doses, dose_list,
+                                      due_dose_columns, due_until, format_times, format_weekdays,
+                                      mark_scheduled_doses_taken, parse_times, parse_weekdays,
+                                      set_dose_status)
+from helpers.downsample_helpers import fetch_columns, count_buckets, get_max_points
 
 bp = Blueprint('medications', __name__, url_prefix='/medications')
 
 @bp.route('/')
 def list_records():
     """
-    Display a list of medication records for the logged-in user based on selected date range.
+    Display one page of medication records for the logged-in user based on selected date range.
 
     Returns:
         str: Rendered template with records or redirect to login page if not logged in.
@@ -29,17 +47,17 @@ def list_records():
     range_option = request.args.get('range', 'last_week')  # Default to 'last_week'
     start_date, end_date = calculate_date_range(range_option)
 
-    query = "SELECT * FROM medications WHERE user_id = ?"
-    params = [user_id]
-
-    if start_date:
-        query += " AND date_time BETWEEN ? AND ? ORDER BY date_time DESC"
-        params.extend([start_date, end_date])
-    else:
-        query += " ORDER BY date_time DESC"
+    page_size = get_page_size(request.args.get('limit'), current_app.config['LIST_PAGE_SIZE'],
+                              current_app.config['LIST_PAGE_SIZE_MAX'])
 
-    records = query_db(query, params)
-    return render_template('metrics/medications/list.html', records=records, range_option=range_option)
+    records, next_cursor, prev_cursor = paginate_records(
+        'medications', user_id, start_date, end_date, request.args.get('cursor'), page_size)
+    # The latest scheduled doses of the range, including today's upcoming ones
+    doses = dose_list(user_id, start_date, end_date or due_until() + DUE_STEP, page_size)
+    return render_template('metrics/medications/list.html', records=records, range_option=range_option,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor,
+                           start_date=start_date, end_date=end_date, doses=doses,
+                           today=datetime.now().strftime("%Y-%m-%d"))
 
 @bp.route('/create', methods=['GET', 'POST'])
 def create_record():
@@ -55,17 +73,19 @@ def create_record():
         return redirect(url_for('auth.login'))
 
     if request.method == 'POST':
-        date_time = request.form['date_time'].replace('T', ' ')
         medication_name = request.form['medication_name']
         dosage = request.form['dosage']
         taken = request.form.get('taken', '0')
 
         try:
+            ts, tz_offset = to_timestamp(request.form['date_time'],
+                                         parse_tz_offset(request.form.get('tz_offset')))
             execute_db(
-                "INSERT INTO medications (date_time, medication_name, dosage, taken, user_id) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (date_time, medication_name, dosage, int(taken), user_id)
+                "INSERT INTO medications (ts, tz_offset, medication_name, dosage, taken, user_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ts, tz_offset, medication_name, dosage, int(taken), user_id)
             )
+            invalidate_cache(user_id, 'medications')
             flash("Record added successfully.", "success")
             return redirect(url_for('medications.list_records'))
         except Exception as e:
@@ -91,17 +111,19 @@ def edit_record(record_id):
         return redirect(url_for('auth.login'))
 
     if request.method == 'POST':
-        date_time = request.form['date_time'].replace('T', ' ')
         medication_name = request.form['medication_name']
         dosage = request.form['dosage']
         taken = request.form.get('taken', '0')
 
         try:
+            ts, tz_offset = to_timestamp(request.form['date_time'],
+                                         parse_tz_offset(request.form.get('tz_offset')))
             execute_db(
-                "UPDATE medications SET date_time = ?, medication_name = ?, dosage = ?, taken = ? "
-                "WHERE id = ? AND user_id = ?",
-                (date_time, medication_name, dosage, int(taken), record_id, user_id)
+                "UPDATE medications SET ts = ?, tz_offset = ?, medication_name = ?, dosage = ?, "
+                "taken = ? WHERE id = ? AND user_id = ?",
+                (ts, tz_offset, medication_name, dosage, int(taken), record_id, user_id)
             )
+            invalidate_cache(user_id, 'medications')
             flash("Record updated successfully.", "success")
             return redirect(url_for('medications.list_records'))
         except Exception as e:
@@ -133,71 +155,473 @@ def delete_record(record_id):
 
     try:
         execute_db("DELETE FROM medications WHERE id = ? AND user_id = ?", (record_id, user_id))
+        invalidate_cache(user_id, 'medications')
         flash("Record deleted successfully.", "success")
     except Exception as e:
         flash(f"An error occurred: {e}", "error")
 
     return redirect(url_for('medications.list_records'))
 
+@bp.route('/delete_selected', methods=['POST'])
+def delete_selected():
+    """
+    Delete the medication records selected on the list page with one statement.
+
+    Returns:
+        str: Redirect to record list.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to delete records.", "error")
+        return redirect(url_for('auth.login'))
+
+    try:
+        deleted = execute_db(f"DELETE FROM medications WHERE {SELECTED_IDS_SQL}",
+                             (parse_ids(request.form.getlist('ids')), user_id))
+        invalidate_cache(user_id, 'medications')
+        flash(f"Deleted {deleted} records.", "success")
+    except Exception as e:
+        flash(f"An error occurred: {e}", "error")
+
+    return redirect(url_for('medications.list_records', range=request.form.get('range')))
+
+@bp.route('/import', methods=['GET', 'POST'])
+def import_data():
+    """
+    Bulk-import medication records for the logged-in user from a CSV or NDJSON file.
+
+    Valid rows are inserted in a single transaction; invalid rows are skipped and
+    reported with their line numbers. Clients that accept JSON get the result as JSON.
+
+    Returns:
+        str: Rendered template with the import result, or a JSON result.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to import records.", "error")
+        return redirect(url_for('auth.login'))
+
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Please choose a file to import.", "error")
+        else:
+            try:
+                result = import_upload('medications', user_id, upload, request.form.get('format'),
+                                       current_app.config['IMPORT_BATCH_SIZE'],
+                                       current_app.config['IMPORT_MAX_ERRORS'])
+                invalidate_cache(user_id, 'medications')
+                flash(f"Imported {result['imported']} records.", "success")
+            except ImportFormatError as e:
+                flash(str(e), "error")
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({"error": str(e)}), 400
+
+        if result and request.accept_mimetypes.best == 'application/json':
+            return jsonify(result)
+
+    return render_template('metrics/import.html', title='Medications', result=result,
+                           columns=IMPORT_COLUMNS['medications'], endpoint='medications.import_data',
+                           list_endpoint='medications.list_records')
+
 @bp.route('/toggle/<int:record_id>', methods=['POST'])
 def toggle_taken(record_id):
     """
     Toggle the "taken" status of a medication record.
 
+    The status is flipped and read back by one UPDATE ... RETURNING statement, so
+    concurrent toggles (e.g. a double click) each flip it exactly once. Clients
+    that accept JSON get the new status as JSON.
+
     Args:
         record_id (int): ID of the record to toggle.
 
     Returns:
-        str: Redirect to record list.
+        str: Redirect to record list, or the new status as JSON.
     """
     user_id = session.get('user_id')
     if not user_id:
         flash("Please log in to change medication status.", "error")
         return redirect(url_for('auth.login'))
 
-    record = query_db("SELECT taken FROM medications WHERE id = ? AND user_id = ?",
-                      (record_id, user_id), one=True)
-    if not record:
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    try:
+        rows = execute_returning(
+            "UPDATE medications SET taken = 1 - taken WHERE id = ? AND user_id = ? RETURNING taken",
+            (record_id, user_id)
+        )
+    except Exception as e:
+        if wants_json:
+            return jsonify({"error": str(e)}), 500
+        flash(f"An error occurred: {e}", "error")
+        return redirect(url_for('medications.list_records'))
+
+    if not rows:
+        if wants_json:
+            return jsonify({"error": "Record not found"}), 404
         flash("Record not found.", "error")
         return redirect(url_for('medications.list_records'))
 
-    new_status = 0 if record['taken'] else 1
+    invalidate_cache(user_id, 'medications')
+    if wants_json:
+        return jsonify({"id": record_id, "taken": bool(rows[0]['taken'])})
+    flash("Medication status updated successfully.", "success")
+    return redirect(url_for('medications.list_records'))
+
+@bp.route('/mark_taken', methods=['POST'])
+def mark_taken():
+    """
+    Mark every dose of a range of local days as taken: the records and the scheduled doses.
+
+    The records are updated with one set-based statement over the indexed time
+    range, and the scheduled doses with one statement per kind of schedule, all
+    in a single transaction.
+
+    Returns:
+        str: Redirect to record list.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to change medication status.", "error")
+        return redirect(url_for('auth.login'))
+
     try:
-        execute_db("UPDATE medications SET taken = ? WHERE id = ? AND user_id = ?",
-                   (new_status, record_id, user_id))
-        flash("Medication status updated successfully.", "success")
+        params = local_days_params(request.form['first_day'], request.form.get('last_day'))
+        with transaction() as db:
+            updated = db.execute(
+                f"UPDATE medications SET taken = 1 WHERE user_id = ? AND {LOCAL_DAYS_SQL} "
+                "AND taken = 0",
+                (user_id,) + params
+            ).rowcount
+            scheduled = mark_scheduled_doses_taken(db, user_id, *params)
+        invalidate_cache(user_id, 'medications')
+        flash(f"Marked {updated} records and {scheduled} scheduled doses as taken.", "success")
     except Exception as e:
         flash(f"An error occurred: {e}", "error")
 
-    return redirect(url_for('medications.list_records'))
+    return redirect(url_for('medications.list_records', range=request.form.get('range')))
+
+@bp.route('/schedules')
+def list_schedules():
+    """
+    Display the medication schedules of the logged-in user.
+
+    Returns:
+        str: Rendered template with the schedules or redirect to login page if not logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to view your schedules.", "error")
+        return redirect(url_for('auth.login'))
+
+    schedules = query_db("SELECT * FROM medication_schedules WHERE user_id = ? "
+                         "ORDER BY start_date ASC, id ASC", (user_id,))
+    return render_template('metrics/medications/schedules.html', schedules=schedules,
+                           format_times=format_times, format_weekdays=format_weekdays)
+
+@bp.route('/schedules/create', methods=['GET', 'POST'])
+def create_schedule():
+    """
+    Create a recurring medication schedule for the logged-in user.
+
+    Returns:
+        str: Rendered template or redirect to the schedule list on success.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to add a schedule.", "error")
+        return redirect(url_for('auth.login'))
+
+    if request.method == 'POST':
+        try:
+            times = parse_times(request.form['times'])
+            start_date = datetime.strptime(request.form['start_date'], "%Y-%m-%d").date()
+            end_date = request.form.get('end_date') or None
+            if end_date and datetime.strptime(end_date, "%Y-%m-%d").date() < start_date:
+                raise ValueError("The end date is before the start date.")
+            every_days = int(request.form.get('every_days') or 1)
+            if every_days < 1:
+                raise ValueError("Doses must be due at least every day.")
+            tz_offset = parse_tz_offset(request.form.get('tz_offset'))
+            if tz_offset is None:
+                # Same default as readings: the server's time zone on the first day
+                _, tz_offset = to_timestamp(f"{start_date.isoformat()} 00:00")
+            execute_db(
+                "INSERT INTO medication_schedules (user_id, medication_name, dosage, times, weekdays, "
+                "every_days, start_date, end_date, tz_offset, default_taken) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, request.form['medication_name'], request.form['dosage'],
+                 ','.join(map(str, times)), parse_weekdays(request.form.getlist('weekdays')),
+                 every_days, start_date.isoformat(), end_date, tz_offset,
+                 int(request.form.get('default_taken', '0')))
+            )
+            invalidate_cache(user_id, 'medications')
+            flash("Schedule added successfully.", "success")
+            return redirect(url_for('medications.list_schedules'))
+        except Exception as e:
+            flash(f"An error occurred: {e}", "error")
+
+    return render_template('metrics/medications/create_schedule.html',
+                           today=datetime.now().strftime("%Y-%m-%d"), weekday_names=WEEKDAY_NAMES)
+
+@bp.route('/schedules/delete/<int:schedule_id>', methods=['POST'])
+def delete_schedule(schedule_id):
+    """
+    Delete a medication schedule of the logged-in user, with its dose overrides.
+
+    Args:
+        schedule_id (int): ID of the schedule to delete.
+
+    Returns:
+        str: Redirect to the schedule list.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to delete a schedule.", "error")
+        return redirect(url_for('auth.login'))
+
+    try:
+        # Deleted explicitly: shard databases do not enforce the ON DELETE CASCADE
+        with transaction() as db:
+            db.execute("DELETE FROM medication_schedule_overrides WHERE schedule_id = "
+                       "(SELECT id FROM medication_schedules WHERE id = ? AND user_id = ?)",
+                       (schedule_id, user_id))
+            db.execute("DELETE FROM medication_schedules WHERE id = ? AND user_id = ?",
+                       (schedule_id, user_id))
+        invalidate_cache(user_id, 'medications')
+        flash("Schedule deleted successfully.", "success")
+    except Exception as e:
+        flash(f"An error occurred: {e}", "error")
+
+    return redirect(url_for('medications.list_schedules'))
+
+@bp.route('/schedules/<int:schedule_id>/dose', methods=['POST'])
+def mark_dose(schedule_id):
+    """
+    Mark a scheduled dose as taken or missed.
+
+    Args:
+        schedule_id (int): ID of the schedule of the dose.
+
+    Returns:
+        str: Redirect to record list.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to change medication status.", "error")
+        return redirect(url_for('auth.login'))
+
+    try:
+        if set_dose_status(user_id, schedule_id, int(request.form['ts']),
+                           request.form.get('taken') == '1'):
+            invalidate_cache(user_id, 'medications')
+            flash("Medication status updated successfully.", "success")
+        else:
+            flash("Dose not found.", "error")
+    except Exception as e:
+        flash(f"An error occurred: {e}", "error")
+
+    return redirect(url_for('medications.list_records', range=request.form.get('range')))
+
+@bp.route('/doses')
+def medications_doses():
+    """
+    Return the scheduled doses of the selected date range as JSON, newest first.
+
+    Doses that are not due yet and have not been marked have a null `taken`.
+    Results are cached per user, range and version of the schedules.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    range_option = request.args.get('range', 'last_week')  # Default to 'last_week'
+    start_date, end_date = calculate_date_range(range_option)
+    until = due_until()
+    return cached_json(
+        user_id, 'medications', ('doses', start_date, end_date, until),
+        lambda: dose_list(user_id, start_date, end_date, until=until))
+
+@bp.route('/export')
+def export_data():
+    """
+    Download the full medication history of the logged-in user as CSV or NDJSON.
+
+    The file is streamed in chunks straight from the database cursor, and is
+    gzip-encoded on the fly with `gzip=1`.
+
+    Returns:
+        Response: A streaming file download, or redirect to login page if not logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash("Please log in to export your records.", "error")
+        return redirect(url_for('auth.login'))
+
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        file_format = 'csv'
+
+    chunks = ENCODERS[file_format]('medications', user_id, current_app.config['EXPORT_CHUNK_SIZE'])
+    return export_response(chunks, f"medications.{file_format}", MIMETYPES[file_format],
+                           wants_gzip(), current_app.config['EXPORT_GZIP_LEVEL'])
+
+@bp.route('/stats')
+def medications_stats():
+    """
+    Return medication statistics as JSON for the selected date range.
+
+    The statistics are the taken and missed doses, records and due scheduled doses
+    alike, and the rolling means, linear trend and variability of the adherence.
+
+    Results are cached per user, range and data version, so they are only
+    recomputed after the user's medication records or schedules change, or
+    when more scheduled doses become due.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    range_option = request.args.get('range', 'last_month')  # Default to 'last_month'
+    start_date, end_date = calculate_date_range(range_option)
+    until = due_until()
+    return cached_json(
+        user_id, 'medications', ('stats', start_date, end_date, until),
+        lambda: compute_stats('medications', user_id, start_date, end_date, until))
 
 @bp.route('/data')
 def medications_data():
     """
     Return medication data as JSON for the chart, filtered by the selected date range.
+
+    With `max_points`, taken and missed doses are counted per day (or per group of
+    days when the range has more days than points) instead of returning every dose.
+
+    With `granularity=day|week`, daily or weekly taken and missed counts and the
+    adherence rate are served from the rollup tables instead of the raw records.
+    Both count the due doses of the user's schedules too.
+
+    With `since=<cursor>`, only the records changed after the cursor of the previous
+    call are returned (all of them for `since=0`), for the series kept by the chart script.
+
+    Without any of these options, the raw medication records are encoded with msgspec and streamed
+    in chunks. Bounded responses are cached per user, parameters and data version of the
+    records and schedules, so a write handled by any worker process is seen, and carry a
+    strong ETag so unchanged data is answered with 304.
     """
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
+    if 'since' in request.args:
+        # Incremental sync of the full series cached by the chart script
+        return sync_response('medications', user_id, request.args['since'], MedicationRecord)
+
     range_option = request.args.get('range', 'last_week')  # Default to 'last_week'
     start_date, end_date = calculate_date_range(range_option)
 
-    query = "SELECT date_time, medication_name, taken FROM medications WHERE user_id = ?"
+    granularity = request.args.get('granularity')
+    if granularity not in PERIODS:
+        granularity = None
+    max_points = get_max_points(request.args.get('max_points'),
+                                current_app.config['CHART_MAX_POINTS_LIMIT'])
+
+    if not granularity and not max_points:
+        # The raw series can be arbitrarily long, so stream it instead of caching it
+        query, params = series_query(user_id, start_date, end_date)
+        return stream_json_array(query, params, medication_point)
+
+    until = due_until()
+    return cached_json(
+        user_id, 'medications', (start_date, end_date, granularity, max_points, until),
+        lambda: build_chart_data(user_id, start_date, end_date, granularity, max_points, until))
+
+def build_chart_data(user_id, start_date, end_date, granularity=None, max_points=None,
+                     until=None):
+    """
+    Build the medication chart series for a date range.
+
+    Args:
+        user_id (int): ID of the user who owns the records.
+        start_date (int): Start timestamp of the date range, or None for all time.
+        end_date (int): End timestamp of the date range, or None for all time.
+        granularity (str, optional): 'day' or 'week' to read from the rollups.
+        max_points (int, optional): Point budget for downsampling when not using the rollups.
+        until (int, optional): Time up to which scheduled doses are due; defaults to now.
+
+    Returns:
+        list: Chart points as dictionaries.
+    """
+    dose_minutes, dose_taken = due_dose_columns(user_id, start_date, end_date, until)
+
+    if granularity:
+        totals = {row["bucket"]: [row["taken"], row["doses"]]
+                  for row in query_rollups('medications', user_id, granularity, start_date,
+                                           end_date)}
+        # Scheduled doses are counted into the same buckets as the rollups
+        for bucket, taken, doses in count_doses(dose_minutes, dose_taken, granularity):
+            total = totals.setdefault(bucket, [0, 0])
+            total[0] += taken
+            total[1] += doses
+        return [
+            {
+                "date": bucket,
+                "taken": taken,
+                "missed": doses - taken,
+                "adherence": round(taken / doses, 3)
+            }
+            for bucket, (taken, doses) in sorted(totals.items())
+        ]
+
+    series = read_series('medications', user_id, start_date, end_date)
+    if series is None:
+        query, params = series_query(user_id, start_date, end_date, LOCAL_MINUTES_SQL)
+        minutes, _, taken = fetch_columns(query, params, ['i8', 'O', 'i8'])
+        series = {'minutes': minutes, 'taken': taken}
+    series = merge_doses(series, dose_minutes, dose_taken)
+    labels, taken_counts, missed_counts = count_buckets(series['minutes'], series['taken'],
+                                                        max_points)
+    return [
+        {"date": label, "taken": taken_count, "missed": missed_count}
+        for label, taken_count, missed_count in zip(
+            labels.tolist(), taken_counts.tolist(), missed_counts.tolist())
+    ]
+
+def series_query(user_id, start_date, end_date, time_sql=LOCAL_TIME_SQL):
+    """
+    Build the query for a user's raw chart series, oldest first.
+
+    Args:
+        user_id (int): ID of the user who owns the records.
+        start_date (int): Start timestamp of the date range, or None for all time.
+        end_date (int): End timestamp of the date range, or None for all time.
+        time_sql (str): SQL expression selected as the first column; the local
+            date and time string by default.
+
+    Returns:
+        tuple: The SQL query and its parameters.
+    """
+    query = f"SELECT {time_sql}, medication_name, taken FROM medications WHERE user_id = ?"
     params = [user_id]
 
     if start_date:
-        query += " AND date_time BETWEEN ? AND ?"
+        query += " AND ts BETWEEN ? AND ?"
         params.extend([start_date, end_date])
 
-    query += " ORDER BY date_time ASC"
-
-    records = query_db(query, params)
-    return jsonify([
-        {
-            "date": record["date_time"],
-            "medication": record["medication_name"],
-            "status": "Taken" if record["taken"] else "Missed"
-        }
-        for record in records
-    ])
+    query += " ORDER BY ts ASC"
+    return query, params
+
+def medication_point(date_time, medication_name, taken):
+    """
+    Build a chart point from a medication record row.
+
+    Args:
+        date_time (str): Date and time of the dose.
+        medication_name (str): Name of the medication.
+        taken (int): Whether the dose was taken (0 or 1).
+
+    Returns:
+        MedicationPoint: The chart point.
+    """
+    return MedicationPoint(date_time, medication_name, "Taken" if taken else "Missed")
@@ -0,0 +1,101 @@
+"""
+Status Blueprint for the Healthsome application.
+
+This module defines the status reports of the database, caches, password hashing and group commit
+of the current worker process. They are only served when `STATUS_ENABLED` is set.
+"""
+
+from flask import Blueprint, jsonify, current_app, abort
+from helpers.db_helpers import get_pool, get_shard_pools, get_writer
+from helpers.cache_helpers import get_response_cache
+from helpers.series_store_helpers import get_series_store
+from helpers.user_helpers import get_user_cache
+from helpers.password_helpers import get_password_hasher
+
+bp = Blueprint('status', __name__, url_prefix='/status')
+
+@bp.before_request
+def require_status_enabled():
+    """
+    Answer every status request with 404 unless the status reports are enabled.
+    """
+    if not current_app.config.get('STATUS_ENABLED'):
+        abort(404)
+
+@bp.route('/db')
+def db_status():
+    """
+    Report connection pool statistics for the current worker process.
+
+    Returns:
+        Response: JSON with pool size, in-use connections, waits and wait time of the
+        directory database, and of every shard under `shards` if the database is sharded.
+    """
+    stats = get_pool().stats()
+    shard_pools = get_shard_pools()
+    if shard_pools:
+        stats["shards"] = {shard: pool.stats() for shard, pool in shard_pools.items()}
+    return jsonify(stats)
+
+@bp.route('/cache')
+def cache_status():
+    """
+    Report response cache statistics for the current worker process.
+
+    Returns:
+        Response: JSON with cached entries, hits, misses, evictions and invalidations.
+    """
+    return jsonify(get_response_cache().stats())
+
+@bp.route('/series')
+def series_store_status():
+    """
+    Report series store statistics for the current worker process.
+
+    Returns:
+        Response: JSON with mapped series, reads, appends, compactions and rebuilds,
+        or `{"enabled": false}` if the series store is disabled.
+    """
+    store = get_series_store()
+    if store is None:
+        return jsonify({"enabled": False})
+    return jsonify(store.stats())
+
+@bp.route('/users')
+def user_cache_status():
+    """
+    Report user identity cache statistics for the current worker process.
+
+    Returns:
+        Response: JSON with cached usernames, lookups by source and the hit rate.
+    """
+    return jsonify(get_user_cache().stats())
+
+@bp.route('/hashing')
+def hashing_status():
+    """
+    Report password hashing pool statistics for the current worker process.
+
+    Returns:
+        Response: JSON with the hash method, pool limits and completed, rejected and rehashed counts.
+    """
+    return jsonify(get_password_hasher().stats())
+
+@bp.route('/writes')
+def write_status():
+    """
+    Report group commit statistics for the current worker process.
+
+    Returns:
+        Response: JSON with statement and batch counts, batch sizes, retries and failures
+        of the directory database and of every shard under `shards` if the database is
+        sharded, or `{"enabled": false}` if group commit is disabled.
+    """
+    writer = get_writer()
+    if writer is None:
+        return jsonify({"enabled": False})
+    stats = writer.stats()
+    shard_count = current_app.config.get('SHARD_COUNT', 1)
+    if shard_count > 1:
+        stats["shards"] = {shard: get_writer(shard).stats() for shard in range(shard_count)}
+    return jsonify(stats)
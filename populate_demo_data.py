@@ -1,30 +1,74 @@
 """
 Populate Database Script
 
-This script populates the Healthsome database with demo data for testing purposes.
+This script populates the Healthsome database with deterministic demo data for
+testing and capacity planning: any number of users, each with several years of
+readings taken at realistic cadences.
+
+Users are generated in parallel by a process pool. Every worker writes its
+users' readings into its own temporary database with `executemany` inside one
+large transaction, and the shards are then merged into the target database
+with `INSERT ... SELECT`. With `--fresh`, the target database is recreated and
+the data is loaded before the migrations run, so the indexes and rollups are
+built once at the end instead of being maintained row by row.
+
+With `--schedules`, each user's medication regimen is stored as recurring
+schedules instead of one row per dose, with only the missed doses stored as
+overrides (see `helpers/schedule_helpers.py`).
+
+Examples:
+    python populate_demo_data.py                      # one user, 60 days
+    python populate_demo_data.py --users 1000 --years 5 --fresh --yes
+    python populate_demo_data.py --users 1000 --years 5 --fresh --yes --schedules
 """
 
+import argparse
+import math
 import os
 import random
 import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 
+from config import Config
+from helpers.datetime_helpers import SECONDS_PER_DAY, epoch_day, to_timestamp
+from helpers.migration_helpers import apply_migrations
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Retrieve settings from .env file
 DB_FILE = os.getenv("DB_FILE", "healthsome.db")
+SCHEMA_FILE = os.getenv("SCHEMA_FILE", "schema.sql")
 USERNAME = os.getenv("USERNAME", "user")
 PASSWORD = os.getenv("PASSWORD", "pass")
 
-def generate_value(min_val, max_val, decimals=1):
+# Columns of each metric table filled by the generator, in insert order
+METRIC_COLUMNS = {
+    'weight': ('user_id', 'date_time', 'weight_value'),
+    'blood_pressure': ('user_id', 'date_time', 'systolic', 'diastolic', 'pulse'),
+    'medications': ('user_id', 'date_time', 'medication_name', 'dosage', 'taken'),
+}
+
+# Medication regimens users are given one of: (hour, name, dosage) per daily dose
+REGIMENS = [
+    [(7, "Morning Med", "1 tablet")],
+    [(7, "Morning Med", "1 tablet"), (20, "Evening Med", "2 tablets")],
+    [(7, "Morning Med", "1 tablet"), (13, "Afternoon Med", "1/2 tablet"),
+     (20, "Evening Med", "2 tablets")],
+]
+
+def generate_value(rng, min_val, max_val, decimals=1):
     """
     Generate a random value within a range.
 
     Args:
+        rng (random.Random): Random number generator.
         min_val (float): Minimum value.
         max_val (float): Maximum value.
         decimals (int): Number of decimal places.
@@ -32,115 +76,325 @@ def generate_value(min_val, max_val, decimals=1):
     Returns:
         float: Random value rounded to the specified decimals.
     """
-    return round(random.uniform(min_val, max_val), int(decimals))
+    return round(rng.uniform(min_val, max_val), int(decimals))
 
-def insert_user(cursor):
+def make_usernames(prefix, count):
     """
-    Insert user data into the database with a hashed password.
+    Build the usernames of the generated users.
 
     Args:
-        cursor (sqlite3.Cursor): Database cursor.
+        prefix (str): Username of a single user, or prefix of numbered usernames.
+        count (int): Number of users.
 
     Returns:
-        int: User ID of the created user.
+        list: `prefix` alone for a single user, otherwise `prefix1` to `prefixN`.
     """
-    hashed_password = generate_password_hash(PASSWORD)
-    cursor.execute(
-        "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-        (USERNAME, hashed_password)
-    )
-    user_id = cursor.lastrowid
-    print(f"User {USERNAME} created with ID {user_id}.")
-    return user_id
+    if count == 1:
+        return [prefix]
+    return [f"{prefix}{i}" for i in range(1, count + 1)]
 
-def insert_weight(cursor, user_id, start_date):
+def reading_time(rng, day, hour, jitter_minutes=30):
     """
-    Insert weight data for a user into the database.
+    Format the time of a reading taken around a given hour of a day.
 
     Args:
-        cursor (sqlite3.Cursor): Database cursor.
-        user_id (int): User ID.
-        start_date (datetime): Starting date for records.
+        rng (random.Random): Random number generator.
+        day (str): The day as 'YYYY-MM-DD'.
+        hour (int): Usual hour of the reading.
+        jitter_minutes (int): Maximum deviation from the usual time.
+
+    Returns:
+        str: The date and time as 'YYYY-MM-DD HH:MM'.
     """
-    print("Adding weight records...")
-    for i in range(60):
-        date_time = start_date + timedelta(days=i)
-        weight_value = generate_value(80, 85, 1)
-        date_time_str = date_time.replace(hour=7, minute=0).strftime("%Y-%m-%d %H:%M")
-        cursor.execute(
-            "INSERT INTO weight (user_id, date_time, weight_value) VALUES (?, ?, ?)",
-            (user_id, date_time_str, weight_value)
-        )
+    offset = hour * 60 + int((rng.random() * 2 - 1) * jitter_minutes)
+    offset = max(0, min(offset, 1439))
+    return f"{day} {offset // 60:02d}:{offset % 60:02d}"
 
-def insert_bp_pulse(cursor, user_id, start_date):
+def generate_user(user_id, start_date, days, seed, schedules=False):
     """
-    Insert blood pressure and pulse data for a user into the database.
+    Generate all readings of one user.
+
+    Every user gets a random generator seeded from (seed, user_id), so the
+    data does not depend on how users are split across worker processes.
+    Weight is logged most mornings and drifts slowly; blood pressure and
+    pulse are measured most mornings and evenings around a personal baseline;
+    medications follow a personal regimen and are missed about 10% of the time.
 
     Args:
-        cursor (sqlite3.Cursor): Database cursor.
-        user_id (int): User ID.
-        start_date (datetime): Starting date for records.
-    """
-    print("Adding blood pressure and pulse records...")
-    for i in range(60):
-        for hour in [7, 19]:  # Morning and evening
-            date_time = start_date + timedelta(days=i, hours=hour)
-            systolic = generate_value(110, 140, 0)
-            diastolic = generate_value(70, 90, 0)
-            pulse = generate_value(60, 100, 0)
-            date_time_str = date_time.strftime("%Y-%m-%d %H:%M")
-            cursor.execute(
-                "INSERT INTO blood_pressure (user_id, date_time, systolic, diastolic, pulse) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (user_id, date_time_str, systolic, diastolic, pulse)
-            )
-
-def insert_medications(cursor, user_id, start_date):
-    """
-    Insert medication records for a user into the database.
+        user_id (int): ID of the user.
+        start_date (datetime): Midnight of the first day.
+        days (int): Number of days to generate.
+        seed (int): Global seed.
+        schedules (bool): Leave out the medication doses, which `insert_schedules` stores.
+
+    Returns:
+        dict: Row tuples per metric, in METRIC_COLUMNS order.
+    """
+    rng = random.Random(seed * 1000003 + user_id)
+    weight = generate_value(rng, 55, 110)
+    systolic_base = rng.randint(110, 145)
+    diastolic_base = rng.randint(70, 92)
+    pulse_base = rng.randint(58, 85)
+    regimen = rng.choice(REGIMENS)
+
+    rows = {metric: [] for metric in METRIC_COLUMNS}
+    for i in range(days):
+        day = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
+
+        if rng.random() < 0.85:
+            weight = min(max(weight + rng.gauss(0, 0.15), 40), 200)
+            rows['weight'].append((user_id, reading_time(rng, day, 7), round(weight, 1)))
+
+        for hour in (7, 19):  # Morning and evening
+            if rng.random() < 0.9:
+                rows['blood_pressure'].append((
+                    user_id, reading_time(rng, day, hour),
+                    round(rng.gauss(systolic_base, 8)),
+                    round(rng.gauss(diastolic_base, 6)),
+                    round(rng.gauss(pulse_base, 7)),
+                ))
+
+        if schedules:
+            continue
+        for hour, medication_name, dosage in regimen:
+            taken = 0 if rng.random() < 0.1 else 1  # 10% chance of missing the medication
+            rows['medications'].append(
+                (user_id, reading_time(rng, day, hour, 15), medication_name, dosage, taken))
+    return rows
+
+def insert_query(metric):
+    """
+    Build the INSERT statement of a metric table.
+
+    Args:
+        metric (str): One of the keys of METRIC_COLUMNS.
+
+    Returns:
+        str: The parameterized INSERT statement.
+    """
+    columns = METRIC_COLUMNS[metric]
+    return (f"INSERT INTO {metric} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+def generate_shard(shard_file, user_ids, start_date, days, seed, schedules=False):
+    """
+    Write the readings of a group of users into a new shard database.
+
+    Runs in a worker process. The shard holds only the metric tables and is
+    written without a journal or fsync, since it is thrown away after the merge.
+
+    Args:
+        shard_file (str): Path of the shard database to create.
+        user_ids (list): IDs of the users to generate.
+        start_date (datetime): Midnight of the first day.
+        days (int): Number of days to generate.
+        seed (int): Global seed.
+        schedules (bool): Leave out the medication doses.
+
+    Returns:
+        dict: Number of generated rows per metric.
+    """
+    counts = dict.fromkeys(METRIC_COLUMNS, 0)
+    conn = sqlite3.connect(shard_file)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    with conn:
+        for user_id in user_ids:
+            for metric, rows in generate_user(user_id, start_date, days, seed, schedules).items():
+                conn.executemany(insert_query(metric), rows)
+                counts[metric] += len(rows)
+    conn.close()
+    return counts
+
+def insert_users(conn, usernames, password):
+    """
+    Insert the users with one shared password hash.
 
     Args:
-        cursor (sqlite3.Cursor): Database cursor.
-        user_id (int): User ID.
-        start_date (datetime): Starting date for records.
-    """
-    print("Adding medication records...")
-    medications = [
-        ("Morning Med", "1 tablet"),
-        ("Afternoon Med", "1/2 tablet"),
-        ("Evening Med", "2 tablets")
-    ]
-    for i in range(60):
-        date_time = start_date + timedelta(days=i)
-        for hour, (medication_name, dosage) in zip([7, 13, 20], medications):
-            taken = 0 if random.random() < 0.1 else 1  # 10% chance of missing the medication
-            date_time_str = date_time.replace(hour=hour, minute=0).strftime("%Y-%m-%d %H:%M")
-            cursor.execute(
-                "INSERT INTO medications (user_id, date_time, medication_name, dosage, taken) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (user_id, date_time_str, medication_name, dosage, taken)
-            )
-
-def populate_database():
-    """
-    Populate the database with demo data.
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    start_date = datetime.now() - timedelta(days=60)
+        conn (sqlite3.Connection): Connection to the target database.
+        usernames (list): Usernames to insert.
+        password (str): Plain-text password of every user.
+
+    Returns:
+        list: IDs of the inserted users, in the order of `usernames`.
+    """
+    hashed_password = generate_password_hash(password, Config.PASSWORD_HASH_METHOD)
+    user_ids = []
+    for username in usernames:
+        cur = conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                           (username, hashed_password))
+        user_ids.append(cur.lastrowid)
+    return user_ids
+
+def insert_schedules(conn, user_ids, start_date, days, seed):
+    """
+    Store each user's medication regimen as recurring schedules.
+
+    Every dose of a regimen becomes one daily schedule whose doses count as
+    taken; the doses missed (about 10%) are stored as overrides.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the migrated target database, inside a transaction.
+        user_ids (list): IDs of the users.
+        start_date (datetime): Midnight of the first day.
+        days (int): Number of days of history.
+        seed (int): Global seed.
+
+    Returns:
+        dict: Number of inserted schedules and overrides.
+    """
+    first_day = start_date.strftime("%Y-%m-%d")
+    _, tz_offset = to_timestamp(f"{first_day} 00:00")
+    first = epoch_day(first_day)
+    counts = {'medication_schedules': 0, 'medication_schedule_overrides': 0}
+    for user_id in user_ids:
+        # Seeded apart from generate_user, whose readings do not depend on this
+        rng = random.Random((seed * 1000003 + user_id) * 2 + 1)
+        for hour, medication_name, dosage in rng.choice(REGIMENS):
+            cur = conn.execute(
+                "INSERT INTO medication_schedules (user_id, medication_name, dosage, times, "
+                "start_date, tz_offset, default_taken) VALUES (?, ?, ?, ?, ?, ?, 1)",
+                (user_id, medication_name, dosage, str(hour * 60), first_day, tz_offset))
+            missed = [(cur.lastrowid, (first + i) * SECONDS_PER_DAY + hour * 3600 - tz_offset * 60)
+                      for i in range(days) if rng.random() < 0.1]
+            conn.executemany("INSERT INTO medication_schedule_overrides (schedule_id, ts, taken) "
+                             "VALUES (?, ?, 0)", missed)
+            counts['medication_schedules'] += 1
+            counts['medication_schedule_overrides'] += len(missed)
+    return counts
+
+def merge_shard(conn, shard_file):
+    """
+    Copy the readings of a shard into the target database.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the target database, inside a transaction.
+        shard_file (str): Path of the shard database.
+    """
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_file,))
+    for metric, columns in METRIC_COLUMNS.items():
+        column_list = ', '.join(columns)
+        target_columns = {row[1] for row in conn.execute(f"PRAGMA main.table_info({metric})")}
+        if 'ts' not in target_columns:
+            conn.execute(f"INSERT INTO main.{metric} ({column_list}) "
+                         f"SELECT {column_list} FROM shard.{metric} ORDER BY id")
+            continue
+        # A migrated target stores date_time as a timestamp and offset (migration 0004)
+        values = ', '.join(columns).replace(
+            'date_time', "CAST(strftime('%s', date_time, 'utc') AS INTEGER), "
+                         "(strftime('%s', date_time) - strftime('%s', date_time, 'utc')) / 60")
+        target_list = column_list.replace('date_time', 'ts, tz_offset')
+        conn.execute(f"INSERT INTO main.{metric} ({target_list}) "
+                     f"SELECT {values} FROM shard.{metric} ORDER BY id")
+
+def populate(db_file, users=1, years=60 / 365, seed=42, workers=None, fresh=False,
+             username=USERNAME, password=PASSWORD, schedules=False):
+    """
+    Generate demo users and their readings into a database.
+
+    Args:
+        db_file (str): Path of the target database.
+        users (int): Number of users to create.
+        years (float): Length of each user's history, ending today.
+        seed (int): Seed that makes the generated data reproducible.
+        workers (int, optional): Worker processes; defaults to the number of CPUs.
+        fresh (bool): Create the database from scratch and build indexes and rollups last.
+        username (str): Username, or prefix of numbered usernames for several users.
+        password (str): Password of every generated user.
+        schedules (bool): Store medication regimens as schedules instead of dose records.
+
+    Returns:
+        dict: Number of inserted rows per metric.
+    """
+    days = max(1, math.ceil(years * 365))
+    start_date = (datetime.now() - timedelta(days=days)).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    workers = max(1, min(workers or os.cpu_count() or 1, users))
+
+    conn = sqlite3.connect(db_file)
+    if fresh:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+
+    with conn:
+        user_ids = insert_users(conn, make_usernames(username, users), password)
+    print(f"{users} user(s) created; generating {days} days of readings each...")
+
+    counts = dict.fromkeys(METRIC_COLUMNS, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        groups = [user_ids[i::workers] for i in range(workers)]
+        shard_files = [os.path.join(tmp, f"shard{i}.db") for i in range(workers)]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(generate_shard, shard_file, group, start_date, days, seed,
+                                   schedules)
+                       for shard_file, group in zip(shard_files, groups)]
+            for future in futures:
+                for metric, count in future.result().items():
+                    counts[metric] += count
+
+        print("Merging generated readings...")
+        for shard_file in shard_files:
+            with conn:
+                merge_shard(conn, shard_file)
+            conn.execute("DETACH DATABASE shard")
+
+    if fresh:
+        print("Building indexes and rollups...")
+        apply_migrations(conn)
+        conn.execute("PRAGMA synchronous = NORMAL")
+    if schedules:
+        # Schedules only exist in a migrated database, so they are inserted last
+        with conn:
+            counts.update(insert_schedules(conn, user_ids, start_date, days, seed))
+    conn.close()
+    return counts
+
+def main():
+    """
+    Parse the command line and populate the database with demo data.
+    """
+    parser = argparse.ArgumentParser(description="Populate the database with demo data.")
+    parser.add_argument("--users", type=int, default=1, help="number of users to create")
+    parser.add_argument("--years", type=float, default=60 / 365,
+                        help="years of history per user (default: 60 days)")
+    parser.add_argument("--seed", type=int, default=42, help="seed for reproducible data")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="recreate the database and build indexes after loading")
+    parser.add_argument("--yes", action="store_true", help="do not ask before recreating")
+    parser.add_argument("--schedules", action="store_true",
+                        help="store medication regimens as recurring schedules")
+    args = parser.parse_args()
+
+    if args.fresh and os.path.exists(DB_FILE):
+        if not args.yes:
+            confirm = input(
+                f"Database file '{DB_FILE}' already exists. Recreate? (y/n): "
+            ).strip().lower()
+            if confirm != 'y':
+                print("Population aborted.")
+                return
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(DB_FILE + suffix):
+                os.remove(DB_FILE + suffix)
 
+    started = time.perf_counter()
     try:
-        user_id = insert_user(cursor)
-        insert_weight(cursor, user_id, start_date)
-        insert_bp_pulse(cursor, user_id, start_date)
-        insert_medications(cursor, user_id, start_date)
-        conn.commit()
-        print("Database populated successfully.")
+        counts = populate(DB_FILE, args.users, args.years, args.seed, args.workers, args.fresh,
+                          schedules=args.schedules)
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        return
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for metric, count in counts.items():
+        print(f"  {metric}: {count} records")
+    print(f"Database populated successfully: {total} records in {elapsed:.1f}s "
+          f"({total / elapsed:.0f} records/s).")
 
 if __name__ == "__main__":
-    populate_database()
+    main()
@@ -0,0 +1,168 @@
+"""
+Shard Rebalancing Script
+
+This script changes the number of shards of the Healthsome database. It
+creates the missing shard databases, moves every user whose shard changes
+under the new count (see `helpers/shard_helpers.py`) and records the new
+count in the directory database. With `--shards 1`, every user is moved
+back into the directory database.
+
+Run it while the application is stopped, then start the application with
+`SHARD_COUNT` set to the new count. Each user is moved in one transaction
+that commits atomically across both databases, so an interrupted run can
+simply be run again.
+
+Examples:
+    python rebalance_shards.py --shards 4 --dry-run
+    python rebalance_shards.py --shards 4
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+
+from dotenv import load_dotenv
+
+from helpers.shard_helpers import (get_shard_count, init_shard, move_user, set_shard_count,
+                                   shard_file, shard_files, shard_for)
+
+# Load environment variables from .env file
+load_dotenv()
+
+DB_FILE = os.getenv("DB_FILE", "healthsome.db")
+SCHEMA_FILE = os.getenv("SCHEMA_FILE", "schema.sql")
+SHARD_FILE_TEMPLATE = os.getenv("SHARD_FILE_TEMPLATE", "")
+
+def plan_moves(user_ids, old_count, new_count):
+    """
+    Find the users whose shard database changes with the new shard count.
+
+    Args:
+        user_ids (list): IDs of all users.
+        old_count (int): Current number of shards.
+        new_count (int): New number of shards.
+
+    Returns:
+        dict: Lists of user IDs by (source path, target path).
+    """
+    moves = defaultdict(list)
+    for user_id in user_ids:
+        source = shard_file(DB_FILE, shard_for(user_id, old_count), old_count, SHARD_FILE_TEMPLATE)
+        target = shard_file(DB_FILE, shard_for(user_id, new_count), new_count, SHARD_FILE_TEMPLATE)
+        if source != target:
+            moves[(source, target)].append(user_id)
+    return moves
+
+def set_journal_mode(path, mode):
+    """
+    Switch the journal mode of a database.
+
+    A transaction spanning attached databases only commits atomically across
+    them in a rollback journal mode, so the moves run outside of WAL mode.
+
+    Args:
+        path (str): Path of the database.
+        mode (str): 'DELETE' or 'WAL'.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"PRAGMA journal_mode = {mode}")
+    finally:
+        conn.close()
+
+def rebalance(new_count):
+    """
+    Move the users to their shards under a new shard count and record it.
+
+    Args:
+        new_count (int): New number of shards.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        old_count = get_shard_count(conn)
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+    conn.close()
+
+    moves = plan_moves(user_ids, old_count, new_count)
+    moving = sum(len(users) for users in moves.values())
+    print(f"{len(user_ids)} users, {old_count} -> {new_count} shard(s): "
+          f"{moving} users to move.")
+
+    if new_count > 1:
+        for index, path in enumerate(shard_files(DB_FILE, new_count, SHARD_FILE_TEMPLATE)):
+            if init_shard(path, index, SCHEMA_FILE):
+                print(f"Created shard {index}: '{path}'.")
+
+    paths = sorted({path for pair in moves for path in pair})
+    for path in paths:
+        set_journal_mode(path, "DELETE")
+    try:
+        started = time.perf_counter()
+        for (source, target), users in moves.items():
+            conn = sqlite3.connect(source)
+            try:
+                conn.execute("ATTACH DATABASE ? AS target", (target,))
+                moved = sum(move_user(conn, user_id) for user_id in users)
+            finally:
+                conn.close()
+            print(f"Moved {len(users)} users ({moved} records and schedules) "
+                  f"from '{source}' to '{target}'.")
+    finally:
+        for path in paths:
+            set_journal_mode(path, "WAL")
+
+    with sqlite3.connect(DB_FILE) as conn:
+        set_shard_count(conn, new_count)
+    conn.close()
+    if moving:
+        print(f"Moved {moving} users in {time.perf_counter() - started:.1f}s.")
+
+    counts = Counter(shard_for(user_id, new_count) for user_id in user_ids)
+    for index in range(new_count):
+        print(f"  shard {index}: {counts[index]} users")
+    if new_count < old_count:
+        stale = set(shard_files(DB_FILE, old_count, SHARD_FILE_TEMPLATE)) \
+            - set(shard_files(DB_FILE, new_count, SHARD_FILE_TEMPLATE)) - {DB_FILE}
+        if stale:
+            print(f"These shard databases are no longer used and can be deleted: "
+                  f"{', '.join(sorted(stale))}.")
+    print(f"Start the application with SHARD_COUNT={new_count}.")
+
+def main():
+    """
+    Parse command line arguments and rebalance the shards.
+    """
+    parser = argparse.ArgumentParser(description="Change the number of Healthsome shard databases.")
+    parser.add_argument("--shards", type=int, required=True, help="new number of shards")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report how many users would move")
+    args = parser.parse_args()
+
+    if args.shards < 1:
+        print("The number of shards must be at least 1.")
+        sys.exit(1)
+    if not os.path.exists(DB_FILE):
+        print(f"Database file '{DB_FILE}' not found. Run create_db.py first.")
+        sys.exit(1)
+
+    try:
+        if args.dry_run:
+            with sqlite3.connect(DB_FILE) as conn:
+                old_count = get_shard_count(conn)
+                user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+            conn.close()
+            for (source, target), users in sorted(plan_moves(user_ids, old_count, args.shards).items()):
+                print(f"Would move {len(users)} users from '{source}' to '{target}'.")
+            return
+        rebalance(args.shards)
+    except sqlite3.DatabaseError as e:
+        if "locked" in str(e):
+            print(f"Error rebalancing shards: {e}. Stop the application before rebalancing.")
+        else:
+            print(f"Error rebalancing shards: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Rollup Rebuild Script
+
+This script recomputes the daily and weekly metric rollups of the Healthsome
+database from the raw readings, for all users or a single user. A sharded
+database is rebuilt shard by shard.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from dotenv import load_dotenv
+
+from helpers.rollup_helpers import ROLLUP_AGGREGATES, rebuild_rollups
+from helpers.shard_helpers import get_shard_count, shard_file, shard_files, shard_for
+
+# Load environment variables from .env file
+load_dotenv()
+
+DB_FILE = os.getenv("DB_FILE", "healthsome.db")
+SHARD_FILE_TEMPLATE = os.getenv("SHARD_FILE_TEMPLATE", "")
+
+def main():
+    """
+    Parse command line arguments and rebuild the requested rollups.
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the Healthsome metric rollups.")
+    parser.add_argument("--user-id", type=int, help="only rebuild the rollups of this user")
+    parser.add_argument("--metric", choices=sorted(ROLLUP_AGGREGATES),
+                        help="only rebuild the rollups of this metric")
+    args = parser.parse_args()
+
+    metrics = [args.metric] if args.metric else list(ROLLUP_AGGREGATES)
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            shard_count = get_shard_count(conn)
+        if args.user_id is not None:
+            databases = [shard_file(DB_FILE, shard_for(args.user_id, shard_count), shard_count,
+                                    SHARD_FILE_TEMPLATE)]
+        else:
+            databases = shard_files(DB_FILE, shard_count, SHARD_FILE_TEMPLATE)
+        for database in databases:
+            with sqlite3.connect(database) as conn:
+                for metric in metrics:
+                    written = rebuild_rollups(conn, metric, args.user_id)
+                    print(f"Rebuilt {written} {metric} rollup rows in '{database}'.")
+    except sqlite3.DatabaseError as e:
+        print(f"Error rebuilding rollups: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
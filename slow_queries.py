@@ -0,0 +1,126 @@
+"""
+Slow Query Summary Script
+
+This script summarizes the slow query log written when `SLOW_QUERY_THRESHOLD_MS`
+is set: statements are grouped by their normalized SQL and the top offenders
+are listed with their counts, latencies, row counts, endpoints and last plan.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.log")
+
+# Orderings offered by --sort
+SORT_KEYS = {
+    "total": lambda group: group["total_ms"],
+    "max": lambda group: group["max_ms"],
+    "count": lambda group: group["count"],
+    "rows": lambda group: group["max_rows"],
+}
+
+def log_files(path):
+    """
+    Find a log file and its rotated backups.
+
+    Args:
+        path (str): Path of the log file; a '{pid}' placeholder matches every worker's file.
+
+    Returns:
+        list: Existing files, oldest backups first.
+    """
+    pattern = path.replace("{pid}", "*")
+    files = []
+    for base in sorted(glob.glob(pattern)) or [pattern]:
+        backups = glob.glob(glob.escape(base) + ".*")
+        backups.sort(key=lambda name: int(name.rsplit(".", 1)[1]) if name.rsplit(".", 1)[1].isdigit() else 0,
+                     reverse=True)
+        files.extend(backups)
+        if os.path.exists(base):
+            files.append(base)
+    return files
+
+def summarize(files):
+    """
+    Group the logged statements by normalized SQL.
+
+    Args:
+        files (list): Log files to read.
+
+    Returns:
+        list: One dict per statement shape with counts, latencies, rows, endpoints and the last plan.
+    """
+    groups = {}
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups.setdefault(entry["sql"], {
+                    "sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "latencies": [], "max_rows": 0, "endpoints": {}, "params": None,
+                    "plan": None, "unindexed": False,
+                })
+                group["count"] += 1
+                group["total_ms"] += entry["ms"]
+                group["max_ms"] = max(group["max_ms"], entry["ms"])
+                group["latencies"].append(entry["ms"])
+                group["max_rows"] = max(group["max_rows"], entry.get("rows") or 0)
+                endpoint = entry.get("endpoint") or "-"
+                group["endpoints"][endpoint] = group["endpoints"].get(endpoint, 0) + 1
+                group["params"] = entry.get("params")
+                group["plan"] = entry.get("plan")
+                group["unindexed"] = group["unindexed"] or entry.get("unindexed", False)
+    for group in groups.values():
+        latencies = sorted(group.pop("latencies"))
+        group["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return list(groups.values())
+
+def main():
+    """
+    Parse command line arguments and print the slowest statement shapes.
+    """
+    parser = argparse.ArgumentParser(description="Summarize the Healthsome slow query log.")
+    parser.add_argument("--file", default=SLOW_QUERY_LOG_FILE,
+                        help="log file; rotated backups are included (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="number of statements to show")
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="total",
+                        help="order statements by total time, max time, count or rows")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    files = log_files(args.file)
+    if not files:
+        print(f"Slow query log '{args.file}' not found.")
+        sys.exit(1)
+
+    groups = sorted(summarize(files), key=SORT_KEYS[args.sort], reverse=True)[:args.top]
+    if args.json:
+        print(json.dumps(groups, indent=2))
+        return
+    if not groups:
+        print("No slow queries logged.")
+    for rank, group in enumerate(groups, 1):
+        endpoints = ", ".join(f"{name} ({count})" for name, count in
+                              sorted(group["endpoints"].items(), key=lambda item: -item[1]))
+        print(f"{rank}. {group['count']}x, total {group['total_ms']:.1f} ms, "
+              f"p95 {group['p95_ms']:.1f} ms, max {group['max_ms']:.1f} ms, "
+              f"up to {group['max_rows']} rows{', UNINDEXED' if group['unindexed'] else ''}")
+        print(f"   SQL: {group['sql']}")
+        print(f"   Params: {group['params']}")
+        print(f"   Endpoints: {endpoints}")
+        for detail in group["plan"] or ["(no plan)"]:
+            print(f"   Plan: {detail}")
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,16 @@ document.addEventListener("DOMContentLoaded", function () {
     const loader = document.getElementById("chartLoader");
     const chartCanvas = document.getElementById("bloodPressureChart");
 
-    const urlParams = new URLSearchParams(window.location.search);
-    const range = urlParams.get('range') || 'last_week'; // Default to 'last_week'
+    // The page passes the selected range as timestamps (empty for all time)
+    const start = Number(chartCanvas.dataset.start) || null;
+    const end = Number(chartCanvas.dataset.end) || null;
 
-    fetch(`/blood_pressure/data?range=${range}`)
-        .then(response => response.json())
+    // Keep roughly one point per pixel of chart width, with each bucket's extremes
+    const maxPoints = Math.max(100, Math.round(chartCanvas.parentElement.clientWidth));
+
+    syncSeries('blood_pressure', chartCanvas.dataset.user)
+        .then(records => chartPoints('blood_pressure', filterRange(records, start, end), chartCanvas.dataset.range,
+                                     maxPoints, record => record.systolic))
         .then(data => {
             if (data.error) {
                 console.error(data.error);
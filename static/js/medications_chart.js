@@ -2,42 +2,63 @@ document.addEventListener("DOMContentLoaded", function () {
     const loader = document.getElementById("chartLoader");
     const chartCanvas = document.getElementById("medicationsChart");
 
-    // Extract the selected range from the URL
-    const urlParams = new URLSearchParams(window.location.search);
-    const range = urlParams.get('range') || 'last_week'; // Default to 'last_week'
+    // The page passes the selected range as timestamps (empty for all time)
+    const start = Number(chartCanvas.dataset.start) || null;
+    const end = Number(chartCanvas.dataset.end) || null;
 
-    // Fetch medication data with the selected range
-    fetch(`/medications/data?range=${range}`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`HTTP error! Status: ${response.status}`);
-            }
-            return response.json();
-        })
-        .then(data => {
-            if (!Array.isArray(data) || data.length === 0) {
+    // Keep roughly one bar per pixel of chart width
+    const maxPoints = Math.max(100, Math.round(chartCanvas.parentElement.clientWidth));
+
+    // Doses of the user's schedules are generated by the server for the range
+    const scheduled = fetch(`/medications/doses?range=${encodeURIComponent(chartCanvas.dataset.range)}`)
+        .then(response => response.ok ? response.json() : []);
+
+    // Count taken and missed doses per day, merging days when there are too many
+    function countDoses(doses) {
+        const dayOf = dose => Math.floor(Date.parse(dose.date.slice(0, 10) + "T00:00:00Z") / 86400000);
+        const doseDays = doses.map(dayOf);
+        const firstDay = doseDays.reduce((a, b) => Math.min(a, b));
+        const lastDay = doseDays.reduce((a, b) => Math.max(a, b));
+        const width = Math.ceil((lastDay - firstDay + 1) / maxPoints);
+        const buckets = new Map();
+        doses.forEach((dose, i) => {
+            const day = firstDay + Math.floor((doseDays[i] - firstDay) / width) * width;
+            const bucket = buckets.get(day) || { taken: 0, missed: 0 };
+            bucket[dose.taken ? "taken" : "missed"] += 1;
+            buckets.set(day, bucket);
+        });
+        return Array.from(buckets.keys()).sort((a, b) => a - b).map(day => ({
+            date: new Date(day * 86400000).toISOString().slice(0, 10),
+            taken: buckets.get(day).taken,
+            missed: buckets.get(day).missed,
+        }));
+    }
+
+    // Sync the stored series with the server and pick the selected range
+    Promise.all([syncSeries('medications', chartCanvas.dataset.user), scheduled])
+        .then(([records, scheduledDoses]) => {
+            // Doses that are not due yet are neither taken nor missed
+            const doses = filterRange(records, start, end)
+                .concat(scheduledDoses.filter(dose => dose.taken !== null));
+            if (doses.length === 0) {
                 loader.innerHTML = "<span class='text-danger'>No data available for the selected range.</span>";
                 throw new Error("No data received or invalid format");
             }
 
-            // Group data by date
-            const groupedData = data.reduce((acc, record) => {
-                const dateKey = new Date(record.date).toISOString().split("T")[0]; // Extract only the date part
-                if (!acc[dateKey]) {
-                    acc[dateKey] = { taken: 0, missed: 0 };
-                }
-                if (record.status === "Taken") {
-                    acc[dateKey].taken++;
-                } else {
-                    acc[dateKey].missed++;
-                }
-                return acc;
-            }, {});
-
-            // Prepare labels and datasets for the chart
-            const labels = Object.keys(groupedData);
-            const takenData = labels.map(date => groupedData[date].taken);
-            const missedData = labels.map(date => groupedData[date].missed);
+            if (doses.length > maxPoints) {
+                // Too many doses to count here: the server counts them per day
+                return fetchDownsampled('medications', chartCanvas.dataset.range, maxPoints)
+                    .catch(error => {
+                        console.error("Downsampling failed, counting the stored copy:", error);
+                        return countDoses(doses);
+                    });
+            }
+            return countDoses(doses);
+        })
+        .then(counts => {
+            const labels = counts.map(bucket => bucket.date);
+            const takenData = counts.map(bucket => bucket.taken);
+            const missedData = counts.map(bucket => bucket.missed);
 
             const chartData = {
                 labels: labels,
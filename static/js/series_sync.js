@@ -0,0 +1,168 @@
+// Keeps each metric's full series in the browser and fetches only what changed.
+//
+// The series of a metric is stored in IndexedDB (or localStorage when IndexedDB
+// is unavailable) together with the cursor of the last sync. On every page load
+// `/<metric>/data?since=<cursor>` returns the records inserted, updated or deleted
+// since then, which are merged into the stored series. A range with more records
+// than the chart has room for is drawn from the series the server downsamples
+// (`max_points`) instead, so the browser does not render every point. Everything stored is
+// removed again on the login page, so the next user of the browser cannot read it.
+(function () {
+    const DB_NAME = "healthsome";
+    const STORE = "series";
+
+    function openStore() {
+        return new Promise((resolve, reject) => {
+            if (!window.indexedDB) {
+                reject(new Error("IndexedDB is not available"));
+                return;
+            }
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(STORE);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function load(key) {
+        return openStore()
+            .then(db => new Promise((resolve, reject) => {
+                const request = db.transaction(STORE).objectStore(STORE).get(key);
+                request.onsuccess = () => resolve(request.result || null);
+                request.onerror = () => reject(request.error);
+            }))
+            .catch(() => {
+                try {
+                    return JSON.parse(localStorage.getItem(`${DB_NAME}:${key}`));
+                } catch (error) {
+                    return null;
+                }
+            });
+    }
+
+    function save(key, value) {
+        return openStore()
+            .then(db => new Promise((resolve, reject) => {
+                const transaction = db.transaction(STORE, "readwrite");
+                transaction.objectStore(STORE).put(value, key);
+                transaction.oncomplete = resolve;
+                transaction.onerror = () => reject(transaction.error);
+            }))
+            .catch(() => {
+                try {
+                    localStorage.setItem(`${DB_NAME}:${key}`, JSON.stringify(value));
+                } catch (error) {
+                    // Over quota: the next visit falls back to a full sync
+                }
+            });
+    }
+
+    // Sync a metric's series and resolve with all of its records, oldest first
+    window.syncSeries = function (metric, userKey) {
+        const key = `${userKey}:${metric}`;
+        return load(key).then(stored => {
+            const cursor = stored ? stored.cursor : "0";
+            return fetch(`/${metric}/data?since=${encodeURIComponent(cursor)}`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! Status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(delta => {
+                    const records = new Map();
+                    if (stored && !delta.reset) {
+                        stored.records.forEach(record => records.set(record.id, record));
+                    }
+                    delta.records.forEach(record => records.set(record.id, record));
+                    delta.deleted.forEach(id => records.delete(id));
+
+                    const series = Array.from(records.values())
+                        .sort((a, b) => a.ts - b.ts || a.id - b.id);
+                    if (delta.reset || delta.records.length || delta.deleted.length
+                        || delta.cursor !== cursor) {
+                        save(key, { cursor: delta.cursor, records: series });
+                    }
+                    return series;
+                })
+                .catch(error => {
+                    // Offline or failed: show what was synced before, if anything
+                    if (stored) {
+                        console.error("Series sync failed, using the stored copy:", error);
+                        return stored.records;
+                    }
+                    throw error;
+                });
+        });
+    };
+
+    // Remove the stored series of every user
+    window.clearSeries = function () {
+        if (window.indexedDB) {
+            indexedDB.deleteDatabase(DB_NAME);
+        }
+        try {
+            Object.keys(localStorage)
+                .filter(key => key.startsWith(`${DB_NAME}:`))
+                .forEach(key => localStorage.removeItem(key));
+        } catch (error) {
+            // Storage is disabled: nothing was stored
+        }
+    };
+
+    // Fetch the series of a range downsampled by the server to about maxPoints
+    window.fetchDownsampled = function (metric, range, maxPoints) {
+        return fetch(`/${metric}/data?range=${encodeURIComponent(range)}&max_points=${maxPoints}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! Status: ${response.status}`);
+                }
+                return response.json();
+            });
+    };
+
+    // Resolve with the points to draw: the records themselves when they fit in
+    // maxPoints, otherwise the server's downsampled series, or the records thinned
+    // here when the server cannot be reached
+    window.chartPoints = function (metric, records, range, maxPoints, value) {
+        if (records.length <= maxPoints) {
+            return Promise.resolve(records);
+        }
+        return fetchDownsampled(metric, range, maxPoints).catch(error => {
+            console.error("Downsampling failed, thinning the stored copy:", error);
+            return thinSeries(records, maxPoints, value);
+        });
+    };
+
+    // Keep the records within the [start, end] timestamps (all of them when unset)
+    window.filterRange = function (records, start, end) {
+        if (!start) {
+            return records;
+        }
+        return records.filter(record => record.ts >= start && record.ts <= end);
+    };
+
+    // Thin a series to about maxPoints, keeping each bucket's lowest and highest value
+    window.thinSeries = function (records, maxPoints, value) {
+        const buckets = Math.floor(maxPoints / 2);
+        if (records.length <= maxPoints || buckets < 1) {
+            return records;
+        }
+        const kept = [];
+        for (let bucket = 0; bucket < buckets; bucket++) {
+            const start = Math.floor(bucket * records.length / buckets);
+            const end = Math.floor((bucket + 1) * records.length / buckets);
+            let low = start;
+            let high = start;
+            for (let i = start + 1; i < end; i++) {
+                if (value(records[i]) < value(records[low])) low = i;
+                if (value(records[i]) > value(records[high])) high = i;
+            }
+            kept.push(records[Math.min(low, high)]);
+            if (low !== high) {
+                kept.push(records[Math.max(low, high)]);
+            }
+        }
+        return kept;
+    };
+})();
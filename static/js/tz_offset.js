@@ -0,0 +1,21 @@
+// Send the browser's UTC offset with the reading's local date and time.
+// On submit, every form with an empty tz_offset field gets the offset, in minutes
+// ahead of UTC, that was in effect at the entered date and time, so readings taken
+// across DST changes or while traveling keep the local time they were taken at.
+// Edit forms prefill the field with the reading's own offset and keep it. Schedule
+// forms get the offset in effect on their first day.
+document.querySelectorAll('form').forEach((form) => {
+    const offsetField = form.querySelector('input[name="tz_offset"]');
+    const dateField = form.querySelector('input[name="date_time"], input[name="start_date"]');
+    if (!offsetField || !dateField || offsetField.value !== '') {
+        return;
+    }
+    form.addEventListener('submit', () => {
+        // A date alone would be parsed as UTC, so read it as local midnight
+        const value = dateField.value.length === 10 ? `${dateField.value}T00:00` : dateField.value;
+        const entered = new Date(value);
+        if (!isNaN(entered)) {
+            offsetField.value = -entered.getTimezoneOffset();
+        }
+    });
+});
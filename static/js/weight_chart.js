@@ -2,13 +2,17 @@ document.addEventListener("DOMContentLoaded", function () {
     const loader = document.getElementById("chartLoader");
     const chartCanvas = document.getElementById("weightChart");
 
-    // Extract the selected range from the URL
-    const urlParams = new URLSearchParams(window.location.search);
-    const range = urlParams.get('range') || 'last_week'; // Default to 'last_week'
+    // The page passes the selected range as timestamps (empty for all time)
+    const start = Number(chartCanvas.dataset.start) || null;
+    const end = Number(chartCanvas.dataset.end) || null;
 
-    // Fetch data for the selected range
-    fetch(`/weight/data?range=${range}`)
-        .then(response => response.json())
+    // Keep roughly one point per pixel of chart width
+    const maxPoints = Math.max(100, Math.round(chartCanvas.parentElement.clientWidth));
+
+    // Sync the stored series with the server and pick the selected range
+    syncSeries('weight', chartCanvas.dataset.user)
+        .then(records => chartPoints('weight', filterRange(records, start, end), chartCanvas.dataset.range,
+                                     maxPoints, record => record.weight))
         .then(data => {
             if (data.error) {
                 console.error(data.error);
@@ -0,0 +1,83 @@
+"""
+Test fixtures for the Healthsome application.
+
+Every test runs the application against its own freshly created database.
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+# Config reads the environment when it is first imported
+os.environ.setdefault("SESSION_FILE_DIR", os.path.join(tempfile.gettempdir(), "healthsome_test_sessions"))
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+from app import create_app  # pylint: disable=wrong-import-position
+from helpers.db_helpers import ConnectionPool  # pylint: disable=wrong-import-position
+from helpers.migration_helpers import apply_migrations  # pylint: disable=wrong-import-position
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema.sql")
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Create an empty database with the full schema.
+
+    Returns:
+        str: Path of the database file.
+    """
+    path = str(tmp_path / "healthsome.db")
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    apply_migrations(conn)
+    conn.close()
+    return path
+
+@pytest.fixture
+def statements(monkeypatch):
+    """
+    Record every SQL statement the application runs, with its bound values.
+
+    Returns:
+        list: The statements, appended as they run.
+    """
+    recorded = []
+    connect = ConnectionPool._connect
+
+    def traced_connect(pool):
+        conn = connect(pool)
+        conn.set_trace_callback(recorded.append)
+        return conn
+
+    monkeypatch.setattr(ConnectionPool, "_connect", traced_connect)
+    return recorded
+
+@pytest.fixture
+def app(database, statements, tmp_path):  # pylint: disable=unused-argument
+    """
+    Create the application on the test database.
+
+    Returns:
+        Flask: The application.
+    """
+    flask_app = create_app()
+    flask_app.config.update(TESTING=True, DATABASE_FILE=database,
+                            SERIES_STORE_DIR=str(tmp_path / "series_store"))
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    """
+    Get a test client logged in as a new user.
+
+    Returns:
+        FlaskClient: The client.
+    """
+    test_client = app.test_client()
+    form = {'username': 'test', 'password': 'secret', 'confirmation': 'secret'}
+    test_client.post('/auth/register', data=form)
+    test_client.post('/auth/login', data=form)
+    return test_client
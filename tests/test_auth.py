@@ -0,0 +1,33 @@
+"""
+Authentication tests.
+"""
+
+import sqlite3
+
+import pytest
+
+from helpers.user_helpers import get_user_cache
+
+def test_logout_clears_the_browser_series(client):
+    """Logging out removes the health data the charts kept in the browser."""
+    response = client.get('/auth/logout')
+    assert response.status_code == 302
+    assert response.headers['Clear-Site-Data'] == '"storage"'
+    assert 'clearSeries()' in client.get('/auth/login').get_data(as_text=True)
+
+def test_register_drops_a_cached_username_of_the_reused_id(app):
+    """A new user never shows the username cached for an earlier user with the same ID."""
+    with app.app_context():
+        get_user_cache().set(1, 'previous')
+    form = {'username': 'test', 'password': 'secret', 'confirmation': 'secret'}
+    app.test_client().post('/auth/register', data=form)
+    with app.app_context():
+        assert get_user_cache().get(1) is None
+
+def test_sqlite_sessions_need_the_sessions_table(app, database):
+    """Without migration 0003 the first request fails with a hint instead of a missing table error."""
+    with sqlite3.connect(database) as conn:
+        conn.execute("DROP TABLE sessions")
+    conn.close()
+    with pytest.raises(RuntimeError, match="run python migrate.py"):
+        app.test_client().get('/auth/login')
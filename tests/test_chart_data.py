@@ -0,0 +1,45 @@
+"""
+Chart data tests.
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from helpers.datetime_helpers import format_timestamp
+from helpers.downsample_helpers import lttb_indices
+
+# Hourly readings from 2026-01-01 00:00 UTC; halfway the user flies from UTC+9 to UTC-8,
+# so local times jump back 17 hours while the readings go on
+FIRST_TS = 1767225600
+READINGS = 60
+MAX_POINTS = 10
+
+def offset(index):
+    """Get the time zone offset of a reading, in minutes."""
+    return 540 if index < READINGS // 2 else -480
+
+def weight(index):
+    """Get the value of a reading, with a spike just after the flight."""
+    return 90.0 if index == READINGS // 2 + 3 else 80 + (index % 7) / 10
+
+@pytest.mark.parametrize("series_store", [True, False])
+def test_downsampling_follows_utc_time_across_offset_changes(app, client, database, series_store):
+    """Weight points are downsampled in UTC order and only shown in each reading's local time."""
+    ts = np.array([FIRST_TS + index * 3600 for index in range(READINGS)])
+    values = np.array([weight(index) for index in range(READINGS)])
+    with sqlite3.connect(database) as conn:
+        conn.executemany("INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (1, ?, ?, ?)",
+                         [(int(ts[index]), offset(index), values[index]) for index in range(READINGS)])
+    conn.close()
+    app.config['SERIES_STORE_ENABLED'] = series_store
+
+    points = client.get(f'/weight/data?range=all_time&max_points={MAX_POINTS}').get_json()
+
+    keep = lttb_indices(ts, values, MAX_POINTS).tolist()
+    minutes = np.array([(ts[index] + offset(index) * 60) // 60 for index in range(READINGS)])
+    assert keep != lttb_indices(minutes, values, MAX_POINTS).tolist()  # Local time would pick others
+    assert points == [{"date": format_timestamp(int(ts[index]), offset(index)), "weight": values[index]}
+                      for index in keep]
+    assert {"date": "2026-01-02 01:00", "weight": 90.0} in points
@@ -0,0 +1,125 @@
+"""
+Group commit writer tests.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from helpers.db_helpers import get_writer
+
+INSERT_USER = "INSERT INTO users (username, password_hash) VALUES (?, 'x')"
+
+@pytest.fixture
+def writer(app):
+    """
+    Get the group commit writer of the directory database.
+
+    Returns:
+        GroupCommitWriter: The writer, closed after the test.
+    """
+    app.config.update(GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_WINDOW_MS=300, DB_BUSY_TIMEOUT_MS=0,
+                      GROUP_COMMIT_BACKOFF_MS=20, GROUP_COMMIT_MAX_RETRIES=10)
+    with app.app_context():
+        group_writer = get_writer()
+    yield group_writer
+    group_writer.close()
+
+def execute_together(writer, statements):
+    """
+    Hand statements to the writer from concurrent threads, as concurrent requests would.
+
+    Args:
+        writer (GroupCommitWriter): The writer.
+        statements (list): (query, args) tuples.
+
+    Returns:
+        list: The result or exception of each statement.
+    """
+    results = [None] * len(statements)
+
+    def run(index, query, args):
+        try:
+            results[index] = writer.execute(query, args)
+        except sqlite3.Error as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,) + statement)
+               for index, statement in enumerate(statements)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def usernames(database):
+    """
+    Read the committed usernames.
+
+    Args:
+        database (str): Path of the test database.
+
+    Returns:
+        list: The usernames in insertion order.
+    """
+    with sqlite3.connect(database) as conn:
+        rows = [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")]
+    conn.close()
+    return rows
+
+def test_failing_statement_only_fails_its_caller(writer, database):
+    """A failing statement in a batch is rolled back alone and its error reaches its caller."""
+    writer.execute(INSERT_USER, ('taken',))
+    results = execute_together(writer, [
+        (INSERT_USER, ('first',)),
+        # Inserts 'partial' before failing on the duplicate, which its savepoint undoes
+        ("INSERT INTO users (username, password_hash) VALUES ('partial', 'x'), ('taken', 'x')", ()),
+        (INSERT_USER, ('second',)),
+    ])
+
+    assert results[0] == 1 and results[2] == 1
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert sorted(usernames(database)) == ['first', 'second', 'taken']
+    stats = writer.stats()
+    assert stats["batches"] == 2  # The three statements were committed together
+    assert stats["failed_statements"] == 1 and stats["failed_batches"] == 0
+
+@pytest.mark.parametrize("connected", [True, False])
+def test_locked_database_is_retried_without_losing_or_repeating_writes(writer, database, connected):
+    """A batch that found the database locked by another process is committed once, after backoff."""
+    if connected:
+        writer.execute("DELETE FROM users WHERE id = 0")
+    # Otherwise the writer's connection is opened, and the database switched to WAL, while locked
+    lock = sqlite3.connect(database, isolation_level=None, check_same_thread=False)
+    lock.execute("BEGIN IMMEDIATE")
+    releaser = threading.Timer(0.5, lock.execute, ("COMMIT",))
+    releaser.start()
+    started = time.perf_counter()
+
+    results = execute_together(writer, [(INSERT_USER, (f"user{index}",)) for index in range(5)])
+
+    releaser.join()
+    lock.close()
+    assert time.perf_counter() - started >= 0.5
+    assert results == [1] * 5
+    assert sorted(usernames(database)) == [f"user{index}" for index in range(5)]
+    stats = writer.stats()
+    assert stats["retries"] >= 1
+    assert stats["statements"] == 5 + connected and stats["failed_batches"] == 0
+
+def test_locked_database_fails_every_caller_after_the_last_retry(writer, database):
+    """A batch still locked out after every retry fails all of its callers and writes nothing."""
+    writer.max_retries = 2
+    lock = sqlite3.connect(database, isolation_level=None, check_same_thread=False)
+    lock.execute("BEGIN IMMEDIATE")
+    try:
+        results = execute_together(writer, [(INSERT_USER, (f"user{index}",)) for index in range(3)])
+    finally:
+        lock.execute("COMMIT")
+        lock.close()
+
+    assert all(isinstance(result, sqlite3.OperationalError) for result in results)
+    assert usernames(database) == []
+    assert writer.stats()["failed_batches"] == 1
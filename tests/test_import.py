@@ -0,0 +1,98 @@
+"""
+Bulk import tests.
+"""
+
+import io
+import sqlite3
+
+import pytest
+
+JSON = {'Accept': 'application/json'}
+
+def upload(client, metric, content, filename, **form):
+    """
+    Post a file to a metric's import endpoint.
+
+    Args:
+        client (FlaskClient): The logged-in client.
+        metric (str): Name of the metric blueprint.
+        content (bytes): The file content.
+        filename (str): Name of the uploaded file.
+
+    Returns:
+        Response: The JSON import result.
+    """
+    data = dict(form, file=(io.BytesIO(content), filename))
+    return client.post(f'/{metric}/import', data=data, headers=JSON, content_type='multipart/form-data')
+
+def stored(database, query):
+    """
+    Read the rows a query returns from the test database.
+
+    Args:
+        database (str): Path of the test database.
+        query (str): The SELECT statement.
+
+    Returns:
+        list: The rows as tuples.
+    """
+    with sqlite3.connect(database) as conn:
+        rows = conn.execute(query).fetchall()
+    conn.close()
+    return rows
+
+def test_csv_import(client, database):
+    """Every valid CSV row is stored with its timestamp and offset."""
+    content = (b"date_time,systolic,diastolic,pulse\n"
+               b"2026-01-01T08:00+01:00,120,80,60\n"
+               b"2026-01-02 08:00+01:00,130,85,72\n")
+    response = upload(client, 'blood_pressure', content, 'readings.csv')
+    assert response.get_json() == {"imported": 2, "rejected": 0, "errors": []}
+    assert stored(database, "SELECT ts, tz_offset, systolic, diastolic, pulse FROM blood_pressure "
+                            "ORDER BY ts") == [(1767250800, 60, 120, 80, 60), (1767337200, 60, 130, 85, 72)]
+
+def test_ndjson_import(client, database):
+    """Every valid NDJSON row is stored, with numbers and strings alike."""
+    content = (b'{"date_time": "2026-01-01T08:00+00:00", "weight_value": 80.5}\n'
+               b'\n'
+               b'{"date_time": "2026-01-02T08:00+00:00", "weight_value": "80.1"}\n')
+    response = upload(client, 'weight', content, 'readings.ndjson')
+    assert response.get_json() == {"imported": 2, "rejected": 0, "errors": []}
+    assert stored(database, "SELECT ts, weight_value FROM weight ORDER BY ts") == [(1767254400, 80.5),
+                                                                                  (1767340800, 80.1)]
+
+def test_invalid_rows_are_reported_and_skipped(client, database):
+    """Rows that fail validation are reported by line while the others are imported."""
+    content = (b"date_time,medication_name,dosage,taken\n"
+               b"2026-01-01T08:00+00:00,Aspirin,100 mg,yes\n"
+               b"not a date,Aspirin,100 mg,yes\n"
+               b"2026-01-02T08:00+00:00,,100 mg,yes\n"
+               b"2026-01-03T08:00+00:00,Aspirin,100 mg,maybe\n")
+    result = upload(client, 'medications', content, 'doses.csv').get_json()
+    assert result["imported"] == 1
+    assert result["rejected"] == 3
+    assert [error["line"] for error in result["errors"]] == [3, 4, 5]
+    assert stored(database, "SELECT medication_name, taken FROM medications") == [('Aspirin', 1)]
+
+def test_unreadable_row_rolls_back_every_batch(client, database):
+    """A row that cannot be decoded fails the import without keeping the batches inserted before it."""
+    content = (b"date_time,weight_value\n"
+               b"2026-01-01T08:00+00:00,80.5\n"
+               b"2026-01-02T08:00+00:00,80.1\n"
+               b"2026-01-03T08:00+00:00,\xff\xfe\n")
+    client.application.config['IMPORT_BATCH_SIZE'] = 1
+    response = upload(client, 'weight', content, 'readings.csv')
+    assert response.status_code == 400
+    assert "not valid CSV" in response.get_json()["error"]
+    assert stored(database, "SELECT COUNT(*) FROM weight") == [(0,)]
+    assert stored(database, "SELECT COUNT(*) FROM change_log WHERE metric = 'weight'") == [(0,)]
+
+@pytest.mark.parametrize("value", ['{"kg": 80.5}', '[80.5]'])
+def test_objects_and_arrays_are_rejected(client, database, value):
+    """NDJSON values that are objects or arrays are reported instead of failing the import."""
+    content = (f'{{"date_time": "2026-01-01T08:00+00:00", "weight_value": {value}}}\n'
+               '{"date_time": "2026-01-02T08:00+00:00", "weight_value": 80.1}\n').encode()
+    result = upload(client, 'weight', content, 'readings.ndjson').get_json()
+    assert result["imported"] == 1
+    assert result["errors"] == [{"line": 1, "error": "weight_value must be a string or a number"}]
+    assert stored(database, "SELECT weight_value FROM weight") == [(80.1,)]
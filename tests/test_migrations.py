@@ -0,0 +1,75 @@
+"""
+Schema migration tests.
+"""
+
+import os
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from helpers.migration_helpers import MIGRATIONS_DIR, apply_migrations, get_schema_version
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema.sql")
+
+pytestmark = pytest.mark.skipif(not hasattr(time, 'tzset'), reason="needs time.tzset to switch time zones")
+
+@pytest.fixture
+def time_zone(monkeypatch):
+    """
+    Switch the time zone of the test process, restoring it afterwards.
+
+    Returns:
+        callable: Sets the time zone from a TZ name.
+    """
+    def switch(name):
+        monkeypatch.setenv('TZ', name)
+        time.tzset()
+
+    yield switch
+    monkeypatch.undo()
+    time.tzset()
+
+def database_before_epoch_timestamps(tmp_path):
+    """
+    Create a database at the schema version before migration 0004, with local reading times.
+
+    Returns:
+        sqlite3.Connection: Connection to the database.
+    """
+    migrations = tmp_path / "migrations"
+    migrations.mkdir()
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name.endswith('.sql') and name < '0004':
+            shutil.copy(os.path.join(MIGRATIONS_DIR, name), migrations)
+
+    conn = sqlite3.connect(str(tmp_path / "healthsome.db"))
+    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    apply_migrations(conn, str(migrations))
+    assert get_schema_version(conn) == 3
+    with conn:
+        conn.execute("INSERT INTO users (id, username, password_hash) VALUES (1, 'test', 'x')")
+        conn.executemany("INSERT INTO weight (user_id, date_time, weight_value) VALUES (1, ?, ?)",
+                         [('2025-01-15 08:30', 80.5), ('2025-07-15 08:30', 79.0)])
+    return conn
+
+@pytest.mark.parametrize("zone, offsets", [
+    ('America/New_York', (-300, -240)),
+    ('Europe/Berlin', (60, 120)),
+    ('UTC', (0, 0)),
+])
+def test_epoch_timestamps_use_the_migrating_time_zone(tmp_path, time_zone, zone, offsets):
+    """Local reading times are converted in the time zone of the migrating process, with its DST rules."""
+    conn = database_before_epoch_timestamps(tmp_path)
+    time_zone(zone)
+    apply_migrations(conn)
+    rows = conn.execute("SELECT ts, tz_offset, date_time, weight_value FROM weight ORDER BY id").fetchall()
+    conn.close()
+
+    # The local times read back unchanged in every zone, but the instants they stand for differ
+    assert [row[2:] for row in rows] == [('2025-01-15 08:30', 80.5), ('2025-07-15 08:30', 79.0)]
+    assert [row[1] for row in rows] == list(offsets)
+    winter, summer = 1736929800, 1752568200  # 08:30 UTC on both days
+    assert [row[0] for row in rows] == [winter - offsets[0] * 60, summer - offsets[1] * 60]
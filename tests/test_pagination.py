@@ -0,0 +1,74 @@
+"""
+Keyset pagination tests.
+"""
+
+import html
+import re
+import sqlite3
+
+import pytest
+
+from helpers.pagination_helpers import decode_cursor, encode_cursor, paginate_records
+
+# Readings of user 1 as (ts, weight); several share a timestamp, so pages must break ties by ID
+READINGS = [(1767600000, 80.0), (1767600000, 80.1), (1767603600, 80.2), (1767600000, 80.3),
+            (1767500000, 80.4), (1767603600, 80.5), (1767600000, 80.6)]
+
+@pytest.fixture
+def readings(database):
+    """
+    Store READINGS, and a reading of another user at a shared timestamp.
+
+    Returns:
+        list: IDs of user 1's readings, newest first by (ts, id).
+    """
+    with sqlite3.connect(database) as conn:
+        conn.executemany("INSERT OR IGNORE INTO users (id, username, password_hash) VALUES (?, ?, 'x')",
+                         [(1, 'test'), (2, 'other')])
+        rows = [conn.execute("INSERT INTO weight (user_id, ts, tz_offset, weight_value) "
+                             "VALUES (1, ?, 0, ?) RETURNING id, ts", reading).fetchone()
+                for reading in READINGS]
+        conn.execute("INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (2, 1767600000, 0, 70)")
+    conn.close()
+    return [record_id for record_id, _ in sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)]
+
+def test_cursor_round_trip():
+    """A cursor decodes to the boundary it was made from, and anything else to None."""
+    assert decode_cursor(encode_cursor('next', 1767600000, 42)) == ('next', 1767600000, 42)
+    assert decode_cursor(encode_cursor('prev', 0, 1)) == ('prev', 0, 1)
+    for cursor in (None, '', 'not base64!', encode_cursor('sideways', 1, 1), encode_cursor('next', '1', 1)):
+        assert decode_cursor(cursor) is None
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 10])
+def test_pages_cover_equal_timestamps_once(app, readings, page_size):
+    """Following the cursors back and forth visits every record once, in order, across equal timestamps."""
+    pages, cursor = [], None
+    with app.app_context():
+        while True:
+            records, next_cursor, prev_cursor = paginate_records('weight', 1, None, None, cursor, page_size)
+            pages.append([record['id'] for record in records])
+            assert (prev_cursor is None) == (cursor is None)
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+
+        assert [record_id for page in pages for record_id in page] == readings
+        assert all(len(page) == page_size for page in pages[:-1])
+
+        # The Newer links lead back through the same pages
+        for page in reversed(pages[:-1]):
+            records, next_cursor, prev_cursor = paginate_records('weight', 1, None, None, prev_cursor, page_size)
+            assert [record['id'] for record in records] == page
+            assert next_cursor is not None
+        assert prev_cursor is None
+
+def test_pager_links_keep_the_page_size(client, readings):  # pylint: disable=unused-argument
+    """The Newer and Older links carry the requested page size along with the range."""
+    first = client.get('/weight/?range=all_time&limit=2').get_data(as_text=True)
+    older = html.unescape(re.search(r'href="([^"]*)">Older', first).group(1))
+    assert 'limit=2' in older and 'range=all_time' in older
+
+    middle = client.get(older).get_data(as_text=True)
+    newer = html.unescape(re.search(r'href="([^"]*)">&larr; Newer', middle).group(1))
+    assert 'limit=2' in newer and 'limit=2' in re.search(r'href="([^"]*)">Older', middle).group(1)
+    assert client.get(newer).get_data(as_text=True) == first
@@ -0,0 +1,31 @@
+"""
+Password hashing pool tests.
+"""
+
+import threading
+
+import pytest
+
+from helpers.password_helpers import HashingBusyError, PasswordHasher
+
+def test_timed_out_jobs_keep_their_slot_until_done():
+    """A running job the caller stopped waiting for still counts against max_pending."""
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+
+    with pytest.raises(HashingBusyError, match="timed out"):
+        hasher._run(release.wait, 5)  # pylint: disable=protected-access
+    with pytest.raises(HashingBusyError, match="Too many"):
+        hasher._run(release.wait, 5)  # pylint: disable=protected-access
+
+    release.set()
+    hasher._executor.shutdown(wait=True)  # pylint: disable=protected-access
+    assert hasher._slots.acquire(blocking=False)  # pylint: disable=protected-access
+
+def test_hash_and_check():
+    """Hashes made by the pool verify, and only against their password."""
+    hasher = PasswordHasher('pbkdf2:sha256:1000')
+    password_hash = hasher.hash('secret')
+    assert hasher.check(password_hash, 'secret')
+    assert not hasher.check(password_hash, 'wrong')
+    assert not hasher.needs_rehash(password_hash)
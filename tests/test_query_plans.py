@@ -0,0 +1,140 @@
+"""
+Query plan regression tests.
+
+The plans are taken from the statements the blueprints and helpers actually
+run: every request below is made against a test database, each metric
+statement it runs is recorded with its bound values, and its EXPLAIN QUERY
+PLAN must not scan a table, sort in a temp B-tree or walk a user's index to
+find records selected by ID.
+"""
+
+import io
+import re
+import sqlite3
+
+import pytest
+
+from helpers.bulk_helpers import SELECTED_IDS_SQL
+from helpers.migration_helpers import find_plan_problems, plan_problems
+from helpers.pagination_helpers import encode_cursor
+
+# Statements reading or writing the per-user metric tables and their companions
+METRIC_STATEMENT = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|JOIN)\s+(?:blood_pressure|weight|medications|change_log|medication_schedule)",
+    re.IGNORECASE)
+
+METRICS = ('blood_pressure', 'weight', 'medications')
+
+FORMS = {
+    'blood_pressure': {'systolic': '120', 'diastolic': '80', 'pulse': '70'},
+    'weight': {'weight_value': '80.5'},
+    'medications': {'medication_name': 'Aspirin', 'dosage': '100 mg', 'taken': '1'},
+}
+
+CSV_ROWS = {
+    'blood_pressure': "date_time,systolic,diastolic,pulse\n2026-01-05T08:00,121,81,71\n",
+    'weight': "date_time,weight_value\n2026-01-05T08:00,80.1\n",
+    'medications': "date_time,medication_name,dosage,taken\n2026-01-05T08:00,Aspirin,100 mg,1\n",
+}
+
+def metric_requests(metric):
+    """
+    List the requests that exercise every query of a metric blueprint.
+
+    Args:
+        metric (str): One of METRICS.
+
+    Returns:
+        list: pytest params of (method, path, form data).
+    """
+    older = encode_cursor('next', 1767600000, 2)
+    newer = encode_cursor('prev', 1767500000, 1)
+    requests = [
+        ('GET', f'/{metric}/?range=last_month', None),
+        ('GET', f'/{metric}/?range=all_time', None),
+        ('GET', f'/{metric}/?range=all_time&cursor={older}', None),
+        ('GET', f'/{metric}/?range=last_week&cursor={newer}', None),
+        ('GET', f'/{metric}/data?range=last_month', None),
+        ('GET', f'/{metric}/data?range=all_time', None),
+        ('GET', f'/{metric}/data?range=all_time&max_points=10', None),
+        ('GET', f'/{metric}/data?range=last_year&granularity=day', None),
+        ('GET', f'/{metric}/data?range=all_time&granularity=week', None),
+        ('GET', f'/{metric}/data?since=0', None),
+        ('GET', f'/{metric}/data?since=1', None),
+        ('GET', f'/{metric}/stats?range=all_time', None),
+        ('GET', f'/{metric}/stats?range=last_month', None),
+        ('GET', f'/{metric}/export', None),
+        ('GET', f'/{metric}/export?format=ndjson', None),
+        ('POST', f'/{metric}/import', {'file': (CSV_ROWS[metric], 'import.csv')}),
+        ('POST', f'/{metric}/create', dict(FORMS[metric], date_time='2026-01-04T09:30', tz_offset='60')),
+        ('GET', f'/{metric}/edit/1', None),
+        ('POST', f'/{metric}/edit/1', dict(FORMS[metric], date_time='2026-01-02T07:00')),
+        ('POST', f'/{metric}/delete/2', None),
+        ('POST', f'/{metric}/delete_selected', {'ids': ['1', '3']}),
+    ]
+    return [pytest.param(*request, id=f"{request[0]} {request[1]}") for request in requests]
+
+REQUESTS = [param for metric in METRICS for param in metric_requests(metric)] + [
+    pytest.param('POST', '/medications/toggle/1', None, id="POST /medications/toggle"),
+    pytest.param('POST', '/medications/mark_taken', {'first_day': '2026-01-01', 'last_day': '2026-01-07'},
+                 id="POST /medications/mark_taken"),
+    pytest.param('GET', '/medications/schedules', None, id="GET /medications/schedules"),
+    pytest.param('POST', '/medications/schedules/create',
+                 {'medication_name': 'Metformin', 'dosage': '500 mg', 'times': '08:00,20:00',
+                  'start_date': '2026-01-01', 'every_days': '1', 'default_taken': '1'},
+                 id="POST /medications/schedules/create"),
+    pytest.param('POST', '/medications/schedules/1/dose', {'ts': '1767254400', 'taken': '0'},
+                 id="POST /medications/schedules/dose"),
+    pytest.param('GET', '/medications/doses?range=last_month', None, id="GET /medications/doses"),
+    pytest.param('POST', '/medications/schedules/delete/1', None, id="POST /medications/schedules/delete"),
+    pytest.param('GET', '/', None, id="GET /"),
+    pytest.param('GET', '/dashboard', None, id="GET /dashboard"),
+    pytest.param('GET', '/export', None, id="GET /export"),
+]
+
+@pytest.fixture
+def seeded_client(client):
+    """
+    Get a logged-in client whose user has a few records of every kind.
+
+    Returns:
+        FlaskClient: The client.
+    """
+    for metric in METRICS:
+        for day in (1, 2, 3):
+            client.post(f'/{metric}/create', data=dict(FORMS[metric], date_time=f'2026-01-0{day}T08:00'))
+    client.post('/medications/schedules/create',
+                data={'medication_name': 'Lisinopril', 'dosage': '10 mg', 'times': '08:00',
+                      'start_date': '2026-01-01'})
+    return client
+
+def test_metric_queries_are_indexed(database):
+    """The queries checked by `migrate.py --check` are served by indexes."""
+    with sqlite3.connect(database) as conn:
+        assert find_plan_problems(conn) == []
+
+def test_selection_by_id_must_use_rowid(database):
+    """A selection by ID that searches the user's index instead of the rowid is reported."""
+    with sqlite3.connect(database) as conn:
+        assert plan_problems(conn, f"DELETE FROM weight WHERE {SELECTED_IDS_SQL}") == []
+        assert plan_problems(
+            conn, "DELETE FROM weight WHERE user_id = ? AND id IN (SELECT value FROM json_each(?))")
+
+@pytest.mark.parametrize("method, path, data", REQUESTS)
+def test_request_queries_are_indexed(seeded_client, statements, database, method, path, data):
+    """Every metric statement run for a request is served by indexes."""
+    if data and 'file' in data:
+        text, filename = data['file']
+        data = {'file': (io.BytesIO(text.encode('utf-8')), filename)}
+    statements.clear()
+    response = seeded_client.open(path, method=method, data=data)
+    response.get_data()
+    response.close()
+    assert response.status_code < 400, response.get_data(as_text=True)[:500]
+
+    executed = [statement for statement in statements
+                if not statement.startswith('--') and METRIC_STATEMENT.search(statement)]
+    assert executed, "the request ran no metric statement"
+    with sqlite3.connect(database) as conn:
+        problems = {statement: plan_problems(conn, statement, ()) for statement in executed}
+    assert {statement: details for statement, details in problems.items() if details} == {}
@@ -0,0 +1,85 @@
+"""
+Response cache tests.
+
+A write handled by another worker process does not invalidate this
+process's cache; it is simulated by writing to the database directly and
+storing a new token on the shared version board, as that process would.
+"""
+
+import sqlite3
+
+import pytest
+
+from helpers.cache_helpers import DASHBOARD, VERSION_BOARD_SUFFIX, VersionBoard
+
+CHART_REQUESTS = [
+    ('weight', '/weight/data?range=all_time&max_points=10'),
+    ('weight', '/weight/data?range=all_time&granularity=day'),
+    ('blood_pressure', '/blood_pressure/data?range=all_time&max_points=10'),
+    ('medications', '/medications/data?range=all_time&max_points=10'),
+]
+
+INSERTS = {
+    'weight': "INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (1, 1767261600, 0, 81.5)",
+    'blood_pressure': "INSERT INTO blood_pressure (user_id, ts, tz_offset, systolic, diastolic, pulse) "
+                      "VALUES (1, 1767261600, 0, 131, 85, 72)",
+    'medications': "INSERT INTO medications (user_id, ts, tz_offset, medication_name, dosage, taken) "
+                   "VALUES (1, 1767261600, 0, 'Aspirin', '100 mg', 1)",
+}
+
+def write_from_other_worker(database, metric):
+    """
+    Insert a record on a connection and board of their own, as another worker process would.
+
+    Args:
+        database (str): Path of the test database.
+        metric (str): Metric of the record, a key of INSERTS.
+    """
+    with sqlite3.connect(database) as conn:
+        conn.execute(INSERTS[metric])
+    conn.close()
+    board = VersionBoard(database + VERSION_BOARD_SUFFIX)
+    board.bump(1, metric)
+    board.bump(1, DASHBOARD)
+
+@pytest.mark.parametrize("metric, path", CHART_REQUESTS)
+def test_chart_data_sees_writes_of_other_workers(client, database, metric, path):
+    """Cached chart data is rebuilt after a write this process did not handle."""
+    first = client.get(path)
+    assert client.get(path).get_data() == first.get_data()
+    assert client.get(path, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    write_from_other_worker(database, metric)
+
+    second = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_data() != first.get_data()
+
+@pytest.mark.parametrize("metric, path", CHART_REQUESTS)
+def test_chart_data_cache_hits_run_no_sql(client, statements, metric, path):  # pylint: disable=unused-argument
+    """A cached chart response is served without querying the database."""
+    client.get(path)
+    statements.clear()
+    assert client.get(path).status_code == 200
+    assert not [sql for sql in statements if metric in sql or 'change_log' in sql]
+
+@pytest.mark.parametrize("metric", sorted(INSERTS))
+def test_dashboard_sees_writes_of_other_workers(client, database, metric):
+    """The cached dashboard and home page are rebuilt after a write this process did not handle."""
+    first = client.get('/dashboard')
+    page = client.get('/').get_data()
+    assert client.get('/dashboard', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    write_from_other_worker(database, metric)
+
+    second = client.get('/dashboard', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()[metric]['latest'] != first.get_json()[metric]['latest']
+    assert client.get('/').get_data() != page
+
+def test_dashboard_cache_hits_run_no_sql(client, statements):
+    """The cached dashboard is served without querying the database."""
+    client.get('/dashboard')
+    statements.clear()
+    assert client.get('/dashboard').status_code == 200
+    assert not [sql for sql in statements if 'change_log' in sql or any(metric in sql for metric in INSERTS)]
@@ -0,0 +1,106 @@
+"""
+Metric rollup tests.
+
+The rollups are maintained by triggers on every write; after any mix of
+writes they must match a rebuild from the raw readings.
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from helpers.rollup_helpers import ROLLUP_AGGREGATES, rebuild_rollups
+
+# 2026-01-04 is a Sunday; the range covers several week boundaries
+FIRST_TS = 1767484800
+DAYS = 21
+
+# Value columns of each metric and a random value for each
+VALUES = {
+    'blood_pressure': {'systolic': lambda rng: rng.randint(95, 180), 'diastolic': lambda rng: rng.randint(55, 110),
+                       'pulse': lambda rng: rng.randint(45, 120)},
+    'weight': {'weight_value': lambda rng: round(rng.uniform(60, 100), 1)},
+    'medications': {'taken': lambda rng: rng.randint(0, 1)},
+}
+
+def read_rollups(conn, metric):
+    """
+    Read a metric's rollups, with sums rounded so that the order of additions does not matter.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the test database.
+        metric (str): Name of the metric.
+
+    Returns:
+        list: The rollup rows, ordered.
+    """
+    rows = conn.execute(f"SELECT * FROM {metric}_rollups ORDER BY user_id, period, bucket").fetchall()
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+def random_writes(conn, metric, rng, count=400):
+    """
+    Insert, update and delete readings of two users at random, in and across buckets.
+
+    Updates change values and move readings to other days and weeks, and to
+    other time zone offsets; deletes empty some buckets and remove their
+    minimums and maximums.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the test database.
+        metric (str): Name of the metric.
+        rng (random.Random): Seeded random generator.
+        count (int): Number of writes.
+    """
+    values = VALUES[metric]
+    extra = ", medication_name" if metric == 'medications' else ""
+    for _ in range(count):
+        ids = [row[0] for row in conn.execute(f"SELECT id FROM {metric}")]
+        action = rng.random()
+        # Times land on every hour, so local midnight and Monday boundaries are crossed
+        ts = FIRST_TS + rng.randrange(DAYS * 24) * 3600
+        tz_offset = rng.choice((-480, -300, 0, 60, 330, 600))
+        if action < 0.5 or not ids:
+            columns = list(values)
+            conn.execute(f"INSERT INTO {metric} (user_id, ts, tz_offset, {', '.join(columns)}{extra}) "
+                         f"VALUES (?, ?, ?, {', '.join('?' * len(columns))}{', ?' if extra else ''})",
+                         (rng.randint(1, 2), ts, tz_offset, *(values[c](rng) for c in columns))
+                         + (('Aspirin',) if extra else ()))
+        elif action < 0.8:
+            column = rng.choice(list(values))
+            conn.execute(f"UPDATE {metric} SET ts = ?, tz_offset = ?, {column} = ?, user_id = ? WHERE id = ?",
+                         (ts, tz_offset, values[column](rng), rng.randint(1, 2), rng.choice(ids)))
+        else:
+            conn.execute(f"DELETE FROM {metric} WHERE id = ?", (rng.choice(ids),))
+
+@pytest.mark.parametrize("metric", sorted(ROLLUP_AGGREGATES))
+def test_triggered_rollups_match_a_rebuild(database, metric):
+    """The rollups kept by the triggers equal the ones rebuilt from the raw readings."""
+    conn = sqlite3.connect(database)
+    conn.executemany("INSERT INTO users (id, username, password_hash) VALUES (?, ?, 'x')",
+                     [(1, 'first'), (2, 'second')])
+    rng = random.Random(metric)
+    with conn:
+        random_writes(conn, metric, rng)
+    triggered = read_rollups(conn, metric)
+
+    rebuild_rollups(conn, metric)
+    conn.close()
+    assert triggered == read_rollups(sqlite3.connect(database), metric)
+    assert triggered
+
+@pytest.mark.parametrize("date_time, day, week", [
+    ('2026-01-11 23:30', '2026-01-11', '2026-01-05'),  # Sunday
+    ('2026-01-12 00:00', '2026-01-12', '2026-01-12'),  # Monday
+    ('2026-01-14 12:00', '2026-01-14', '2026-01-12'),  # Wednesday
+])
+def test_week_buckets_start_on_monday(database, date_time, day, week):
+    """A reading is counted in its local day and in the week starting on the Monday before it."""
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO users (id, username, password_hash) VALUES (1, 'first', 'x')")
+    ts = conn.execute("SELECT unixepoch(?) - 120 * 60", (date_time,)).fetchone()[0]
+    with conn:
+        conn.execute("INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (1, ?, 120, 80)", (ts,))
+    buckets = conn.execute("SELECT period, bucket FROM weight_rollups ORDER BY period").fetchall()
+    conn.close()
+    assert buckets == [('day', day), ('week', week)]
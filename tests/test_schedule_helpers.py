@@ -0,0 +1,125 @@
+"""
+Medication schedule tests.
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from helpers.bulk_helpers import local_days_params
+from helpers.db_helpers import transaction
+from helpers.schedule_helpers import (PENDING, count_doses, due_dose_columns, expand_schedule,
+                                      mark_scheduled_doses_taken, scheduled_doses)
+
+MONDAY, WEDNESDAY, FRIDAY = 1, 1 << 2, 1 << 4
+
+def utc(day, hour, minute=0):
+    """
+    Get a timestamp of January 2026 in UTC; the 5th is a Monday.
+
+    Args:
+        day (int): Day of the month.
+        hour (int): Hour of the day.
+        minute (int): Minute of the hour.
+
+    Returns:
+        int: UTC seconds since the epoch.
+    """
+    return int(datetime(2026, 1, day, hour, minute, tzinfo=timezone.utc).timestamp())
+
+def schedule(**columns):
+    """
+    Build a medication_schedules row, every day at 08:00 UTC from 2026-01-05 unless overridden.
+
+    Returns:
+        dict: The row.
+    """
+    return dict({'times': '480', 'weekdays': 127, 'every_days': 1, 'start_date': '2026-01-05',
+                 'end_date': None, 'tz_offset': 0, 'default_taken': 0}, **columns)
+
+def test_weekday_rule():
+    """Doses are generated on the selected days of the week only."""
+    doses = expand_schedule(schedule(weekdays=MONDAY | WEDNESDAY | FRIDAY), utc(1, 0), utc(11, 23))
+    assert doses.tolist() == [utc(5, 8), utc(7, 8), utc(9, 8)]
+
+def test_every_n_days_until_the_last_day():
+    """Doses are generated every N days from the first day up to the last day."""
+    doses = expand_schedule(schedule(times='480,1200', every_days=2, start_date='2026-01-01',
+                                     end_date='2026-01-06'), utc(1, 0), utc(31, 0))
+    assert doses.tolist() == [utc(1, 8), utc(1, 20), utc(3, 8), utc(3, 20), utc(5, 8), utc(5, 20)]
+
+@pytest.mark.parametrize("tz_offset, expected", [
+    (120, [utc(5, 6), utc(12, 6)]),  # 08:00 at UTC+2
+    (-300, [utc(5, 13), utc(12, 13)]),  # 08:00 at UTC-5
+])
+def test_local_dose_times(tz_offset, expected):
+    """Dose times and days of the week are local to the schedule's time zone."""
+    doses = expand_schedule(schedule(weekdays=MONDAY, tz_offset=tz_offset), utc(1, 0), utc(14, 0))
+    assert doses.tolist() == expected
+
+def test_late_local_dose_falls_on_the_next_utc_day():
+    """A Monday evening dose west of UTC is generated on Tuesday in UTC, and not for Sunday."""
+    doses = expand_schedule(schedule(times='1320', weekdays=MONDAY, tz_offset=-300), utc(4, 0), utc(13, 0))
+    assert doses.tolist() == [utc(6, 3)]
+
+@pytest.fixture
+def schedules(client, database):  # pylint: disable=unused-argument
+    """
+    Store three schedules of the logged-in user, with overrides.
+
+    - 0: 08:00 and 20:00 UTC, missed by default; the first dose marked taken, and an
+      override of a time the schedule does not generate.
+    - 1: 08:00 and 20:00 UTC, taken by default; the first dose marked missed.
+    - 2: Mondays at 22:00 UTC-5, taken by default.
+
+    Returns:
+        list: The schedule IDs.
+    """
+    with sqlite3.connect(database) as conn:
+        ids = [conn.execute("INSERT INTO medication_schedules (user_id, medication_name, times, start_date, "
+                            "tz_offset, weekdays, default_taken) VALUES (1, ?, ?, '2026-01-05', ?, ?, ?) "
+                            "RETURNING id", row).fetchone()[0]
+               for row in (('Metformin', '480,1200', 0, 127, 0), ('Aspirin', '480,1200', 0, 127, 1),
+                           ('Vitamin D', '1320', -300, MONDAY, 1))]
+        conn.executemany("INSERT INTO medication_schedule_overrides (schedule_id, ts, taken) VALUES (?, ?, ?)",
+                         [(ids[0], utc(5, 8), 1), (ids[0], utc(5, 9), 1), (ids[1], utc(5, 8), 0)])
+    conn.close()
+    return ids
+
+def test_overrides_are_merged_with_the_defaults(app, schedules):  # pylint: disable=unused-argument
+    """Due doses have their override or the default status, doses after `until` are pending."""
+    with app.app_context():
+        doses = scheduled_doses(1, utc(5, 0), utc(6, 23, 59), until=utc(6, 12))
+
+    assert doses['schedule'].tolist() == [0, 1, 0, 1, 2, 0, 1, 0, 1]
+    assert doses['ts'].tolist() == [utc(5, 8), utc(5, 8), utc(5, 20), utc(5, 20), utc(6, 3),
+                                    utc(6, 8), utc(6, 8), utc(6, 20), utc(6, 20)]
+    assert doses['taken'].tolist() == [1, 0, 0, 1, 1, 0, 1, PENDING, PENDING]
+    assert doses['overridden'].tolist() == [True, True] + [False] * 7
+
+def test_adherence_counts_due_doses_by_local_day(app, schedules):  # pylint: disable=unused-argument
+    """Daily adherence counts each due dose on its local day, with its status."""
+    with app.app_context():
+        minutes, taken = due_dose_columns(1, utc(5, 0), utc(6, 23, 59), until=utc(6, 12))
+
+    assert count_doses(minutes, taken, 'day') == [('2026-01-05', 3, 5), ('2026-01-06', 1, 2)]
+    assert count_doses(minutes, taken, 'week') == [('2026-01-05', 4, 7)]
+
+def test_mark_taken_leaves_doses_that_are_not_due(app, database, schedules):
+    """Marking a day taken only overrides its due doses; the later ones stay pending."""
+    with app.app_context():
+        with transaction() as db:
+            marked = mark_scheduled_doses_taken(db, 1, *local_days_params('2026-01-06'), until=utc(6, 12))
+        doses = scheduled_doses(1, utc(6, 0), utc(6, 23, 59), until=utc(6, 12))
+
+    assert marked == 2
+    # The Monday evening dose of UTC-5 first, which is not on the marked local day
+    assert doses['taken'].tolist() == [1, 1, 1, PENDING, PENDING]
+    with sqlite3.connect(database) as conn:
+        overrides = conn.execute("SELECT schedule_id, ts, taken FROM medication_schedule_overrides "
+                                 "WHERE ts >= ? ORDER BY schedule_id, ts", (utc(6, 0),)).fetchall()
+    conn.close()
+    assert overrides == [(schedules[0], utc(6, 8), 1)]
+    assert np.array_equal(doses['overridden'], [False, True, False, False, False])
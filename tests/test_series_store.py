@@ -0,0 +1,65 @@
+"""
+Series store tests.
+"""
+
+import gc
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from helpers.analytics_helpers import load_series
+from helpers.series_store_helpers import get_series_store
+
+def read_both(app, metric):
+    """
+    Read a user's series from the series store and from the database.
+
+    Args:
+        app (Flask): The application.
+        metric (str): Name of the metric.
+
+    Returns:
+        tuple: (series from the store, series from the database).
+    """
+    with app.test_request_context():
+        app.config['SERIES_STORE_ENABLED'] = True
+        stored = {name: np.array(column) for name, column in load_series(metric, 1).items()}
+        app.config['SERIES_STORE_ENABLED'] = False
+        queried = load_series(metric, 1)
+    return stored, queried
+
+def test_series_store_follows_the_database(app, client, database):
+    """Appends, edits and deletions all reach the stored series, and replaced maps are dropped."""
+    for day in range(1, 6):
+        client.post('/weight/create', data={'date_time': f'2026-01-{day:02d}T08:00', 'weight_value': 80 + day})
+    writes = [
+        "INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (1, 1768000000, 0, 90)",
+        "UPDATE weight SET weight_value = 70 WHERE id = 2",
+        "INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (1, 1767000000, 0, 60)",
+        "DELETE FROM weight WHERE id = 3",
+    ]
+    for statement in [None] + writes:
+        if statement:
+            with sqlite3.connect(database) as conn:
+                conn.execute(statement)
+            conn.close()
+        stored, queried = read_both(app, 'weight')
+        assert stored.keys() == queried.keys()
+        for name, column in queried.items():
+            assert np.array_equal(stored[name], column), (statement, name)
+
+    with app.app_context():
+        app.config['SERIES_STORE_ENABLED'] = True
+        store = get_series_store()
+        stats = store.stats()
+    assert stats['appends'] >= 1 and stats['compactions'] >= 2
+    assert stats['mapped'] == 1
+
+    gc.collect()
+    if not os.path.exists('/proc/self/maps'):
+        pytest.skip("no /proc to list the mapped files")
+    with open('/proc/self/maps', encoding='utf-8') as f:
+        stale = [line for line in f if store.root in line and '(deleted)' in line]
+    assert stale == []
@@ -0,0 +1,159 @@
+"""
+Shard routing and rebalancing tests.
+"""
+
+import os
+import sqlite3
+from collections import Counter
+
+import pytest
+
+import rebalance_shards
+from helpers.shard_helpers import (METRIC_TABLES, SEQUENCE_BITS, init_shard, jump_hash, shard_file,
+                                   shard_files, shard_for)
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema.sql")
+
+# Users stored before rebalancing
+USERS = 40
+
+def test_jump_hash_is_stable():
+    """Users keep their shard across releases: the hash of known keys does not change."""
+    assert [jump_hash(key, 4) for key in range(1, 13)] == [0, 3, 3, 1, 1, 2, 0, 0, 2, 2, 2, 1]
+    assert [jump_hash(key, 10) for key in (1, 2, 3, 1000, 123456789, 2 ** 40 + 7)] == [6, 6, 8, 9, 7, 1]
+    assert jump_hash(2 ** 64 + 5, 7) == jump_hash(5, 7)  # Keys are taken as unsigned 64-bit values
+
+def test_jump_hash_only_moves_users_to_the_new_shard():
+    """Growing from N to N + 1 shards moves about 1 / (N + 1) of the users, all to the new shard."""
+    for count in range(1, 8):
+        moved = [key for key in range(10000) if jump_hash(key, count + 1) != jump_hash(key, count)]
+        assert all(jump_hash(key, count + 1) == count for key in moved)
+        assert abs(len(moved) / 10000 - 1 / (count + 1)) < 0.02
+
+def test_single_shard_is_the_directory(tmp_path):
+    """Without sharding every user lives in the directory database."""
+    database = str(tmp_path / "healthsome.db")
+    assert shard_for(12345, 1) == 0
+    assert shard_file(database, 0, 1) == database
+    assert shard_files(database, 3) == [str(tmp_path / f"healthsome.shard{index}.db") for index in range(3)]
+
+def test_writes_go_to_the_users_shard(app, database, tmp_path, monkeypatch):
+    """A user's records are written to their shard, with IDs from its range."""
+    monkeypatch.setattr(rebalance_shards, 'DB_FILE', database)
+    monkeypatch.setattr(rebalance_shards, 'SCHEMA_FILE', SCHEMA_FILE)
+    rebalance_shards.rebalance(3)
+    app.config['SHARD_COUNT'] = 3
+    for user_id in range(1, 5):
+        client = app.test_client()
+        form = {'username': f'user{user_id}', 'password': 'secret', 'confirmation': 'secret'}
+        client.post('/auth/register', data=form)
+        client.post('/auth/login', data=form)
+        client.post('/weight/create', data={'date_time': '2026-01-01T08:00', 'weight_value': 80})
+        record_id = client.get('/weight/data?since=0').get_json()['records'][0]['id']
+
+        index = shard_for(user_id, 3)
+        assert (record_id >> SEQUENCE_BITS) - 1 == index
+        conn = sqlite3.connect(str(tmp_path / f"healthsome.shard{index}.db"))
+        assert conn.execute("SELECT user_id FROM weight WHERE id = ?", (record_id,)).fetchone() == (user_id,)
+        conn.close()
+
+@pytest.mark.parametrize("index", [0, 1, 5])
+def test_ids_map_back_to_their_shard(tmp_path, index):
+    """IDs and sequence numbers issued by shard k start at (k + 1) << 40, so they map back to k."""
+    path = str(tmp_path / f"shard{index}.db")
+    assert init_shard(path, index, SCHEMA_FILE)
+    conn = sqlite3.connect(path)
+    with conn:
+        record_id = conn.execute("INSERT INTO weight (user_id, ts, tz_offset, weight_value) "
+                                 "VALUES (1, 1767261600, 0, 80) RETURNING id").fetchone()[0]
+    seq = conn.execute("SELECT seq FROM change_log WHERE record_id = ?", (record_id,)).fetchone()[0]
+    conn.close()
+
+    assert record_id == ((index + 1) << SEQUENCE_BITS) + 1
+    assert (record_id >> SEQUENCE_BITS) - 1 == index
+    assert (seq >> SEQUENCE_BITS) - 1 == index
+    assert not init_shard(path, index, SCHEMA_FILE)  # Reopening keeps the sequences
+
+def fill_directory(database):
+    """
+    Store users with readings, deleted readings, schedules and overrides in the directory.
+
+    Args:
+        database (str): Path of the directory database.
+    """
+    with sqlite3.connect(database) as conn:
+        conn.executemany("INSERT INTO users (id, username, password_hash) VALUES (?, ?, 'x')",
+                         [(user_id, f"user{user_id}") for user_id in range(1, USERS + 1)])
+        for user_id in range(1, USERS + 1):
+            for day in range(user_id % 5 + 2):
+                ts = 1767261600 + day * 86400 + user_id * 60
+                conn.execute("INSERT INTO weight (user_id, ts, tz_offset, weight_value) VALUES (?, ?, 60, ?)",
+                             (user_id, ts, 70 + user_id + day / 10))
+                conn.execute("INSERT INTO blood_pressure (user_id, ts, tz_offset, systolic, diastolic, pulse) "
+                             "VALUES (?, ?, -300, ?, ?, ?)", (user_id, ts, 120 + day, 80 + day, 60 + user_id))
+                conn.execute("INSERT INTO medications (user_id, ts, tz_offset, medication_name, dosage, taken) "
+                             "VALUES (?, ?, 0, 'Aspirin', '100 mg', ?)", (user_id, ts, day % 2))
+            conn.execute("DELETE FROM weight WHERE id = (SELECT MIN(id) FROM weight WHERE user_id = ?)",
+                         (user_id,))
+            schedule_id = conn.execute(
+                "INSERT INTO medication_schedules (user_id, medication_name, times, start_date, default_taken) "
+                "VALUES (?, 'Metformin', '480,1200', '2026-01-01', ?) RETURNING id",
+                (user_id, user_id % 2)).fetchone()[0]
+            conn.execute("INSERT INTO medication_schedule_overrides (schedule_id, ts, taken) VALUES (?, ?, ?)",
+                         (schedule_id, 1767254400, 1 - user_id % 2))
+    conn.close()
+
+def snapshot(database, shard_count):
+    """
+    Read every user's data from all shards, and check that it lives in the user's shard.
+
+    Args:
+        database (str): Path of the directory database.
+        shard_count (int): Number of shards.
+
+    Returns:
+        Counter: Rows of every table without their IDs, and the tombstones per user and metric.
+    """
+    rows = Counter()
+    for index, path in enumerate(shard_files(database, shard_count)):
+        conn = sqlite3.connect(path)
+        for table in METRIC_TABLES + ('weight_rollups', 'blood_pressure_rollups', 'medications_rollups'):
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] != 'id']
+            for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table}"):
+                user_id = row[columns.index('user_id')]
+                assert shard_for(user_id, shard_count) == index, (table, user_id)
+                rows[(table,) + row] += 1
+        for row in conn.execute("SELECT s.user_id, s.medication_name, s.times, s.start_date, s.default_taken, "
+                                "o.ts, o.taken FROM medication_schedules s "
+                                "LEFT JOIN medication_schedule_overrides o ON o.schedule_id = s.id"):
+            assert shard_for(row[0], shard_count) == index, ('medication_schedules', row[0])
+            rows[('medication_schedules',) + row] += 1
+        for user_id, metric, deleted in conn.execute(
+                "SELECT user_id, metric, COUNT(*) FROM change_log WHERE deleted = 1 GROUP BY user_id, metric"):
+            assert shard_for(user_id, shard_count) == index, ('change_log', user_id)
+            rows[('tombstones', user_id, metric)] += deleted
+        conn.close()
+    return rows
+
+def test_rebalance_keeps_every_row(database, tmp_path, monkeypatch):
+    """Growing, shrinking and unsharding the database moves every row intact to its user's shard."""
+    monkeypatch.setattr(rebalance_shards, 'DB_FILE', database)
+    monkeypatch.setattr(rebalance_shards, 'SCHEMA_FILE', SCHEMA_FILE)
+    fill_directory(database)
+    original = snapshot(database, 1)
+    assert sum(count for key, count in original.items() if key[0] == 'weight') == sum(
+        user_id % 5 + 1 for user_id in range(1, USERS + 1))
+
+    for shard_count in (3, 4, 2, 1):
+        rebalance_shards.rebalance(shard_count)
+        moved = snapshot(database, shard_count)
+        tombstones = {key for key in moved if key[0] == 'tombstones'}
+        assert {key: count for key, count in moved.items() if key not in tombstones} == \
+            {key: count for key, count in original.items() if key[0] != 'tombstones'}
+        # The deleted weight readings stay deleted for clients that have not synced yet
+        assert all(moved[('tombstones', user_id, 'weight')] >= 1 for user_id in range(1, USERS + 1))
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("SELECT shard_count FROM shard_layout").fetchone() == (1,)
+    conn.close()
+    assert tmp_path.joinpath("healthsome.shard3.db").exists()
@@ -0,0 +1,21 @@
+"""
+Status report tests.
+"""
+
+import pytest
+
+STATUS_PATHS = ['/status/db', '/status/cache', '/status/series', '/status/users', '/status/hashing',
+                '/status/writes']
+
+@pytest.mark.parametrize('path', STATUS_PATHS)
+def test_status_is_hidden_by_default(app, path):
+    """Anonymous clients cannot read the status reports unless they are enabled."""
+    assert app.test_client().get(path).status_code == 404
+
+@pytest.mark.parametrize('path', STATUS_PATHS)
+def test_status_is_served_when_enabled(app, path):
+    """Every status report answers with JSON once STATUS_ENABLED is set."""
+    app.config['STATUS_ENABLED'] = True
+    response = app.test_client().get(path)
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), dict)
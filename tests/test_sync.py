@@ -0,0 +1,45 @@
+"""
+Incremental chart data sync tests.
+"""
+
+import msgspec
+
+from helpers.json_helpers import WeightRecord
+from helpers.sync_helpers import iter_sync_json
+
+def create_weights(client, count):
+    """
+    Create weight readings on consecutive days.
+
+    Args:
+        client (FlaskClient): A logged-in client.
+        count (int): Number of readings.
+    """
+    for day in range(1, count + 1):
+        client.post('/weight/create', data={'date_time': f'2026-01-{day:02d}T08:00', 'weight_value': 80 + day})
+
+def test_sync_returns_changes_after_the_cursor(client):
+    """A full sync returns every record; the next one only what changed since."""
+    create_weights(client, 3)
+    full = client.get('/weight/data?since=0').get_json()
+    assert full['reset'] is True
+    assert [record['weight'] for record in full['records']] == [81, 82, 83]
+
+    client.post('/weight/create', data={'date_time': '2026-01-09T08:00', 'weight_value': 90})
+    client.post(f"/weight/delete/{full['records'][0]['id']}")
+    delta = client.get(f"/weight/data?since={full['cursor']}").get_json()
+    assert delta['reset'] is False
+    assert [record['weight'] for record in delta['records']] == [90]
+    assert delta['deleted'] == [full['records'][0]['id']]
+
+    assert client.get(f"/weight/data?since={delta['cursor']}").get_json()['records'] == []
+
+def test_full_sync_is_streamed_in_chunks(app, client):
+    """The records of a full sync are encoded a chunk at a time into one JSON object."""
+    create_weights(client, 5)
+    with app.test_request_context():
+        pieces = list(iter_sync_json('weight', 1, 0, WeightRecord, chunk_size=2))
+    assert len(pieces) > 3
+    result = msgspec.json.decode(b''.join(pieces))
+    assert result['reset'] is True
+    assert [record['weight'] for record in result['records']] == [81, 82, 83, 84, 85]